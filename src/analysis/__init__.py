@@ -5,6 +5,7 @@ from .evaluation import (
     spatial_r2,
     monthly_score,
     annual_scores,
+    batch_annual_scores,
     read_pred_data,
     read_true_data,
     read_train_data,
@@ -38,6 +39,7 @@ __all__ = [
     "ConditionIndex",
     "monthly_score",
     "annual_scores",
+    "batch_annual_scores",
     "plot_predictions",
     "MovingAverage",
     "VegetationDeficitIndex",
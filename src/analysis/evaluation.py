@@ -152,6 +152,119 @@ def annual_scores_to_dataframe(monthly_scores: Dict) -> pd.DataFrame:
     return df
 
 
+def batch_annual_scores(
+    models: List[str],
+    metrics: Optional[List[str]] = None,
+    experiment="one_month_forecast",
+    true_data_experiment: Optional[str] = None,
+    data_path: Path = Path("data"),
+    pred_years: List[int] = [2018],
+    target_var: str = "VCI",
+    verbose: bool = True,
+) -> pd.DataFrame:
+    """
+    Calculate the same monthly scores as `annual_scores`, for all the models and
+    pred_years at once. Each prediction and true file is opened once, and the
+    files are aligned into (model, time, lat, lon) arrays so that all the metrics
+    are calculated in one vectorised pass.
+
+    Arguments
+    ----------
+    The same as `annual_scores`. The metrics must be in {'rmse', 'r2'}
+
+    Returns:
+    ----------
+    A pd.DataFrame with the same columns as `annual_scores_to_dataframe`
+    (month, year, one column per model and metric), with a row per metric
+    for each month of each pred_year, and a time column
+    """
+    if metrics is None:
+        # if None, use all
+        metrics = ["rmse", "r2"]
+    assert set(metrics) <= {"rmse", "r2"}, f"Unexpected metrics {metrics}"
+
+    if true_data_experiment is None:
+        true_data_experiment = experiment
+
+    year_months = [(year, month) for year in pred_years for month in range(1, 13)]
+
+    # the time coordinates are dropped, so that the months are stacked by position
+    true_da = xr.concat(
+        [
+            xr.open_dataset(
+                data_path / f"features/{true_data_experiment}/test"
+                f"/{pred_year}_{month}/y.nc"
+            )[target_var].isel(time=0, drop=True)
+            for pred_year, month in year_months
+        ],
+        dim="time",
+    )
+    preds_da = xr.concat(
+        [
+            xr.concat(
+                [
+                    xr.open_dataset(
+                        data_path / f"models/{experiment}/{model}"
+                        f"/preds_{pred_year}_{month}.nc"
+                    ).preds.isel(time=0, drop=True)
+                    for pred_year, month in year_months
+                ],
+                dim="time",
+            )
+            for model in models
+        ],
+        dim="model",
+    )
+    true_da, preds_da = xr.align(true_da, preds_da, join="inner")
+
+    # (model, time, pixel)
+    preds_np = preds_da.transpose("model", "time", "lat", "lon").values
+    preds_np = preds_np.reshape(preds_np.shape[0], preds_np.shape[1], -1)
+    true_np = true_da.transpose("time", "lat", "lon").values
+    true_np = np.broadcast_to(true_np.reshape(true_np.shape[0], -1), preds_np.shape)
+
+    notnan = ~np.isnan(true_np - preds_np)
+    count = notnan.sum(axis=-1)
+    squared_error = np.where(notnan, (true_np - preds_np) ** 2, 0).sum(axis=-1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        true_mean = np.where(notnan, true_np, 0).sum(axis=-1) / count
+        total_squares = np.where(
+            notnan, (true_np - true_mean[:, :, np.newaxis]) ** 2, 0
+        ).sum(axis=-1)
+
+        scores = {"rmse": np.sqrt(squared_error / count)}
+        # matching sklearn's r2_score for constant true values
+        scores["r2"] = np.where(
+            total_squares == 0,
+            np.where(squared_error == 0, 1.0, 0.0),
+            1 - squared_error / total_squares,
+        )
+        scores["r2"][count < 2] = np.nan
+
+    metric_dfs = []
+    for year_idx, pred_year in enumerate(pred_years):
+        months = slice(year_idx * 12, (year_idx + 1) * 12)
+        for metric in metrics:
+            metric_df = pd.DataFrame({"month": list(range(1, 13)), "year": pred_year})
+            for model_idx, model in enumerate(models):
+                metric_df[model] = scores[metric][model_idx, months]
+                if verbose:
+                    for month, score in zip(metric_df.month, metric_df[model]):
+                        print(
+                            f"For month {month}, model {model} has {metric} score {score}"
+                        )
+            metric_df["metric"] = metric
+            metric_dfs.append(metric_df)
+
+    out_df = pd.concat(metric_dfs)
+    out_df["time"] = [
+        pd.to_datetime(f"{month}-{year}")
+        for month, year in zip(out_df.month, out_df.year)
+    ]
+    return out_df
+
+
 def _read_multi_data_paths(train_data_paths: List[Path]) -> xr.Dataset:
     train_ds = xr.open_mfdataset(train_data_paths).sortby("time").compute()
     train_ds = train_ds.transpose("time", "lat", "lon")
@@ -1,7 +1,7 @@
 import xarray as xr
 import numpy as np
 from pathlib import Path
-from typing import Tuple, Optional, Any
+from typing import Dict, List, Tuple, Optional, Any
 import warnings
 from ..utils import get_ds_mask, create_shape_aligned_climatology
 
@@ -9,6 +9,103 @@ rle = None
 longest_run = None
 
 
+def run_length_statistics(exceed: np.ndarray) -> Dict[str, np.ndarray]:
+    """Calculate the runs of consecutive `True` values in a boolean array of
+    shape (time, pixel), vectorised across pixels in one pass over time.
+
+    e.g. for a pixel with exceedences
+        [True, True, False, True, False, True, True, True]
+    current_run = [1, 2, 0, 1, 0, 1, 2, 3]
+    run_length = [2, 0, 0, 1, 0, 3, 0, 0]
+    longest_run = 3, run_count = 3, longest_run_start = 5, longest_run_end = 7
+
+    Returns:
+    -------
+    Dict[str, np.ndarray]
+        current_run: (time, pixel) the length of the run up to each timestep
+        run_length: (time, pixel) the length of each run, at its first timestep
+        longest_run: (pixel,) the length of the longest run
+        run_count: (pixel,) the number of runs
+        longest_run_start, longest_run_end: (pixel,) the time index of
+            the first and last timestep of the (first) longest run.
+            -1 where there are no runs
+    """
+    exceed = exceed.astype(bool)
+    # the run length is the number of exceedences since the last non-exceedence
+    cumulative = np.cumsum(exceed, axis=0, dtype=np.int32)
+    reset = np.maximum.accumulate(np.where(exceed, 0, cumulative), axis=0)
+    current_run = cumulative - reset
+
+    # the last timestep of each run holds its length
+    ends = exceed.copy()
+    ends[:-1] &= ~exceed[1:]
+    end_time, end_pixel = np.nonzero(ends)
+    lengths = current_run[end_time, end_pixel]
+    run_length = np.zeros_like(current_run)
+    run_length[end_time - lengths + 1, end_pixel] = lengths
+
+    longest = current_run.max(axis=0)
+    longest_end = np.where(longest > 0, current_run.argmax(axis=0), -1)
+    longest_start = np.where(longest > 0, longest_end - longest + 1, -1)
+
+    return {
+        "current_run": current_run,
+        "run_length": run_length,
+        "longest_run": longest,
+        "run_count": np.bincount(end_pixel, minlength=exceed.shape[1]),
+        "longest_run_start": longest_start,
+        "longest_run_end": longest_end,
+    }
+
+
+def grouped_percentiles(
+    values: np.ndarray, groups: np.ndarray, percentiles: List[float]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Calculate the percentiles of the non-nan values in each group
+    (e.g. each month) for every pixel. Equivalent to `np.nanpercentile`
+    with linear interpolation, but each group is sorted once and all the
+    percentiles are interpolated from the sorted block at once.
+
+    Arguments:
+    ---------
+    values: np.ndarray
+        the values, of shape (time, pixel)
+
+    groups: np.ndarray
+        the group of each timestep, of shape (time,)
+
+    percentiles: List[float]
+        the percentiles to calculate, in [0, 100]
+
+    Returns:
+    -------
+    :np.ndarray
+        the (sorted) unique groups
+    :np.ndarray
+        the percentiles, of shape (group, percentile, pixel). nan where
+        a pixel has no valid values in a group
+    """
+    unique_groups, inverse = np.unique(groups, return_inverse=True)
+    order = np.argsort(inverse, kind="stable")
+    bounds = np.searchsorted(inverse[order], np.arange(len(unique_groups) + 1))
+    q = np.asarray(percentiles, dtype=np.float64)[:, np.newaxis] / 100
+
+    out = np.full((len(unique_groups), q.shape[0], values.shape[1]), np.nan)
+    for i in range(len(unique_groups)):
+        # nans are sorted to the end of each pixel's series
+        block = np.sort(values[order[bounds[i] : bounds[i + 1]]], axis=0)
+        num_valid = (~np.isnan(block)).sum(axis=0)
+        position = q * np.maximum(num_valid - 1, 0)
+        lower = np.floor(position).astype(int)
+        upper = np.ceil(position).astype(int)
+        lower_values = np.take_along_axis(block, lower, axis=0)
+        upper_values = np.take_along_axis(block, upper, axis=0)
+        out[i] = lower_values + (upper_values - lower_values) * (position - lower)
+        out[i][:, num_valid == 0] = np.nan
+
+    return unique_groups, out
+
+
 class EventDetector:
     """A flexible method for detecting events and calculating the size of runs
     in a timeseries of interest.
@@ -21,16 +118,13 @@ class EventDetector:
     >>> e = EventDetector(path_to_data)
     >>> e.detect(variable='precip', method='std', time_period='month', hilo='low')
     >>> e.calculate_runs()
+
+    The q90 / q10 percentile thresholds are calculated together and reused
+    by later calls to `detect`. If a `cache_dir` is given, they are
+    also saved there (and reused until the data at `path_to_data` changes).
     """
 
-    def __init__(self, path_to_data: Path) -> None:
-
-        global rle
-        global longest_run
-        if rle is None:
-            from xclim.run_length import rle
-        if longest_run is None:
-            from xclim.run_length import longest_run
+    def __init__(self, path_to_data: Path, cache_dir: Optional[Path] = None) -> None:
 
         assert (
             path_to_data.exists()
@@ -38,6 +132,10 @@ class EventDetector:
         self.path_to_data = path_to_data
         self.ds = self.read_data(path_to_data)
 
+        self.cache_dir = cache_dir
+        # {time_period: percentile thresholds}
+        self.percentiles: Dict[str, xr.Dataset] = {}
+
     def read_data(self, path_to_data: Path) -> xr.Dataset:
 
         try:
@@ -63,6 +161,7 @@ class EventDetector:
         variable: str,
         hilo: Optional[str] = None,
         value: Optional[float] = None,
+        percentiles: Optional[xr.Dataset] = None,
     ) -> xr.DataArray:
         """Calculate the threshold using the method defined in `method`.
         This calculates a threshold value above/below which a value is
@@ -97,23 +196,18 @@ class EventDetector:
         value: Optional[float] = None
             if the method is `abs` then also need to provide a value to
             be used as the threshold value.
-        """
-        if method == "q90":
-            warnings.warn(f"this method ({method}) is currently super slow")
-            thresh = (
-                ds.groupby(f"time.{time_period}")
-                # .quantile(q=0.9)  # updated v0.12.2
-                .reduce(np.nanpercentile, dim="time", q=90)
-            )
 
-        elif method == "q10":
-            warnings.warn(f"this method ({method}) is currently super slow")
-            thresh = (
-                ds.groupby(f"time.{time_period}").reduce(
-                    np.nanpercentile, dim="time", q=10
+        percentiles: Optional[xr.Dataset] = None
+            precomputed percentiles (from `calculate_grouped_percentiles`)
+            for the `q90` / `q10` methods. Calculated if None
+        """
+        if method in ["q90", "q10"]:
+            q = 90 if method == "q90" else 10
+            if percentiles is None or q not in percentiles.percentile:
+                percentiles = EventDetector.calculate_grouped_percentiles(
+                    ds, time_period, [q]
                 )
-                # .quantile(q=0.1)
-            )
+            thresh = percentiles.sel(percentile=q, drop=True)
 
         elif method == "std":
             assert (
@@ -139,6 +233,85 @@ class EventDetector:
 
         return thresh
 
+    @staticmethod
+    def calculate_grouped_percentiles(
+        ds: xr.Dataset,
+        time_period: str,
+        percentiles: List[float],
+        chunk_size: int = 10000,
+    ) -> xr.Dataset:
+        """Calculate the `percentiles` of each variable in `ds` for each
+        `time_period` group (e.g. month), processing `chunk_size` pixels
+        at a time.
+
+        Returns:
+        -------
+        xr.Dataset with dimensions (time_period, percentile, lat, lon)
+        """
+        groups = ds[f"time.{time_period}"].values
+
+        data_vars = {}
+        coords: Dict = {"percentile": percentiles}
+        for variable in ds.data_vars:
+            da = ds[variable]
+            if "time" not in da.dims:
+                continue
+            other_dims = [d for d in da.dims if d != "time"]
+            values = da.transpose("time", *other_dims).values
+            values = values.reshape(values.shape[0], -1).astype(np.float64)
+
+            chunks = []
+            for i in range(0, values.shape[1], chunk_size):
+                unique_groups, chunk = grouped_percentiles(
+                    values[:, i : i + chunk_size], groups, percentiles
+                )
+                chunks.append(chunk)
+            out = np.concatenate(chunks, axis=-1).reshape(
+                len(unique_groups),
+                len(percentiles),
+                *[da[d].shape[0] for d in other_dims],
+            )
+            data_vars[variable] = ([time_period, "percentile", *other_dims], out)
+            coords[time_period] = unique_groups
+            coords.update({d: da[d] for d in other_dims})
+
+        return xr.Dataset(data_vars, coords=coords)
+
+    def get_percentile_thresholds(self, time_period: str) -> xr.Dataset:
+        """Get the q10 and q90 percentiles of `self.ds` for each
+        `time_period`, calculating them once and reusing them from
+        memory (or from `self.cache_dir`) afterwards.
+        """
+        if time_period in self.percentiles:
+            return self.percentiles[time_period]
+
+        # the cache is invalid if the data has changed
+        stat = self.path_to_data.stat()
+        source = f"{self.path_to_data.resolve()}_{stat.st_size}_{stat.st_mtime_ns}"
+
+        cache_path = None
+        if self.cache_dir is not None:
+            cache_path = (
+                self.cache_dir
+                / f"{self.path_to_data.stem}_{time_period}_percentiles.nc"
+            )
+            if cache_path.exists():
+                cached = xr.open_dataset(cache_path).load()
+                if cached.attrs.get("source") == source:
+                    print(f"Loaded the percentile thresholds from {cache_path}")
+                    self.percentiles[time_period] = cached
+                    return cached
+
+        percentiles = self.calculate_grouped_percentiles(self.ds, time_period, [10, 90])
+        percentiles.attrs["source"] = source
+        if cache_path is not None:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            percentiles.to_netcdf(cache_path)
+            print(f"Saved the percentile thresholds to {cache_path}")
+
+        self.percentiles[time_period] = percentiles
+        return percentiles
+
     def get_thresh_clim_dataarrays(
         self,
         ds: xr.Dataset,
@@ -147,8 +320,9 @@ class EventDetector:
         hilo: str = None,
         method: str = "std",
         value: Optional[float] = None,
+        percentiles: Optional[xr.Dataset] = None,
     ) -> Tuple[xr.Dataset, xr.Dataset]:
-        """Get the climatology and threshold xarray objects """
+        """Get the climatology and threshold xarray objects"""
         # compute climatology (`mean` over `time_period`)
         clim = ds.groupby(f"time.{time_period}").mean(dim="time")
         print(f"Calculated climatology (mean for each {time_period}) - `clim`")
@@ -161,6 +335,7 @@ class EventDetector:
             hilo=hilo,
             variable=variable,
             value=value,
+            percentiles=percentiles,
         )
         print("Calculated threshold - `thresh`")
         return clim, thresh
@@ -178,9 +353,19 @@ class EventDetector:
         """
         ds = self.ds
 
+        percentiles = None
+        if method in ["q90", "q10"]:
+            percentiles = self.get_percentile_thresholds(time_period)
+
         # calculate climatology and threshold
         clim, thresh = self.get_thresh_clim_dataarrays(
-            ds, time_period, hilo=hilo, method=method, variable=variable, value=value
+            ds,
+            time_period,
+            hilo=hilo,
+            method=method,
+            variable=variable,
+            value=value,
+            percentiles=percentiles,
         )
 
         # assign objects to object here because the copying
@@ -283,14 +468,83 @@ class EventDetector:
 
         return da
 
-    def calculate_runs(self) -> xr.Dataset:
-        """use xclim to calculate the number of consecutive exceedences.
-        For each pixel-time calculate the `run` of exceedences at the
-        current timestep.
+    def calculate_run_statistics(self, chunk_size: int = 10000) -> xr.Dataset:
+        """Calculate the run statistics of `self.exceedences` using
+        `run_length_statistics`. The pixels are processed in chunks of
+        `chunk_size`, so that memory stays bounded for long timeseries.
+
+        Returns:
+        -------
+        xr.Dataset with
+            current_run: (time, lat, lon) the length of the run at each timestep
+            run_length: (time, lat, lon) the length of each run, at its first timestep
+            longest_run: (lat, lon) the length of the longest run
+            run_count: (lat, lon) the number of runs
+            longest_run_start, longest_run_end: (lat, lon) the first and
+                last times of the longest run (NaT where there are no runs)
+
+        All variables are masked with the mask of `self.ds` (e.g. the sea).
+        """
+        assert self.exceedences.dtype == np.dtype(
+            "bool"
+        ), f"\
+            Expected exceedences to be an array of boolean type.\
+             Got {self.exceedences.dtype}"
+
+        exceed = self.exceedences.transpose("time", "lat", "lon")
+        num_times, num_lats, num_lons = exceed.shape
+        exceed_np = exceed.values.reshape(num_times, -1)
+
+        chunks = [
+            run_length_statistics(exceed_np[:, i : i + chunk_size])
+            for i in range(0, exceed_np.shape[1], chunk_size)
+        ]
+        stats = {
+            key: np.concatenate([chunk[key] for chunk in chunks], axis=-1)
+            for key in chunks[0]
+        }
+
+        times = exceed.time.values
+        for key in ["longest_run_start", "longest_run_end"]:
+            stats[key] = np.where(
+                stats[key] >= 0, times[stats[key]], np.datetime64("NaT")
+            )
+
+        data_vars = {}
+        for key, values in stats.items():
+            if values.ndim == 2:
+                data_vars[key] = (
+                    ["time", "lat", "lon"],
+                    values.reshape(num_times, num_lats, num_lons),
+                )
+            else:
+                data_vars[key] = (["lat", "lon"], values.reshape(num_lats, num_lons))
+        run_stats = xr.Dataset(
+            data_vars,
+            coords={"time": exceed.time, "lat": exceed.lat, "lon": exceed.lon},
+        )
+
+        # apply the same mask as TIME=0 (e.g. for the sea-land mask)
+        mask = get_ds_mask(self.ds[self.variable])
+        return run_stats.where(~mask)
+
+    def calculate_runs(
+        self, engine: str = "numpy", chunk_size: int = 10000
+    ) -> xr.Dataset:
+        """calculate the number of consecutive exceedences.
+        For each pixel-time where a `run` of exceedences starts, the length
+        of that run (0 for all other timesteps).
 
         e.g.
             [True, True, False, True, False, True, True, True] =>
-            [1, 2, 0, 1, 0, 1, 2, 3]
+            [2, 0, 0, 1, 0, 3, 0, 0]
+
+        Arguments:
+        ---------
+        engine: str = 'numpy'
+            {'numpy', 'xclim'}. 'numpy' uses `run_length_statistics`,
+            processing `chunk_size` pixels at a time. 'xclim' requires
+            xclim to be installed
 
             TODO: want to make this general enough to work with subset data too
         """
@@ -300,6 +554,14 @@ class EventDetector:
             Expected exceedences to be an array of boolean type.\
              Got {self.exceedences.dtype}"
 
+        if engine == "numpy":
+            return self.calculate_run_statistics(chunk_size=chunk_size).run_length
+
+        assert engine == "xclim", f"engine must be one of numpy, xclim. Got {engine}"
+        global rle
+        if rle is None:
+            from xclim.run_length import rle
+
         runs = rle(self.exceedences).load()  # type: ignore
 
         # apply the same mask as TIME=0 (e.g. for the sea-land mask)
@@ -308,7 +570,20 @@ class EventDetector:
 
         return runs
 
-    def calculate_longest_run(self, resample_str: Optional[str] = None) -> xr.Dataset:
-        """ Calculate the longest run in the dataset
-        TODO: fix this argument to work with other resample_str """
+    def calculate_longest_run(
+        self,
+        resample_str: Optional[str] = None,
+        engine: str = "numpy",
+        chunk_size: int = 10000,
+    ) -> xr.Dataset:
+        """Calculate the longest run in the dataset
+        TODO: fix this argument to work with other resample_str"""
+        if engine == "numpy":
+            return self.calculate_run_statistics(chunk_size=chunk_size).longest_run
+
+        assert engine == "xclim", f"engine must be one of numpy, xclim. Got {engine}"
+        global longest_run
+        if longest_run is None:
+            from xclim.run_length import longest_run
+
         return longest_run(self.exceedences, dim="time").load()  # type: ignore
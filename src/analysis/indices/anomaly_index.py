@@ -1,8 +1,66 @@
+import warnings
+
 import xarray as xr
 import numpy as np
 
 from .base import BaseIndices
-from .utils import rolling_cumsum, apply_over_period
+from .utils import rolling_cumsum, group_members
+
+
+def rainfall_anomaly_index(
+    values: np.ndarray, groups: np.ndarray, num_extremes: int = 10
+) -> np.ndarray:
+    """Calculate the RAI of every value relative to the other values
+    in its group (e.g. month) for every pixel.
+
+    The groups are scattered into one nan-padded (group, member, pixel) array
+    so that the group means and the means of the `num_extremes` highest
+    and lowest values (found with `np.partition`) are calculated for all
+    groups at once. Missing values are ignored.
+
+    Arguments:
+    ---------
+    values: np.ndarray
+        the (rolling sum of) rainfall, of shape (time, pixel)
+
+    groups: np.ndarray
+        the group of each timestep, of shape (time,)
+
+    num_extremes: int = 10
+        the number of highest / lowest values averaged for the
+        positive / negative anomaly magnitudes
+
+    Returns:
+    -------
+    :np.ndarray
+        the RAI, of shape (time, pixel). nan where `values` is nan
+    """
+    values = values.astype(np.float64)
+    _, inverse, member = group_members(groups)
+    grouped = np.full((inverse.max() + 1, member.max() + 1, values.shape[1]), np.nan)
+    grouped[inverse, member] = values
+
+    num_members = grouped.shape[1]
+    k = min(num_extremes, num_members)
+    missing = np.isnan(grouped)
+    highest = np.partition(
+        np.where(missing, -np.inf, grouped), num_members - k, axis=1
+    )[:, num_members - k :]
+    lowest = np.partition(np.where(missing, np.inf, grouped), k - 1, axis=1)[:, :k]
+
+    with warnings.catch_warnings():
+        # groups where a pixel has no values are nan
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        mean = np.nanmean(grouped, axis=1)
+        highest_mean = np.nanmean(np.where(np.isinf(highest), np.nan, highest), axis=1)
+        lowest_mean = np.nanmean(np.where(np.isinf(lowest), np.nan, lowest), axis=1)
+
+        anomaly = values - mean[inverse]
+        return np.where(
+            anomaly >= 0,
+            3.0 * anomaly / (highest_mean - mean)[inverse],
+            -3.0 * anomaly / (lowest_mean - mean)[inverse],
+        )
 
 
 class AnomalyIndex(BaseIndices):
@@ -43,66 +101,30 @@ class AnomalyIndex(BaseIndices):
     name = "rainfall_anomaly_index"
 
     @staticmethod
-    def assign_magnitudes(
-        y: xr.Dataset,
-        anom: xr.DataArray,
-        rai_plus: xr.DataArray,
-        rai_minus: xr.DataArray,
-        variable: str,
-    ) -> xr.Dataset:
-        """ assign magnitudes to positive and negative anomalies """
-        # REVERSE boolean indexing
-        # if anom values are NOT less than/equal than fill with PLUS values
-        y_plus = y.where(~(anom >= 0), other=rai_plus)
-        y_plus_mask = y.where(~(anom >= 0)).isnull()
-        y_plus = y_plus.where(y_plus_mask)
-
-        y_minus = y.where(~(anom < 0), other=rai_minus)
-        y_minus_mask = y.where(~(anom < 0)).isnull()
-        y_minus = y_minus.where(y_minus_mask)
-
-        # convert to numpy masked array
-        y_plus_m_np = y_plus_mask[variable].values
-        y_plus_np = y_plus[variable].values
-        y_plus_np = np.ma.array(y_plus_np, mask=(~y_plus_m_np))
-
-        y_minus_m_np = y_minus_mask[variable].values
-        y_minus_np = y_minus[variable].values
-        y_minus_np = np.ma.array(y_minus_np, mask=(~y_minus_m_np))
-
-        # recombine masked arrays
-        rai_array = np.ma.array(
-            y_plus_np.filled(1) * y_minus_np.filled(1),
-            mask=(y_plus_np.mask * y_minus_np.mask),
-        )
-
-        rai = xr.ones_like(y)
-        rai[variable] = (["time", "lat", "lon"], rai_array)
-        return rai
-
-    def RAI(self, da: xr.DataArray, variable: str, dim: str = "time") -> xr.DataArray:
-        """ Rainfall Anomaly Index """
-        # calculations
-        y = da.copy()
-        x1 = da.copy().sortby(dim, ascending=False)  # high -> low over TIME
-
-        # sample average, max average, min average
-        x_avg = x1.mean(dim=dim)  # monthly average over all time
-        mx_avg = x1.isel(time=slice(0, 10)).mean(dim=dim)  # max mean (top 10)
-        mn_avg = x1.isel(time=slice(-11, -1)).mean(dim=dim)  # min mean (bottom 10) NB
-
-        # anomaly = value - mean
-        anom = da - x_avg
-
-        # where anomaly is >=0, get the ratio to difference of max_avg - x_avg
-        rai_plus = 3.0 * anom.where(anom >= 0) / (mx_avg - x_avg)
-        rai_minus = -3.0 * anom.where(anom < 0) / (mn_avg - x_avg)
-
-        # assign the magnitudes for positive and negative anomalies
-        # convert to numpy masked arrays and then back out to xarray
-        rai = self.assign_magnitudes(y, anom, rai_plus, rai_minus, variable)
-
-        return rai
+    def RAI(
+        da: xr.DataArray, time_period: str = "month", num_extremes: int = 10
+    ) -> xr.DataArray:
+        """ Rainfall Anomaly Index of each timestep, relative to the other
+        timesteps of the same `time_period` (e.g. month) """
+        groups = da[f"time.{time_period}"].values
+
+        def rai(values: np.ndarray) -> np.ndarray:
+            # apply_ufunc moves time to the last axis
+            pixels = values.reshape(-1, values.shape[-1]).T
+            return rainfall_anomaly_index(
+                pixels, groups, num_extremes=num_extremes
+            ).T.reshape(values.shape)
+
+        # each (spatial) block of a dask array is calculated separately,
+        # rather than the whole cube being loaded
+        return xr.apply_ufunc(
+            rai,
+            da,
+            input_core_dims=[["time"]],
+            output_core_dims=[["time"]],
+            dask="parallelized",
+            output_dtypes=[float],
+        ).transpose(*da.dims)
 
     def fit(
         self, variable: str, time_period: str = "month", rolling_window: int = 3
@@ -115,16 +137,10 @@ class AnomalyIndex(BaseIndices):
 
         out_variable = "RAI"
 
-        rai = apply_over_period(  # type: ignore
-            ds_window,
-            func=self.RAI,
-            in_variable=variable,
-            out_variable=out_variable,
-            time_str=time_period,
-            **{"variable": variable},
+        rai = self.RAI(ds_window[variable], time_period=time_period)
+        ds_window = ds_window.merge(rai.to_dataset(name=out_variable)).rename(
+            {variable: f"{variable}_cumsum"}
         )
-        rai = rai.drop("month")
-        ds_window = ds_window.merge(rai).rename({variable: f"{variable}_cumsum"})
 
         self.index = ds_window
         print(f"Fitted Rainfall Anomaly Index and stored at `obj.index`")
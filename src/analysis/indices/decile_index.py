@@ -1,8 +1,110 @@
 import xarray as xr
 import numpy as np
+from typing import Tuple
 
 from .base import BaseIndices
-from .utils import rolling_cumsum, apply_over_period
+from .utils import rolling_cumsum, group_members
+
+
+def sorted_climatology(
+    values: np.ndarray, groups: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Sort the values of each pixel in each group (e.g. month)
+
+    Arguments:
+    ---------
+    values: np.ndarray
+        the values, of shape (time, pixel)
+
+    groups: np.ndarray
+        the group of each timestep, of shape (time,)
+
+    Returns:
+    -------
+    :np.ndarray
+        the (sorted) unique groups
+    :np.ndarray
+        the sorted values, of shape (group, member, pixel). Missing values
+        (and the padding of groups with fewer members) are sorted to the end
+    :np.ndarray
+        the number of timesteps in each group
+    """
+    unique_groups, inverse, member = group_members(groups)
+    grouped = np.full(
+        (unique_groups.shape[0], member.max() + 1, values.shape[1]), np.nan
+    )
+    grouped[inverse, member] = values
+    return unique_groups, np.sort(grouped, axis=1), np.bincount(inverse)
+
+
+def searchsorted_columns(
+    sorted_values: np.ndarray, values: np.ndarray, side: str = "left"
+) -> np.ndarray:
+    """`np.searchsorted` of each column of `values` (query, pixel) in the
+    same column of `sorted_values` (member, pixel), as one vectorised binary
+    search over all pixels. Missing values at the end of the sorted columns
+    are ignored.
+    """
+    num_members = sorted_values.shape[0]
+    lower = np.zeros(values.shape, dtype=np.int64)
+    upper = np.broadcast_to((~np.isnan(sorted_values)).sum(axis=0), values.shape).copy()
+
+    for _ in range(int(np.ceil(np.log2(num_members + 1)))):
+        middle = (lower + upper) // 2
+        middle_values = np.take_along_axis(
+            sorted_values, np.minimum(middle, num_members - 1), axis=0
+        )
+        if side == "left":
+            go_right = middle_values < values
+        else:
+            go_right = middle_values <= values
+        active = lower < upper
+        lower = np.where(active & go_right, middle + 1, lower)
+        upper = np.where(active & ~go_right, middle, upper)
+    return lower
+
+
+def climatology_rank_norm(
+    sorted_values: np.ndarray,
+    sizes: np.ndarray,
+    values: np.ndarray,
+    group_index: np.ndarray,
+    in_climatology: bool = True,
+) -> np.ndarray:
+    """The normalised rank (0 - 100) of `values` in the sorted climatology
+    of their group, by binary search.
+
+    Arguments:
+    ---------
+    sorted_values: np.ndarray
+        the sorted climatology, of shape (group, member, pixel)
+        (from `sorted_climatology`)
+
+    sizes: np.ndarray
+        the number of timesteps in each group of the climatology
+
+    values: np.ndarray
+        the values to rank, of shape (time, pixel)
+
+    group_index: np.ndarray
+        the index of the group (in `sorted_values`) of each timestep
+
+    in_climatology: bool = True
+        whether the `values` are members of the climatology. If True, ties are
+        averaged as in `DecileIndex.rank_norm`. If False, the values are new
+        observations, ranked as if they were added to the climatology
+    """
+    rank_norm = np.full(values.shape, np.nan)
+    for group in np.unique(group_index):
+        rows = group_index == group
+        left = searchsorted_columns(sorted_values[group], values[rows], "left")
+        right = searchsorted_columns(sorted_values[group], values[rows], "right")
+        if in_climatology:
+            group_rank = (left + right - 1) / 2 / (sizes[group] - 1) * 100
+        else:
+            group_rank = (left + right) / 2 / sizes[group] * 100
+        rank_norm[rows] = np.where(np.isnan(values[rows]), np.nan, group_rank)
+    return rank_norm
 
 
 class DecileIndex(BaseIndices):
@@ -79,6 +181,64 @@ class DecileIndex(BaseIndices):
     def rank_norm(ds, dim="time"):
         return (ds.rank(dim=dim) - 1) / (ds.sizes[dim] - 1) * 100
 
+    def fit_climatology(self, da: xr.DataArray, time_period: str = "month") -> None:
+        """store the sorted values of each pixel in each `time_period`
+        at `self.climatology`, so that new observations can be scored by
+        binary search (see `score`) rather than re-ranking the whole history
+        """
+        da = da.transpose("time", "lat", "lon")
+        groups, sorted_values, sizes = sorted_climatology(
+            da.values.reshape(da.shape[0], -1).astype(np.float64),
+            da[f"time.{time_period}"].values,
+        )
+        self.climatology = xr.Dataset(
+            {
+                "sorted_values": (
+                    [time_period, "member", "lat", "lon"],
+                    sorted_values.reshape(*sorted_values.shape[:2], *da.shape[1:]),
+                ),
+                "size": ([time_period], sizes),
+            },
+            coords={time_period: groups, "lat": da.lat, "lon": da.lon},
+            attrs={"time_period": time_period},
+        )
+
+    def score(self, da: xr.DataArray, in_climatology: bool = False) -> xr.DataArray:
+        """the normalised rank (0 - 100) of each value in `da` against
+        the stored climatology of its `time_period`.
+
+        Arguments:
+        ---------
+        da: xr.DataArray
+            the (rolling sums of the) new observations to score
+
+        in_climatology: bool = False
+            whether the values of `da` are members of the climatology
+            (as when fitting). If False, each value is ranked as if it were
+            added to the climatology, as a refit would rank it
+        """
+        time_period = self.climatology.attrs["time_period"]
+        da = da.transpose("time", "lat", "lon")
+        periods = self.climatology[time_period].values
+        da_periods = da[f"time.{time_period}"].values
+        group_index = np.searchsorted(periods, da_periods).clip(
+            max=periods.shape[0] - 1
+        )
+        assert (periods[group_index] == da_periods).all(), (
+            f"Expected every {time_period} of `da` to be in the climatology "
+            f"({periods})"
+        )
+
+        sorted_values = self.climatology.sorted_values.values
+        rank_norm = climatology_rank_norm(
+            sorted_values.reshape(*sorted_values.shape[:2], -1),
+            self.climatology["size"].values,
+            da.values.reshape(da.shape[0], -1).astype(np.float64),
+            group_index,
+            in_climatology=in_climatology,
+        )
+        return da.copy(data=rank_norm.reshape(da.shape)).rename("rank_norm")
+
     def fit(
         self, variable: str, time_period: str = "month", rolling_window: int = 3
     ) -> None:
@@ -87,15 +247,10 @@ class DecileIndex(BaseIndices):
         ds_window = rolling_cumsum(self.ds, rolling_window)
 
         # 2. calculate the normalised rank (of each month) for the variable
-        out_variable = "rank_norm"
-        normalised_rank = apply_over_period(
-            ds_window,
-            self.rank_norm,
-            variable,
-            out_variable=out_variable,
-            time_str=time_period,
-        )
-        ds_window = ds_window.merge(normalised_rank.drop("month"))
+        # from the sorted climatology (of each month)
+        self.fit_climatology(ds_window[variable], time_period=time_period)
+        normalised_rank = self.score(ds_window[variable], in_climatology=True)
+        ds_window = ds_window.merge(normalised_rank.to_dataset(name="rank_norm"))
 
         # bin the normalised_rank into quintiles
         new_variable_name = "DecileIndex"
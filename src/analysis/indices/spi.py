@@ -1,7 +1,9 @@
+import numpy as np
 import xarray as xr
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-from typing import Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 from enum import Enum
 
 from .base import BaseIndices
@@ -9,6 +11,83 @@ from .base import BaseIndices
 climate_indices = None
 indices = None
 
+# the names of the fitting parameters for each distribution
+# (as expected by the `fitting_params` of `indices.spi`)
+FITTING_PARAMS = {
+    "gamma": ["alphas", "betas"],
+    "pearson": ["probabilities_of_zero", "locs", "scales", "skews"],
+}
+
+
+def _fit_spi_pixels(
+    values: np.ndarray,
+    scale: int,
+    distribution: Enum,
+    data_start_year: int,
+    calibration_year_initial: int,
+    calibration_year_final: int,
+    periodicity: Enum,
+    fitting_params: Optional[Dict[str, np.ndarray]] = None,
+) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """Fit the SPI for each pixel (column) of `values`, of shape (time, pixel).
+    This is a module level function so that it can be run in a process pool.
+
+    If `fitting_params` ({name: (period, pixel)}) are given, the distributions
+    are not refitted. Returns the SPI values (time, pixel) and the fitting
+    parameters of each pixel.
+    """
+    global climate_indices
+    global indices
+    if climate_indices is None:
+        import climate_indices
+    if indices is None:
+        from climate_indices import indices
+
+    param_names = FITTING_PARAMS[distribution.name]
+    compute_params = (
+        climate_indices.compute.gamma_parameters  # type: ignore
+        if distribution.name == "gamma"
+        else climate_indices.compute.pearson_parameters  # type: ignore
+    )
+
+    index = np.full(values.shape, np.nan)
+    params: Dict[str, List[np.ndarray]] = {name: [] for name in param_names}
+    for i in range(values.shape[1]):
+        if fitting_params is None:
+            # the parameters are fitted to the clipped, scaled values (as in indices.spi)
+            scaled_values = climate_indices.compute.sum_to_scale(  # type: ignore
+                np.clip(values[:, i], a_min=0, a_max=None), scale
+            )
+            pixel_params = dict(
+                zip(
+                    param_names,
+                    compute_params(
+                        scaled_values,
+                        data_start_year,
+                        calibration_year_initial,
+                        calibration_year_final,
+                        periodicity,
+                    ),
+                )
+            )
+        else:
+            pixel_params = {name: fitting_params[name][:, i] for name in param_names}
+
+        index[:, i] = indices.spi(  # type: ignore
+            values[:, i],
+            scale,
+            distribution,
+            data_start_year,
+            calibration_year_initial,
+            calibration_year_final,
+            periodicity,
+            fitting_params=pixel_params,
+        )
+        for name in param_names:
+            params[name].append(pixel_params[name])
+
+    return index, {name: np.stack(params[name], axis=-1) for name in param_names}
+
 
 class SPI(BaseIndices):
     """https://climatedataguide.ucar.edu/climate-data/
@@ -183,8 +262,12 @@ class SPI(BaseIndices):
         calibration_year_initial: Optional[int] = None,
         calibration_year_final: Optional[int] = None,
         periodicity: Optional[str] = "monthly",
+        num_workers: int = 0,
+        chunk_size: int = 100,
+        fitting_params: Optional[xr.Dataset] = None,
     ) -> None:
         """fit the index to self.ds writing to new self.index `xr.Dataset`
+        and the fitted distribution parameters to `self.fitting_params`
 
         Arguments:
         ---------
@@ -218,14 +301,23 @@ class SPI(BaseIndices):
             the periodicity of your data.
             {'monthly', 'daily'}
 
+        num_workers: int = 0
+            the number of processes used to fit the pixels. If 0, the pixels
+            are fitted in the main process
+
+        chunk_size: int = 100
+            the number of pixels fitted by each task. Pixels with no data
+            (e.g. the sea) are skipped
+
+        fitting_params: Optional[xr.Dataset] = None
+            the `self.fitting_params` of a previous fit (e.g. loaded from
+            `save_fitting_params`). If given, the distributions are not refitted,
+            so new months can be scored against the existing calibration
         """
         coords = [c for c in self.ds.coords]
         vars = [v for v in self.ds.variables if v not in coords]
         assert variable in vars, f"Must choose a variable from: {vars}"
 
-        # stack the lat-lon pairs into pixels
-        da = self.stack_pixels(self.ds[variable])
-
         # initialise the parameters (including enums from climate_indices)
         _, dist, _, _, _, _, period = self.initialise_params(
             scale,
@@ -247,35 +339,104 @@ class SPI(BaseIndices):
             "---------------\n",
         )
 
-        try:
-            index = xr.apply_ufunc(  # type: ignore
-                indices.spi,  # type: ignore
-                da,
+        da = self.ds[variable].transpose("time", "lat", "lon")
+        values = da.values.reshape(da.shape[0], -1)
+
+        param_names = FITTING_PARAMS[self.distribution]
+        pixel_params: Optional[Dict[str, np.ndarray]] = None
+        if fitting_params is not None:
+            for attr, value in [("distribution", self.distribution), ("scale", scale)]:
+                assert fitting_params.attrs[attr] == value, (
+                    f"The fitting_params were fitted with {attr}="
+                    f"{fitting_params.attrs[attr]}, not {value}"
+                )
+            pixel_params = {
+                name: fitting_params[name]
+                .transpose("period", "lat", "lon")
+                .values.reshape(fitting_params.period.shape[0], -1)
+                for name in param_names
+            }
+
+        # skip the pixels without any data (e.g. the sea)
+        valid_pixels = np.flatnonzero(~np.isnan(values).all(axis=0))
+        pixel_chunks = [
+            valid_pixels[i : i + chunk_size]
+            for i in range(0, valid_pixels.shape[0], chunk_size)
+        ]
+        print(
+            f"Fitting {valid_pixels.shape[0]} / {values.shape[1]} pixels "
+            f"in {len(pixel_chunks)} chunks"
+        )
+
+        chunk_args = [
+            (
+                values[:, pixels],
                 self.scale,
                 dist,
                 self.data_start_year,
                 self.calibration_year_initial,
                 self.calibration_year_final,
                 period,
+                None
+                if pixel_params is None
+                else {name: v[:, pixels] for name, v in pixel_params.items()},
             )
-        except ValueError as E:
-            print("** ValueError: ")
-            print(E)
-            print("\the current fix is rather nasty edit of xarray")
-            print(
-                "the indices.spi computation sometimes collapses the dimensionality"
-                " of the groupby object. "
-                "Therefore added some code to L578 "
-                "~/miniconda3/envs/crop/lib/python3.7/site-packages/xarray/core/computation.py)"
-                "\n> # TODO: TOMMY ADDED\n"
-                "\nif (data.ndim == 1) and (len(dims) == 2):"
-                "\n\tdata = np.expand_dims(data, -1)"
-                "\n"
-            )
-            print(
-                "I am pretty sure that this is probably something that we need to fix from the indices code"
-            )
-
-        self.index = index.unstack("point").to_dataset(name=f"SPI{scale}")
+            for pixels in pixel_chunks
+        ]
+        if num_workers == 0:
+            results = [_fit_spi_pixels(*args) for args in chunk_args]
+        else:
+            with ProcessPoolExecutor(max_workers=num_workers) as executor:
+                futures = [
+                    executor.submit(_fit_spi_pixels, *args) for args in chunk_args
+                ]
+                results = [future.result() for future in futures]
+
+        # reassemble the (time, lat, lon) index and (period, lat, lon) parameters
+        index = np.full(values.shape, np.nan)
+        params: Dict[str, np.ndarray] = {}
+        for pixels, (chunk_index, chunk_params) in zip(pixel_chunks, results):
+            index[:, pixels] = chunk_index
+            for name, value in chunk_params.items():
+                if name not in params:
+                    params[name] = np.full((value.shape[0], values.shape[1]), np.nan)
+                params[name][:, pixels] = value
+
+        self.index = xr.Dataset(
+            {f"SPI{scale}": (["time", "lat", "lon"], index.reshape(da.shape))},
+            coords={"time": da.time, "lat": da.lat, "lon": da.lon},
+        )
+        self.fitting_params = xr.Dataset(
+            {
+                name: (
+                    ["period", "lat", "lon"],
+                    value.reshape(value.shape[0], *da.shape[1:]),
+                )
+                for name, value in params.items()
+            },
+            coords={"lat": da.lat, "lon": da.lon},
+            attrs={
+                "distribution": self.distribution,
+                "scale": scale,
+                "data_start_year": self.data_start_year,
+                "calibration_year_initial": self.calibration_year_initial,
+                "calibration_year_final": self.calibration_year_final,
+                "periodicity": self.periodicity,
+            },
+        )
 
         print("Fitted SPI and stored at `obj.index`")
+
+    def save_fitting_params(self, data_dir: Path = Path("data")) -> Path:
+        """save the fitted distribution parameters (`self.fitting_params`)
+        to netcdf, so that they can be passed to `fit` to score new data
+        without refitting the distributions
+        """
+        analysis_dir = data_dir / "analysis" / "indices"
+        if not analysis_dir.exists():
+            analysis_dir.mkdir(parents=True, exist_ok=True)
+
+        file_path = analysis_dir / f"{self.name}_fitting_params.nc"
+        self.fitting_params.to_netcdf(file_path)
+        print(f"Saved {self.name} fitting params to {file_path.as_posix()}")
+        return file_path
@@ -1,8 +1,14 @@
 import xarray as xr
-from typing import Any
+from typing import Any, Dict, Optional, Tuple
 import numpy as np
 from pathlib import Path
 
+from src.utils import (
+    create_shape_aligned_climatology as _create_shape_aligned_climatology,
+)
+
+bottleneck = None
+
 
 def rolling_cumsum(ds: xr.Dataset, rolling_window: int = 3) -> xr.Dataset:
 
@@ -41,8 +47,35 @@ def apply_over_period(
     )
 
 
+def group_members(groups: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """ the position of each timestep's group (e.g. month) and its position
+    within that group, so that a (time, ...) array can be scattered into a
+    nan-padded (group, member, ...) array with `out[inverse, member] = values`
+
+    Returns:
+    -------
+    :np.ndarray
+        the (sorted) unique groups
+    :np.ndarray
+        the index (in the unique groups) of each timestep's group
+    :np.ndarray
+        the (chronological) position of each timestep within its group
+    """
+    unique_groups, inverse = np.unique(groups, return_inverse=True)
+    inverse = inverse.ravel()
+    order = np.argsort(inverse, kind="stable")
+    group_starts = np.searchsorted(inverse[order], inverse[order])
+    member = np.empty_like(inverse)
+    member[order] = np.arange(inverse.shape[0]) - group_starts
+    return unique_groups, inverse, member
+
+
 def create_shape_aligned_climatology(
-    ds: xr.Dataset, clim: xr.Dataset, variable: str, time_period: str = "month"
+    ds: xr.Dataset,
+    clim: xr.Dataset,
+    variable: str,
+    time_period: str = "month",
+    time_chunks: Optional[int] = None,
 ) -> xr.Dataset:
     """match the time dimension of `clim` to the shape of `ds` so that can
     perform simple calculations / arithmetic on the values of clim
@@ -58,35 +91,127 @@ def create_shape_aligned_climatology(
     time_period: str
         the period string used to calculate the climatology
          time_period = {'dayofyear', 'season', 'month'}
+    time_chunks: Optional[int] = None
+        if not None, return a lazy climatology that is gathered chunk by chunk
+        (see `src.utils.create_shape_aligned_climatology`)
     Notes:
         1. assumes that `lat` and `lon` are the
         coord names in ds
     """
-    ds[time_period] = ds[f"time.{time_period}"]
-    values = clim[variable].values
-    keys = clim[time_period].values
-    # map the `time_period` to the `values` of the climatology (threshold or mean)
-    lookup_dict = dict(zip(keys, values))
-    # extract an array of the `time_period` values from the `ds`
-    timevals = ds[time_period].values
-    # use the lat lon arrays (climatology values) in `lookup_dict` corresponding
-    #  to time_period values defined in `timevals` and stack into new array
-    new_clim_vals = np.stack([lookup_dict[timevals[i]] for i in range(len(timevals))])
-    assert (
-        new_clim_vals.shape == ds[variable].shape
-    ), f"\
-        Shapes for new_clim_vals and ds must match! \
-         new_clim_vals.shape: {new_clim_vals.shape} \
-         ds.shape: {ds[variable].shape}"
-    # copy that forward in time
-    new_clim = xr.Dataset(
-        {variable: (["time", "lat", "lon"], new_clim_vals)},
-        coords={"lat": clim.lat, "lon": clim.lon, "time": ds.time},
+    return _create_shape_aligned_climatology(
+        ds, clim, variable, time_period, time_chunks=time_chunks
+    )
+
+
+def _rank_over_time(da: xr.DataArray) -> xr.DataArray:
+    """ `da.rank(dim='time')`, which also works on (spatially chunked)
+    dask arrays """
+    global bottleneck
+    if bottleneck is None:
+        import bottleneck
+
+    return xr.apply_ufunc(
+        bottleneck.nanrankdata,  # type: ignore
+        da.astype(float),
+        input_core_dims=[["time"]],
+        output_core_dims=[["time"]],
+        kwargs={"axis": -1},
+        dask="parallelized",
+        output_dtypes=[float],
+    )
+
+
+def _median_over_time(da: xr.DataArray) -> xr.DataArray:
+    """ `da.median(dim='time')`, which also works on (spatially chunked)
+    dask arrays """
+    return xr.apply_ufunc(
+        np.nanmedian,
+        da.astype(float),
+        input_core_dims=[["time"]],
+        kwargs={"axis": -1},
+        dask="parallelized",
+        output_dtypes=[float],
+    )
+
+
+def _fit_all_indices_batch(
+    ds: xr.Dataset,
+    variable: str = "precip",
+    rolling_window: int = 3,
+    time_period: str = "month",
+) -> xr.Dataset:
+    """ fit the rolling-window indices from one rolling sum and one set of
+    grouped statistics (mean, median, std, rank and group size), rather
+    than recalculating them in each index's `fit`.
+    The outputs are the same as fitting each index with default parameters.
+    """
+    from src.analysis.indices import AnomalyIndex, SPI
+
+    # 1. the shared intermediates
+    ds_window = rolling_cumsum(ds, rolling_window)
+    da = ds_window[variable]
+    group = f"time.{time_period}"
+    grouped = da.groupby(group)
+    mean = grouped.mean(dim="time")
+    median = grouped.apply(_median_over_time)
+    std = grouped.std(dim="time")
+    # the number of timesteps in each group (including missing values)
+    n = da.time.groupby(group).count()
+    rank = grouped.apply(_rank_over_time).transpose(*da.dims)
+
+    def per_group(numerator: xr.DataArray, denominator: xr.DataArray) -> xr.DataArray:
+        return (numerator.groupby(group) / denominator).drop(time_period, errors="ignore")
+
+    # 2. derive the indices
+    zsi_median = per_group(da.groupby(group) - median, std)
+    zsi_mean = per_group(da.groupby(group) - mean, std)
+
+    def china_z(zsi: xr.DataArray) -> xr.DataArray:
+        cs = per_group(zsi ** 3, n)
+        return (
+            6.0 / cs * np.power((cs / 2.0 * zsi + 1.0), 1.0 / 3.0) - 6.0 / cs + cs / 6.0
+        )
+
+    rank_norm = per_group(rank - 1.0, n - 1.0)
+    out = xr.Dataset(
+        {
+            "ZSI": zsi_median,
+            "PNI": per_group(da, mean) * 100,
+            "DSI": 8.0 * (rank_norm - 0.5),
+            "CZI": china_z(zsi_mean),
+            "MCZI": china_z(zsi_median),
+            "rank_norm": rank_norm * 100,
+            "quintile": xr.apply_ufunc(
+                np.digitize,
+                da,
+                kwargs={"bins": [0.0, 20.0, 40.0, 60.0, 80.0]},
+                dask="parallelized",
+                output_dtypes=[np.int64],
+            ),
+            "RAI": AnomalyIndex.RAI(da, time_period=time_period),
+        }
+    )
+
+    # the SPI (which fits a distribution) is fitted from the already loaded data
+    spi = SPI(ds=ds)
+    spi.fit(variable=variable)
+
+    return xr.merge(
+        [
+            ds_window.rename({variable: f"{variable}_cumsum"}),
+            out,
+            spi.index,
+        ]
     )
-    return new_clim
 
 
-def fit_all_indices(data_path: Path, variable: str = "precip") -> xr.Dataset:
+def fit_all_indices(
+    data_path: Path,
+    variable: str = "precip",
+    batch: bool = False,
+    chunks: Optional[Dict[str, int]] = None,
+    out_path: Optional[Path] = None,
+) -> xr.Dataset:
     """ fit all indices and return one `xr.Dataset`
 
     Arguments:
@@ -97,10 +222,40 @@ def fit_all_indices(data_path: Path, variable: str = "precip") -> xr.Dataset:
     variable: str = 'precip'
         the name of the variable in `data_path`
 
+    batch: bool = False
+        if True, load the data once and calculate the rolling sum and
+        the grouped statistics shared by the indices once
+
+    chunks: Optional[Dict[str, int]] = None
+        if `batch`, the (spatial) dask chunks to load the data with,
+        e.g. {'lat': 100, 'lon': 100} for continental grids
+
+    out_path: Optional[Path] = None
+        if given, write the merged dataset to this netcdf file
+
     Note:
     - This is a utility method that fits all the indices
         using default parameters.
     """
+    if batch:
+        ds = xr.open_dataset(data_path, chunks=chunks)
+        ds = _fit_all_indices_batch(ds, variable=variable)
+    else:
+        ds = _fit_all_indices(data_path, variable=variable)
+
+    ds = ds.drop(
+        [v for v in ["month", f"{variable}_cumsum"] if v in ds.variables]
+    ).isel(time=slice(2, -1))
+
+    if out_path is not None:
+        ds.to_netcdf(out_path)
+        print(f"Saved all indices to {out_path.as_posix()}")
+
+    return ds
+
+
+def _fit_all_indices(data_path: Path, variable: str = "precip") -> xr.Dataset:
+    """ fit each index class from `data_path` and merge the indices """
     from src.analysis.indices import (
         ZScoreIndex,
         PercentNormalIndex,
@@ -140,7 +295,4 @@ def fit_all_indices(data_path: Path, variable: str = "precip") -> xr.Dataset:
     # join all indices -> 1 dataset
     print("Joining all variables into one `xr.dataset`")
     ds_objs = [index.index for index in out.values()]
-    ds = xr.merge(ds_objs)
-    ds = ds.drop(["month", "precip_cumsum"]).isel(time=slice(2, -1))
-
-    return ds
+    return xr.merge(ds_objs)
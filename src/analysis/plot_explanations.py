@@ -5,10 +5,17 @@ from matplotlib.figure import Figure
 
 import numpy as np
 from pathlib import Path
+import hashlib
 import pickle
+import shap
+import shutil
+import torch
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from copy import copy, deepcopy
 
 from typing import Dict, List, Tuple, Optional
 
+from ..models.data import TrainData
 from ..models.neural_networks.base import NNBase
 
 
@@ -133,19 +140,169 @@ def plot_explanations(
         plt.show()
 
 
+# the model (with its own explainer) of each explanation worker process
+_worker_model: Optional[NNBase] = None
+
+
+def _init_explanation_worker(
+    model: NNBase, method: str, background: Optional[List[torch.Tensor]]
+) -> None:
+    global _worker_model
+    # the workers run in parallel, so each gets a single thread
+    torch.set_num_threads(1)
+    if method == "shap":
+        model._set_fused(False)
+        model.explainer = shap.DeepExplainer(model.model, background)
+    _worker_model = model
+
+
+def _explain_batch(
+    batch_idx: int, x: TrainData, method: str, background_size: int
+) -> Tuple[int, Dict[str, np.ndarray]]:
+    assert _worker_model is not None
+    return batch_idx, _explanation_arrays(_worker_model, x, method, background_size)
+
+
+def _explanation_arrays(
+    model: NNBase, x: TrainData, method: str, background_size: int
+) -> Dict[str, np.ndarray]:
+    explanations = model.explain(
+        x=x,
+        save_explanations=False,
+        background_size=background_size,
+        start_idx=0,
+        num_inputs=x.historical.shape[0],
+        method=method,
+    )
+    return {
+        input_name: np.asarray(expl_array)
+        for input_name, expl_array in explanations.__dict__.items()
+        if expl_array is not None
+    }
+
+
+def _slice_train_data(x: TrainData, start_idx: int, end_idx: int) -> TrainData:
+    return TrainData(
+        **{
+            key: None if val is None else val[start_idx:end_idx].detach().clone()
+            for key, val in x.__dict__.items()
+        }
+    )
+
+
+def _checkpoint_key(model: NNBase, test_folder: Path, background_size: int) -> str:
+    """A hash of the model's weights, the test folder (and the modification times
+    of its files) and the background size, so that a checkpoint is only resumed
+    if it is explaining the same model on the same data
+    """
+    key = hashlib.md5(
+        f"{test_folder.resolve()}_{background_size}_".encode()
+        + "_".join(
+            f"{path.name}_{path.stat().st_mtime_ns}"
+            for path in sorted(test_folder.iterdir())
+        ).encode()
+    )
+    for name, tensor in model.model.state_dict().items():
+        key.update(name.encode())
+        key.update(tensor.detach().cpu().numpy().tobytes())
+    return key.hexdigest()
+
+
+class _ExplanationCheckpoint:
+    """The explanations of a file, written (batch by batch) into preallocated,
+    memory mapped arrays alongside a record of which batches are complete,
+    so that an interrupted run can be resumed.
+    """
+
+    def __init__(
+        self,
+        folder: Path,
+        method: str,
+        batch_starts: np.ndarray,
+        key: str,
+        resume: bool = True,
+    ) -> None:
+        self.folder = folder
+        self.method = method
+        self.batch_starts = batch_starts
+        self.arrays: Dict[str, np.ndarray] = {}
+
+        if self.folder.exists():
+            previous_batches = self.folder / "batch_starts.npy"
+            previous_key = self.folder / "key.txt"
+            if (
+                resume
+                and previous_batches.exists()
+                and previous_key.exists()
+                and np.array_equal(np.load(previous_batches), batch_starts)
+                and previous_key.read_text() == key
+            ):
+                self.done = np.load(self.folder / "done.npy")
+                for path in self.folder.glob(f"{method}_value_*.npy"):
+                    input_name = path.stem[len(f"{method}_value_") :]
+                    self.arrays[input_name] = np.lib.format.open_memmap(path, mode="r+")
+                print(f"Resuming from {self.done.sum()} completed batches")
+                return
+            shutil.rmtree(self.folder)
+
+        self.folder.mkdir(parents=True)
+        np.save(self.folder / "batch_starts.npy", batch_starts)
+        (self.folder / "key.txt").write_text(key)
+        self.done = np.zeros(len(batch_starts), dtype=bool)
+        self._save_done()
+
+    def _save_done(self) -> None:
+        # written to a temporary file first so that an interrupted
+        # save is never read as a record of the complete batches
+        tmp_path = self.folder / "done.tmp.npy"
+        np.save(tmp_path, self.done)
+        tmp_path.replace(self.folder / "done.npy")
+
+    def write(
+        self, batch_idx: int, explanations: Dict[str, np.ndarray], num_inputs: int
+    ) -> None:
+        start_idx = self.batch_starts[batch_idx]
+        for input_name, expl_array in explanations.items():
+            if input_name not in self.arrays:
+                self.arrays[input_name] = np.lib.format.open_memmap(
+                    self.folder / f"{self.method}_value_{input_name}.npy",
+                    mode="w+",
+                    dtype=expl_array.dtype,
+                    shape=(num_inputs,) + expl_array.shape[1:],
+                )
+            output_array = self.arrays[input_name]
+            output_array[start_idx : start_idx + expl_array.shape[0]] = expl_array
+            output_array.flush()
+        self.done[batch_idx] = True
+        self._save_done()
+
+    def finalize(self, output_folder: Path) -> None:
+        """Move the completed arrays to the output folder"""
+        assert self.done.all(), f"{(~self.done).sum()} batches are not complete"
+        for input_name in list(self.arrays):
+            self.arrays.pop(input_name).flush()
+            filename = f"{self.method}_value_{input_name}.npy"
+            (self.folder / filename).replace(output_folder / filename)
+        shutil.rmtree(self.folder)
+
+
 def all_explanations_for_file(
     test_folder: Path,
     model: NNBase,
     background_size: int = 100,
     batch_size: int = 100,
     method="shap",
+    num_workers: int = 0,
+    resume: bool = True,
 ) -> None:
     """
     Calculate all the shap values for a single file (i.e. for all the
     data instances in that file).
 
     The calculated shap values are saved in the model's analysis folder
-    (i.e. model_dir / 'analysis').
+    (i.e. model_dir / 'analysis'). Each batch is written to a checkpoint
+    in this folder as it is completed, so an interrupted run picks up
+    where it stopped.
 
     Warning: this function can take quite a while to run.
 
@@ -162,6 +319,13 @@ def all_explanations_for_file(
     batch_size: int = 100
         The size of the batches to use when calculating shap values. If you are getting memory
         errors, reducing this is a good place to start
+    num_workers: int = 0
+        The number of processes across which to split the batches. Each process explains
+        its batches with its own copy of the model (and explainer), with the same
+        background samples. If 0, the batches are explained in this process
+    resume: bool = True
+        If True, the completed batches of a previous (interrupted) run with the same
+        batch_size, background_size, model weights and test data are not recalculated
     """
 
     data_path = test_folder.parents[3]
@@ -176,40 +340,6 @@ def all_explanations_for_file(
 
     key, val = list(next(iter(test_arrays_loader)).items())[0]
 
-    output_dict: Dict[str, np.ndarray] = {}
-
-    num_inputs = val.x.historical.shape[0]
-    print(f"Calculating {method} values for {num_inputs} instances")
-    start_idx = 0
-
-    while start_idx < num_inputs:
-        print(
-            f"Calculating {method} values for indices {start_idx} to {start_idx + batch_size}"
-        )
-        var_names = None
-        if start_idx == 0:
-            var_names = val.x_vars
-        explanations = model.explain(
-            x=val.x,
-            var_names=var_names,
-            save_explanations=False,
-            background_size=background_size,
-            start_idx=start_idx,
-            num_inputs=num_inputs,
-        )
-
-        if start_idx == 0:
-            for input_name, expl_array in explanations.__dict__.items():
-                output_dict[input_name] = expl_array
-        else:
-            for input_name, expl_array in explanations.__dict__.items():
-                output_dict[input_name] = np.concatenate(
-                    (output_dict[input_name], expl_array), axis=0
-                )
-        start_idx = start_idx + batch_size
-
-    print("Saving results")
-
     analysis_folder = model.model_dir / "analysis"
 
     # this assumes the test file was taken from the data directory, in which case the
@@ -220,8 +350,74 @@ def all_explanations_for_file(
     if not file_id_folder.exists():
         file_id_folder.mkdir(parents=True)
 
-    for output_type, shap_array in output_dict.items():
-        np.save(file_id_folder / f"{method}_value_{output_type}.npy", shap_array)
+    num_inputs = val.x.historical.shape[0]
+    batch_starts = np.arange(0, num_inputs, batch_size)
+    checkpoint = _ExplanationCheckpoint(
+        file_id_folder / f".{method}_checkpoint",
+        method,
+        batch_starts,
+        _checkpoint_key(model, test_folder, background_size),
+        resume,
+    )
+    remaining = np.flatnonzero(~checkpoint.done)
+    print(
+        f"Calculating {method} values for {num_inputs} instances "
+        f"({len(remaining)} batches of {batch_size} remaining)"
+    )
+
+    if num_workers == 0:
+        for batch_idx in remaining:
+            start_idx = batch_starts[batch_idx]
+            print(
+                f"Calculating {method} values for indices {start_idx} to "
+                f"{min(start_idx + batch_size, num_inputs)}"
+            )
+            explanations = _explanation_arrays(
+                model,
+                _slice_train_data(val.x, start_idx, start_idx + batch_size),
+                method,
+                background_size,
+            )
+            checkpoint.write(batch_idx, explanations, num_inputs)
+    elif len(remaining) > 0:
+        background = None
+        if method == "shap":
+            background = [
+                tensor.cpu()
+                for tensor in model._get_background(sample_size=background_size)
+            ]
+        # the workers build their own explainers
+        worker_model = copy(model)
+        worker_model.explainer = None
+        worker_model.model = deepcopy(model.model).cpu()
+        worker_model.device = "cpu"
+
+        with ProcessPoolExecutor(
+            max_workers=num_workers,
+            initializer=_init_explanation_worker,
+            initargs=(worker_model, method, background),
+        ) as executor:
+            futures = [
+                executor.submit(
+                    _explain_batch,
+                    batch_idx,
+                    _slice_train_data(
+                        val.x,
+                        batch_starts[batch_idx],
+                        batch_starts[batch_idx] + batch_size,
+                    ),
+                    method,
+                    background_size,
+                )
+                for batch_idx in remaining
+            ]
+            for num_complete, future in enumerate(as_completed(futures), start=1):
+                batch_idx, explanations = future.result()
+                checkpoint.write(batch_idx, explanations, num_inputs)
+                print(f"Completed {num_complete} of {len(remaining)} batches")
+
+    print("Saving results")
+    checkpoint.finalize(file_id_folder)
 
     with (file_id_folder / "input_ModelArray.pkl").open("wb") as f:
         pickle.dump(val, f)
@@ -3,8 +3,10 @@ import xarray as xr
 import pandas as pd
 from datetime import datetime
 from typing import Tuple, Dict, Optional, List
+import numpy as np
 
 from .base import RegionAnalysis
+from .region_index import RegionIndex, zonal_statistics
 
 # from .region_geo_plotter import RegionGeoPlotter
 
@@ -17,12 +19,14 @@ class AdministrativeRegionAnalysis(RegionAnalysis):
         data_dir: Path = Path("data"),
         experiment: str = "one_month_forecast",
         true_data_experiment: str = "one_month_forecast",
+        batch: bool = False,
     ):
         super().__init__(
             data_dir=data_dir,
             experiment=experiment,
             true_data_experiment="one_month_forecast",
             admin_boundaries=self.admin_boundaries,
+            batch=batch,
         )
 
     @staticmethod
@@ -68,8 +72,14 @@ class AdministrativeRegionAnalysis(RegionAnalysis):
         pred_da: xr.DataArray,
         true_da: xr.DataArray,
         datetime: datetime,
+        region_index: Optional[RegionIndex] = None,
     ) -> Tuple[List, List, List, List]:
         """compute the mean values in the DataArray for each region
+
+        region_index: Optional[RegionIndex] = None
+            the index of the pixels in each region of region_lookup.
+            If None, it is built from region_da
+
         Returns:
         --------
         datetimes: List
@@ -83,10 +93,6 @@ class AdministrativeRegionAnalysis(RegionAnalysis):
         """
         # For each region calculate mean `target_variable` in true / pred
         valid_region_ids: List = [k for k in region_lookup.keys()]
-        region_names: List = []
-        predicted_mean_value: List = []
-        true_mean_value: List = []
-        datetimes: List = []
 
         # check the shapes match
         pred_latlon_shape = (pred_da.lat.shape[0], pred_da.lon.shape[0])
@@ -98,19 +104,24 @@ class AdministrativeRegionAnalysis(RegionAnalysis):
             " and the same reference_nc_file to regrid onto same reference_grid"
         )
 
-        for valid_region_id in valid_region_ids:
-            region_names.append(region_lookup[valid_region_id])
-            predicted_mean_value.append(
-                pred_da.where(region_da == valid_region_id).mean().values
-            )
-            true_mean_value.append(
-                true_da.where(region_da == valid_region_id).mean().values
-            )
-            # assert true_da.time == pred_da.time, 'time must be matching!'
-            datetimes.append(datetime)
+        if region_index is None:
+            region_index = RegionIndex.build(region_da.values, valid_region_ids)
+        # gather the pixels of every region at once
+        predicted_mean_value, true_mean_value = zonal_statistics(
+            np.stack([pred_da.values.flatten(), true_da.values.flatten()]),
+            region_index,
+        )["mean"]
+
+        region_names: List = [region_lookup[k] for k in region_index.region_ids]
+        datetimes: List = [datetime for _ in region_names]
 
         assert len(region_names) == len(predicted_mean_value) == len(datetimes)
-        return datetimes, region_names, predicted_mean_value, true_mean_value
+        return (
+            datetimes,
+            region_names,
+            list(predicted_mean_value),
+            list(true_mean_value),
+        )
 
     def _analyze_single(self, region_data_path: Path) -> Optional[pd.DataFrame]:
         """For a single shapefile (with multiple regions) calculate
@@ -132,11 +143,18 @@ class AdministrativeRegionAnalysis(RegionAnalysis):
         region_da, region_lookup, region_group_name = self.load_region_data(
             region_data_path
         )
+        region_index = RegionIndex.load_or_build(
+            region_data_path,
+            [k for k in region_lookup.keys()],
+            labels=lambda: region_da.values,
+            cache_dir=self.region_index_dir,
+        )
         return self._base_analyze_single(
             admin_level_name=admin_level_name,
             region_da=region_da,
             region_lookup=region_lookup,
             region_group_name=region_group_name,
+            region_index=region_index,
         )
 
     def analyze(
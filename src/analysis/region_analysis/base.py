@@ -9,6 +9,7 @@ from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
 import itertools
 
 from .region_geo_plotter import RegionGeoPlotter
+from .region_index import RegionIndex, zonal_statistics
 
 
 class RegionAnalysis:
@@ -34,6 +35,7 @@ class RegionAnalysis:
     :self.features_dir: Path
     :self.models: List[str]
     :self.admin_boundaries: bool
+    :self.batch: bool
 
     TODO:
     # train or test `true` data ?
@@ -47,6 +49,7 @@ class RegionAnalysis:
         true_data_experiment: str = "one_month_forecast",
         models: Union[List[str], None] = None,
         admin_boundaries: bool = True,
+        batch: bool = False,
     ):
         """Base RegionAnalysis class.
 
@@ -64,6 +67,12 @@ class RegionAnalysis:
             a list of models (as strings)
 
         :admin_boundaries: bool = True
+
+        :batch: bool = False
+            if True, load the true data and all of the models' predictions
+            once, and calculate the region means for all models and timesteps
+            with a precomputed region label index. The error metrics are then
+            calculated with a single groupby over the observed groups
         """
         self.pred_variable: Optional[str] = None
         self.true_variable: Optional[str] = None
@@ -112,9 +121,15 @@ class RegionAnalysis:
         self.out_dir: Path = data_dir / "analysis" / "region_analysis"
         if not self.out_dir.exists():
             self.out_dir.mkdir(parents=True, exist_ok=True)
+        # memory-mapped indexes of the pixels in each region
+        self.region_index_dir: Path = data_dir / "analysis" / "region_index"
 
         self.df: Optional[pd.DataFrame] = None
 
+        self.batch: bool = batch
+        # (datetimes, true (time, pixel), preds (model, time, pixel))
+        self._batch_data: Optional[Tuple[List, np.ndarray, np.ndarray]] = None
+
         print(f"Initialised the Region Analysis for experiment: {self.experiment}")
         print(f"Models: {self.models}")
         print(f"Regions: {[r.name for r in self.region_data_paths]}")
@@ -196,7 +211,57 @@ class RegionAnalysis:
         )
         return rmse, mae, r2
 
+    def compute_grouped_error_metrics(self, group_columns: List[str]) -> pd.DataFrame:
+        """Calculate the rmse, mae and r2 of the region mean values for each
+        group in `self.df` in a single groupby, matching `compute_error_metrics`.
+        Only the groups present in `self.df` are returned.
+        """
+        assert self.df is not None, (
+            "This method requires `self.analyze`"
+            "to have been run. Have you run the `analyze()` method?"
+        )
+        df = self.df[group_columns + ["predicted_mean_value", "true_mean_value"]]
+        df = df.astype(
+            {"predicted_mean_value": "float", "true_mean_value": "float"}
+        ).dropna(how="any")
+        error = df.predicted_mean_value - df.true_mean_value
+        df = df.assign(
+            squared_error=error ** 2,
+            absolute_error=error.abs(),
+            true_squared=df.true_mean_value ** 2,
+        )
+
+        sums = df.groupby(group_columns, sort=False).agg(
+            count=("true_mean_value", "size"),
+            true_sum=("true_mean_value", "sum"),
+            true_squared=("true_squared", "sum"),
+            squared_error=("squared_error", "sum"),
+            absolute_error=("absolute_error", "sum"),
+        )
+        total_squares = (sums.true_squared - sums.true_sum ** 2 / sums["count"]).clip(
+            lower=0
+        )
+        # matching sklearn's r2_score for constant true values
+        r2 = np.where(
+            np.isclose(total_squares, 0),
+            np.where(sums.squared_error == 0, 1.0, 0.0),
+            1 - sums.squared_error / total_squares.where(total_squares > 0),
+        )
+        r2[sums["count"].values < 2] = np.nan
+
+        return pd.DataFrame(
+            {
+                "rmse": np.sqrt(sums.squared_error / sums["count"]),
+                "mae": sums.absolute_error / sums["count"],
+                "r2": r2,
+            },
+            index=sums.index,
+        ).reset_index()
+
     def compute_global_error_metrics(self) -> pd.DataFrame:
+        if self.batch:
+            return self.compute_grouped_error_metrics(["model", "admin_level_name"])
+
         models = []
         admin_regions = []
         rmses = []
@@ -245,6 +310,11 @@ class RegionAnalysis:
         """calculate the mean error in each Region over time
         (12 test months by default).
         """
+        if self.batch:
+            return self.compute_grouped_error_metrics(
+                ["model", "admin_level_name", "region_name"]
+            )
+
         assert self.df is not None, (
             "require `RegionAnalysis.df`. Has" " `RegionAnalysis.analyze()` been run?"
         )
@@ -313,6 +383,100 @@ class RegionAnalysis:
         )
         return geoplotter
 
+    def load_batch_data(self) -> Tuple[List, np.ndarray, np.ndarray]:
+        """Load the true data and the predictions of all the models once,
+        caching them for every region analysed.
+
+        Returns:
+        --------
+        datetimes: List
+            the (sorted) datetimes of the true data
+        true_values: np.ndarray
+            the true values, of shape (time, pixel)
+        pred_values: np.ndarray
+            the predicted values, of shape (model, time, pixel). nan where
+            the model has no predictions for that timestep
+        """
+        if self._batch_data is not None:
+            return self._batch_data
+
+        datetimes: List = []
+        true_values: List = []
+        pred_values: List[List] = [[] for _ in self.models]
+        for true_data_path in self.features_dir.glob("*/y.nc"):
+            true_da = self.load_true_data(true_data_path)
+            dt = self.read_xr_datetime(true_da)
+            datetimes.append(dt)
+            true_values.append(true_da.values.flatten())
+
+            for model_idx, model in enumerate(self.models):
+                preds_data_path = self.get_pred_data_on_timestep(
+                    datetime=dt, model=model
+                )
+                if not preds_data_path.exists():
+                    warnings.warn(
+                        f"{preds_data_path.parents[0] / preds_data_path.name} does not exist"
+                    )
+                    pred_values[model_idx].append(None)
+                    continue
+                pred_da = self.load_prediction_data(preds_data_path)
+                pred_values[model_idx].append(pred_da.values.flatten())
+                assert pred_values[model_idx][-1].shape == true_values[-1].shape, (
+                    "Expect the lat/lon shapes to match in the true and "
+                    f"predicted data for {model} at {dt}"
+                )
+
+        order = np.argsort(datetimes, kind="stable")
+        true_np = np.stack(true_values)[order]
+        missing = np.full_like(true_np[0], np.nan, dtype=np.float64)
+        preds_np = np.stack(
+            [
+                np.stack([missing if v is None else v for v in model_values])[order]
+                for model_values in pred_values
+            ]
+        )
+        self._batch_data = ([datetimes[i] for i in order], true_np, preds_np)
+        return self._batch_data
+
+    def _batch_region_dfs(
+        self, admin_level_name: str, region_index: RegionIndex, region_names: List[str]
+    ) -> Dict[str, pd.DataFrame]:
+        """Calculate the mean true and predicted values in each region for
+        all the models and timesteps at once.
+
+        Returns:
+        --------
+        {model: pd.DataFrame} with the same columns as `_base_analyze_single`,
+        skipping the timesteps without predictions for that model
+        """
+        datetimes, true_np, preds_np = self.load_batch_data()
+        num_models, num_times = preds_np.shape[:2]
+        num_regions = region_index.num_regions
+
+        # (time, region) and (model, time, region)
+        true_means = zonal_statistics(true_np, region_index)["mean"]
+        pred_means = zonal_statistics(
+            preds_np.reshape(num_models * num_times, -1), region_index
+        )["mean"].reshape(num_models, num_times, num_regions)
+        available = ~np.isnan(preds_np).all(axis=-1)
+
+        model_dfs: Dict[str, pd.DataFrame] = {}
+        for model_idx, model in enumerate(self.models):
+            times = np.flatnonzero(available[model_idx])
+            if times.shape[0] == 0:
+                continue
+            model_dfs[model] = pd.DataFrame(
+                {
+                    "admin_level_name": admin_level_name,
+                    "model": model,
+                    "datetime": np.repeat([datetimes[t] for t in times], num_regions),
+                    "region_name": np.tile(region_names, times.shape[0]),
+                    "predicted_mean_value": pred_means[model_idx, times].flatten(),
+                    "true_mean_value": true_means[times].flatten(),
+                }
+            )
+        return model_dfs
+
     def _base_analyze_single(
         self,
         admin_level_name: str,
@@ -320,6 +484,7 @@ class RegionAnalysis:
         region_lookup: Optional[Dict] = None,
         region_group_name: Optional[str] = None,
         landcover_das: Optional[List[xr.DataArray]] = None,
+        region_index: Optional[RegionIndex] = None,
     ) -> Optional[pd.DataFrame]:
         # RUN CHECKS FOR CORRECT INPUTS
         if self.admin_boundaries:
@@ -341,6 +506,30 @@ class RegionAnalysis:
             )
 
         print(f"* Analyzing for {admin_level_name} *")
+        if region_index is None:
+            if self.admin_boundaries:
+                region_index = RegionIndex.build(
+                    region_da.values, [k for k in region_lookup.keys()]  # type: ignore
+                )
+            else:
+                region_index = RegionIndex.build(
+                    self.landcover_labels(landcover_das),  # type: ignore
+                    list(range(len(landcover_das))),  # type: ignore
+                )
+
+        if self.batch:
+            if self.admin_boundaries:
+                region_names = [
+                    region_lookup[k] for k in region_index.region_ids  # type: ignore
+                ]
+            else:
+                region_names = [
+                    self.create_lc_name(da.name) for da in landcover_das  # type: ignore
+                ]
+            batch_dfs = self._batch_region_dfs(
+                admin_level_name, region_index, region_names
+            )
+
         all_model_dfs = []
         for model in self.models:
             print(f"\n** Analyzing for {model}-{admin_level_name} **")
@@ -349,7 +538,11 @@ class RegionAnalysis:
                 (self.out_dir / model).mkdir(exist_ok=True, parents=True)
 
             dfs = []
-            true_data_paths = [f for f in self.features_dir.glob("*/y.nc")]
+            true_data_paths = (
+                [] if self.batch else [f for f in self.features_dir.glob("*/y.nc")]
+            )
+            if self.batch and model in batch_dfs:
+                dfs.append(batch_dfs[model])
             # convert this to funciton
             for true_data_path in true_data_paths:
                 # load the required data
@@ -379,6 +572,7 @@ class RegionAnalysis:
                         pred_da=pred_da,
                         region_lookup=region_lookup,
                         datetime=dt,
+                        region_index=region_index,
                     )
                 else:
                     (
@@ -387,7 +581,11 @@ class RegionAnalysis:
                         predicted_mean_value,
                         true_mean_value,
                     ) = self.compute_mean_statistics(  # type: ignore
-                        landcover_das, true_da=true_da, pred_da=pred_da, datetime=dt
+                        landcover_das,
+                        true_da=true_da,
+                        pred_da=pred_da,
+                        datetime=dt,
+                        region_index=region_index,
                     )
 
                 # store as pandas object and add to
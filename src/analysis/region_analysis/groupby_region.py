@@ -2,10 +2,12 @@ from pathlib import Path
 from typing import Optional, Dict, Tuple, List
 from collections import namedtuple
 
+import numpy as np
 import xarray as xr
 import pandas as pd
 
 from src.utils import drop_nans_and_flatten
+from .region_index import RegionIndex, zonal_statistics
 
 gpd = None
 GeoDataFrame = None
@@ -45,6 +47,7 @@ class GroupbyRegion:
         self.out_dir: Path = self.data_dir / "analysis" / "region_analysis"
         if not self.out_dir.exists():
             self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.region_index_dir: Path = self.data_dir / "analysis" / "region_index"
 
         self.da: xr.DataArray
         self.selection: str
@@ -159,11 +162,18 @@ class GroupbyRegion:
         print("* Calculating DataFrame of values per Region *")
         admin_level_name = self.admin_bound.var_name
         if mean:
+            region_index = RegionIndex.load_or_build(
+                self.region_data_path,
+                [k for k in region_lookup.keys()],
+                labels=lambda: region_da.values,
+                cache_dir=self.region_index_dir,
+            )
             df = self.calculate_mean_per_region(
                 da=self.da,
                 region_da=region_da,
                 region_lookup=region_lookup,
                 admin_level_name=admin_level_name,
+                region_index=region_index,
             )
         else:
             df = self.get_values_for_region(
@@ -241,14 +251,53 @@ class GroupbyRegion:
         # implemented by the child classes (specific for each country)
         assert NotImplementedError
 
+    @staticmethod
+    def calculate_zonal_statistics(
+        da: xr.DataArray,
+        region_da: xr.DataArray,
+        region_ids: List[int],
+        region_index: Optional[RegionIndex] = None,
+    ) -> Dict[str, np.ndarray]:
+        """Calculate the mean, count, std, min and max of the non-nan values
+        in each region for every timestep in one vectorised pass.
+
+        region_index: Optional[RegionIndex] = None
+            a (cached) index of the pixels in each of `region_ids`.
+            If None, it is built from `region_da`
+
+        Returns:
+        -------
+        :Dict[str, np.ndarray]
+            {statistic: array of shape (len(region_ids), len(da.time))}.
+            Statistics are nan where a region has no valid values
+        """
+        if region_index is None:
+            region_index = RegionIndex.build(region_da.values, region_ids)
+        assert list(region_index.region_ids) == list(region_ids)
+
+        values = da.transpose("time", "lat", "lon").values
+        statistics = zonal_statistics(values.reshape(values.shape[0], -1), region_index)
+        # (time, region) -> (region, time)
+        return {name: statistic.T for name, statistic in statistics.items()}
+
     @staticmethod
     def calculate_mean_per_region(
         da: xr.DataArray,
         region_da: xr.DataArray,
         region_lookup: Dict,
         admin_level_name: str,
+        all_statistics: bool = False,
+        region_index: Optional[RegionIndex] = None,
     ) -> pd.DataFrame:
-        """For each region in region_da calculate the mean """
+        """For each region in region_da calculate the mean
+
+        all_statistics: bool = False
+            if True, also return the count, std, min and max
+            of the values for each time-region
+
+        region_index: Optional[RegionIndex] = None
+            a (cached) index of the pixels in each region of region_lookup
+        """
         assert region_da.shape == (da.lat.shape[0], da.lon.shape[0]), (
             "Require matching shapes"
             f"region_da.shape: {region_da.shape}. da.shape: {da.shape}."
@@ -259,31 +308,25 @@ class GroupbyRegion:
         )
 
         valid_region_ids: List = [k for k in region_lookup.keys()]
-        region_names: List = []
-        mean_values: List = []
-        datetimes: List = []
-        admin_level_names: List = []
-
-        # TODO: SLOW code how can we speed up?
-        # for each time / region calculate the
-        for valid_region_id in valid_region_ids:
-            for time in da.time.values:
-                region_names.append(region_lookup[valid_region_id])
-                datetimes.append(time)
-                admin_level_names.append(admin_level_name)
-                # calculate the mean value for that time-region
-                mean_values.append(
-                    da.sel(time=time).where(region_da == valid_region_id).mean().values
-                )
+        statistics = GroupbyRegion.calculate_zonal_statistics(
+            da, region_da, valid_region_ids, region_index=region_index
+        )
 
-        assert len(region_names) == len(mean_values) == len(datetimes)
-        return pd.DataFrame(
+        # one row per time-region, ordered by region then time
+        num_times = da.time.shape[0]
+        df = pd.DataFrame(
             {
-                "datetime": datetimes,
-                "region_name": region_names,
-                "mean_value": mean_values,
+                "datetime": np.tile(da.time.values, len(valid_region_ids)),
+                "region_name": np.repeat(
+                    [region_lookup[k] for k in valid_region_ids], num_times
+                ),
+                "mean_value": statistics["mean"].flatten(),
             }
         )
+        if all_statistics:
+            for statistic in ["count", "std", "min", "max"]:
+                df[f"{statistic}_value"] = statistics[statistic].flatten()
+        return df
 
     @staticmethod
     def join_dataframe_geodataframe(
@@ -1,23 +1,30 @@
 from pathlib import Path
 import xarray as xr
 from datetime import datetime
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 import string
 
+import numpy as np
+
 from .base import RegionAnalysis
+from .region_index import RegionIndex, zonal_statistics
 
 
 class LandcoverRegionAnalysis(RegionAnalysis):
     admin_boundaries = False
 
     def __init__(
-        self, data_dir: Path = Path("data"), experiment: str = "one_month_forecast"
+        self,
+        data_dir: Path = Path("data"),
+        experiment: str = "one_month_forecast",
+        batch: bool = False,
     ):
 
         super().__init__(
             data_dir=data_dir,
             experiment=experiment,
             admin_boundaries=self.admin_boundaries,
+            batch=batch,
         )
 
     @staticmethod
@@ -30,6 +37,16 @@ class LandcoverRegionAnalysis(RegionAnalysis):
             .replace(" ", "_")
         )
 
+    @staticmethod
+    def landcover_labels(landcover_das: List[xr.DataArray]) -> np.ndarray:
+        """Convert the one_hot_encoded landcover masks into the index
+        (in `landcover_das`) of the landcover class of each pixel
+        (nan for pixels without a class)
+        """
+        # because one-hot-encoded only select where value == 1
+        masks = np.stack([landcover_da.values == 1 for landcover_da in landcover_das])
+        return np.where(masks.any(axis=0), masks.argmax(axis=0), np.nan)
+
     def load_landcover_data(self, region_data_path: Path) -> List[xr.DataArray]:
         # load the one_hot_encoded preprocessed landcover data
         landcover_ds: xr.Dataset = xr.open_dataset(region_data_path)
@@ -50,8 +67,13 @@ class LandcoverRegionAnalysis(RegionAnalysis):
         pred_da: xr.DataArray,
         true_da: xr.DataArray,
         datetime: datetime,
+        region_index: Optional[RegionIndex] = None,
     ) -> Tuple[List, List, List, List]:
         """
+        region_index: Optional[RegionIndex] = None
+            the index of the pixels in each landcover class.
+            If None, it is built from landcover_das
+
         Returns:
         --------
         datetimes: List
@@ -63,30 +85,43 @@ class LandcoverRegionAnalysis(RegionAnalysis):
         true_mean_value: List
             the mean true value for ROI
         """
+        if region_index is None:
+            region_index = RegionIndex.build(
+                self.landcover_labels(landcover_das), list(range(len(landcover_das)))
+            )
         # For each region calculate mean `target_variable` in true / pred
-        region_names: List = []
-        predicted_mean_value: List = []
-        true_mean_value: List = []
-        datetimes: List = []
-
-        for landcover_da in landcover_das:
-            lc_name = self.create_lc_name(landcover_da.name)
-            region_names.append(lc_name)
-            # because one-hot-encoded only select where value == 1
-            predicted_mean_value.append(pred_da.where(landcover_da == 1).mean().values)
-            true_mean_value.append(true_da.where(landcover_da == 1).mean().values)
-            # assert true_da.time == pred_da.time, 'time must be matching!'
-            datetimes.append(datetime)
+        predicted_mean_value, true_mean_value = zonal_statistics(
+            np.stack([pred_da.values.flatten(), true_da.values.flatten()]),
+            region_index,
+        )["mean"]
+
+        region_names: List = [
+            self.create_lc_name(landcover_da.name) for landcover_da in landcover_das
+        ]
+        datetimes: List = [datetime for _ in region_names]
 
         assert len(region_names) == len(predicted_mean_value) == len(datetimes)
-        return datetimes, region_names, predicted_mean_value, true_mean_value
+        return (
+            datetimes,
+            region_names,
+            list(predicted_mean_value),
+            list(true_mean_value),
+        )
 
     def _analyze_single(self, region_data_path: Path):
         landcover_das = self.load_landcover_data(region_data_path)
+        region_index = RegionIndex.load_or_build(
+            region_data_path,
+            list(range(len(landcover_das))),
+            labels=lambda: self.landcover_labels(landcover_das),
+            cache_dir=self.region_index_dir,
+        )
 
         admin_level_name = "landcover"
         return self._base_analyze_single(
-            admin_level_name=admin_level_name, landcover_das=landcover_das
+            admin_level_name=admin_level_name,
+            landcover_das=landcover_das,
+            region_index=region_index,
         )
 
     def analyze(
@@ -0,0 +1,203 @@
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+import hashlib
+import shutil
+
+import numpy as np
+
+
+class RegionIndex:
+    """A CSR-style index of the flattened pixels in each region of a grid.
+
+    The pixels of region `region_ids[i]` are `pixels[indptr[i]: indptr[i + 1]]`,
+    so statistics can be calculated by gathering these pixels directly
+    rather than masking the full grid once per region.
+
+    Attributes:
+    -----------
+    :region_ids: np.ndarray
+    :indptr: np.ndarray
+    :pixels: np.ndarray
+    :shape: Tuple[int, int]
+    """
+
+    def __init__(
+        self,
+        region_ids: np.ndarray,
+        indptr: np.ndarray,
+        pixels: np.ndarray,
+        shape: Tuple[int, ...],
+    ) -> None:
+        assert indptr.shape[0] == region_ids.shape[0] + 1
+        self.region_ids = region_ids
+        self.indptr = indptr
+        self.pixels = pixels
+        self.shape = tuple(int(s) for s in shape)
+
+    @property
+    def num_regions(self) -> int:
+        return self.region_ids.shape[0]
+
+    @property
+    def region_idx(self) -> np.ndarray:
+        """the position in `region_ids` of the region of each indexed pixel"""
+        return np.repeat(np.arange(self.num_regions), np.diff(self.indptr))
+
+    def region_pixels(self, region_id: int) -> np.ndarray:
+        i = int(np.flatnonzero(self.region_ids == region_id)[0])
+        return self.pixels[self.indptr[i] : self.indptr[i + 1]]
+
+    @classmethod
+    def build(cls, labels: np.ndarray, region_ids: List) -> "RegionIndex":
+        """Build the index from a 2D array of region labels
+
+        Arguments:
+        ---------
+        labels: np.ndarray
+            the region id of each pixel (nan for pixels outside of any region)
+
+        region_ids: List
+            the region ids to index. Pixels with any other label are ignored
+        """
+        ids = np.asarray(region_ids)
+        num_regions = ids.shape[0]
+        flat_labels = labels.flatten()
+        sorted_ids = np.sort(ids)
+        in_region = np.isfinite(flat_labels)
+        flat_labels = np.where(in_region, flat_labels, sorted_ids[0]).astype(int)
+        positions = np.searchsorted(sorted_ids, flat_labels).clip(max=num_regions - 1)
+        in_region &= sorted_ids[positions] == flat_labels
+        region_idx = np.argsort(ids)[positions[in_region]]
+
+        # sort the pixels by region so that each region is a contiguous block
+        order = np.argsort(region_idx, kind="stable")
+        indptr = np.searchsorted(region_idx[order], np.arange(num_regions + 1))
+        return cls(ids, indptr, np.flatnonzero(in_region)[order], labels.shape)
+
+    def save(self, index_dir: Path) -> None:
+        index_dir.mkdir(parents=True, exist_ok=True)
+        for name in ["region_ids", "indptr", "pixels"]:
+            np.save(index_dir / f"{name}.npy", getattr(self, name))
+        np.save(index_dir / "shape.npy", np.array(self.shape))
+
+    @classmethod
+    def load(cls, index_dir: Path, mmap: bool = True) -> "RegionIndex":
+        mmap_mode = "r" if mmap else None
+        return cls(
+            **{
+                name: np.load(index_dir / f"{name}.npy", mmap_mode=mmap_mode)
+                for name in ["region_ids", "indptr", "pixels"]
+            },
+            shape=tuple(np.load(index_dir / "shape.npy")),
+        )
+
+    @classmethod
+    def load_or_build(
+        cls,
+        source_path: Path,
+        region_ids: List,
+        labels: Callable[[], np.ndarray],
+        cache_dir: Optional[Path],
+    ) -> "RegionIndex":
+        """Load the (memory-mapped) index of the region file at `source_path`
+        from the `cache_dir`, building and saving it if it doesn't exist.
+        The cache is keyed on the source file's size and modification time,
+        so a re-run of the preprocessor invalidates it.
+
+        Arguments:
+        ---------
+        source_path: Path
+            the preprocessed region (or landcover) netcdf file
+
+        region_ids: List
+            the region ids to index
+
+        labels: Callable[[], np.ndarray]
+            returns the 2D array of labels; only called if the index is built
+
+        cache_dir: Optional[Path]
+            where to store the index. If None, the index is not persisted
+        """
+        if cache_dir is None:
+            return cls.build(labels(), region_ids)
+
+        stat = source_path.stat()
+        key = hashlib.md5(
+            f"{source_path.resolve()}_{stat.st_size}_{stat.st_mtime_ns}_"
+            f"{list(region_ids)}".encode()
+        ).hexdigest()[:12]
+        index_dir = cache_dir / f"{source_path.stem}_{key}"
+
+        if not (index_dir / "shape.npy").exists():
+            print(f"Building the region index for {source_path.name}")
+            # write to a temporary directory so that an interrupted save
+            # is never read as a complete index
+            tmp_dir = cache_dir / f".{index_dir.name}.tmp"
+            if tmp_dir.exists():
+                shutil.rmtree(tmp_dir)
+            cls.build(labels(), region_ids).save(tmp_dir)
+            if index_dir.exists():
+                shutil.rmtree(index_dir)
+            tmp_dir.rename(index_dir)
+
+        return cls.load(index_dir)
+
+
+def zonal_statistics(values: np.ndarray, index: RegionIndex) -> Dict[str, np.ndarray]:
+    """Calculate the mean, count, std, min and max of the non-nan values
+    in each region for every row of `values` (e.g. every timestep).
+
+    The mean, count and std are accumulated with `np.bincount`, and the
+    min and max with `np.fmin.reduceat` / `np.fmax.reduceat` over the
+    gathered pixels (which are contiguous for each region).
+
+    Arguments:
+    ---------
+    values: np.ndarray
+        the values to summarise, of shape (rows, pixels)
+
+    index: RegionIndex
+        the index of the pixels in each region
+
+    Returns:
+    -------
+    :Dict[str, np.ndarray]
+        {statistic: array of shape (rows, index.num_regions)}.
+        Statistics are nan where a region has no valid values
+    """
+    num_rows, num_regions = values.shape[0], index.num_regions
+    assert values.shape[1] == int(np.prod(index.shape)), (
+        f"Expect {int(np.prod(index.shape))} pixels (the region grid: {index.shape}), "
+        f"got {values.shape[1]}. Are the data on the same grid as the regions?"
+    )
+    values = values[:, index.pixels].astype(np.float64)
+
+    notnan = ~np.isnan(values)
+    bins = (
+        index.region_idx[np.newaxis, :]
+        + num_regions * np.arange(num_rows)[:, np.newaxis]
+    )[notnan]
+    minlength = num_rows * num_regions
+    count = np.bincount(bins, minlength=minlength)
+    total = np.bincount(bins, weights=values[notnan], minlength=minlength)
+    total_squares = np.bincount(bins, weights=values[notnan] ** 2, minlength=minlength)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = total / count
+        std = np.sqrt(np.maximum(total_squares / count - mean ** 2, 0))
+
+    minimum = np.full((num_rows, num_regions), np.nan)
+    maximum = np.full((num_rows, num_regions), np.nan)
+    present = np.flatnonzero(np.diff(index.indptr) > 0)
+    if present.shape[0] > 0:
+        starts = index.indptr[present]
+        minimum[:, present] = np.fmin.reduceat(values, starts, axis=1)
+        maximum[:, present] = np.fmax.reduceat(values, starts, axis=1)
+
+    return {
+        "mean": mean.reshape(num_rows, num_regions),
+        "count": count.reshape(num_rows, num_regions),
+        "std": std.reshape(num_rows, num_regions),
+        "min": minimum,
+        "max": maximum,
+    }
@@ -45,6 +45,10 @@ class Engineer:
         target_variable: str = "VHI",
         pred_months: int = 12,
         expected_length: Optional[int] = 12,
+        incremental: bool = False,
+        num_workers: int = 0,
+        output_format: str = "folders",
+        time_chunks: Optional[int] = None,
     ) -> None:
         """
         Take all the preprocessed data generated by the preprocessing classes, and turn it
@@ -60,9 +64,26 @@ class Engineer:
             If this is not None and an x array has a different time dimension size, the array
             is ignored. This differs from pred_months if the preprocessors are run with a
             time granularity different from `'M'`
+        :param incremental: Whether to only rewrite the train and test folders whose data
+            has changed since the last incremental run. A manifest of the data in each
+            folder is kept in the experiment's features folder
+        :param num_workers: The number of processes used to write the netcdf files. If 0, the
+            files are written by the main process
+        :param output_format: One of `{'folders', 'store'}`. If `'store'`, instead of a folder of
+            x.nc and y.nc files per target month, the data is written once to a single store
+            with an index of each target month's time slices, which the DataLoader reads from
+        :param time_chunks: If not None, the preprocessed files are opened lazily (using dask)
+            with this many timesteps per chunk, joined in a single step and read in parallel
         """
         self.engineer_class.engineer(
-            test_year, target_variable, pred_months, expected_length
+            test_year,
+            target_variable,
+            pred_months,
+            expected_length,
+            incremental,
+            num_workers,
+            output_format,
+            time_chunks,
         )
 
     @staticmethod
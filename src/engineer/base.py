@@ -1,12 +1,39 @@
 import numpy as np
+import calendar
 from collections import defaultdict
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, date
 from pathlib import Path
+import hashlib
+import json
+import pandas as pd
 import pickle
+import shutil
+import time
 import xarray as xr
 import warnings
 
-from typing import cast, DefaultDict, Dict, List, Optional, Union, Tuple
+from typing import (
+    cast,
+    Any,
+    DefaultDict,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Union,
+    Tuple,
+)
+
+from ..utils import minus_months
+
+
+def _write_datasets(ds_dict: Dict[str, xr.Dataset], output_location: Path) -> None:
+    for x_or_y, output_ds in ds_dict.items():
+        print(f"Saving data to {output_location.as_posix()}/{x_or_y}.nc")
+        output_ds.to_netcdf(output_location / f"{x_or_y}.nc")
 
 
 class _EngineerBase:
@@ -37,15 +64,44 @@ class _EngineerBase:
             if not self.static_output_folder.exists():
                 self.static_output_folder.mkdir(parents=True)
 
+        # used by incremental runs. _stale_folders is None if the
+        # run is not incremental
+        self._input_fingerprints: Dict[str, Dict[str, Any]] = {}
+        self._previous_folders: Dict[str, Dict[str, Any]] = {}
+        self._folder_inputs: Dict[str, Dict[str, List[int]]] = {}
+        self._stale_folders: Optional[Set[str]] = None
+        self._changed_folders: List[str] = []
+
+        # used to write the netcdf files in parallel
+        self._save_executor: Optional[ProcessPoolExecutor] = None
+        self._save_futures: List[Future] = []
+
+        # used if output_format == "store". _store_index is None otherwise
+        self._store_index: Optional[List[Dict[str, Any]]] = None
+        self._store_times: Optional[np.ndarray] = None
+
     def engineer(
         self,
         test_year: Union[int, List[int]],
         target_variable: str = "VHI",
         pred_months: int = 12,
         expected_length: Optional[int] = 12,
+        incremental: bool = False,
+        num_workers: int = 0,
+        output_format: str = "folders",
+        time_chunks: Optional[int] = None,
     ) -> None:
 
-        self._process_dynamic(test_year, target_variable, pred_months, expected_length)
+        self._process_dynamic(
+            test_year,
+            target_variable,
+            pred_months,
+            expected_length,
+            incremental,
+            num_workers,
+            output_format,
+            time_chunks,
+        )
         if self.process_static:
             self._process_static()
 
@@ -90,42 +146,407 @@ class _EngineerBase:
         target_variable: str = "VHI",
         pred_months: int = 12,
         expected_length: Optional[int] = 12,
+        incremental: bool = False,
+        num_workers: int = 0,
+        output_format: str = "folders",
+        time_chunks: Optional[int] = None,
     ) -> None:
+        """
+        If incremental is True, a manifest of the preprocessed files (path, size and
+        mtime) used by each output folder, and of the engineer config, is kept in
+        self.output_folder / manifest.json. Only the windows of folders whose data
+        has changed since the last incremental run are loaded, stratified and
+        rewritten (unchanged files are not read), and the normalizing dict is
+        updated from running statistics.
+
+        If num_workers > 0, the netcdf files are written by a pool of num_workers
+        processes.
+
+        If output_format is "store", rather than writing a {train, test}/{year}_{month}
+        folder of x.nc and y.nc files per target month, the (deduplicated) data is
+        written once to self.output_folder / store/data.nc, alongside an index of the
+        time slices of it which make up each target month's x and y (store/index.csv).
+
+        If time_chunks is not None, the preprocessed files are joined lazily, with
+        time_chunks timesteps per chunk, and read in parallel (requires dask)
+        """
+        assert output_format in {
+            "folders",
+            "store",
+        }, f"output_format must be one of {{folders, store}}, got {output_format}"
+        assert not (
+            incremental and output_format == "store"
+        ), "The incremental mode is only supported by the folders output format"
+
         if expected_length is None:
             warnings.warn(
                 "** `expected_length` is None. This means that \
             missing data will not be skipped. Are you sure? **"
             )
 
-        # read in all the data from interim/{var}_preprocessed
-        data = self._make_dataset(static=False)
-
         # ensure test_year is List[int]
         if type(test_year) is int:
             test_year = [cast(int, test_year)]
+        test_year = sorted(cast(List, test_year))
+
+        # test_year is not part of the config, so that moving the test year forwards
+        # only writes the folders (and normalizing values) for the new training data
+        config = {
+            "target_variable": target_variable,
+            "pred_months": pred_months,
+            "expected_length": expected_length,
+        }
+        manifest = self._start_manifest(config, incremental)
+
+        # read in all the data from interim/{var}_preprocessed. It is loaded into
+        # memory once, so that each x, y window is a slice of it
+        data = self._make_dataset(static=False, time_chunks=time_chunks)
+        if incremental:
+            # the normalizing values are updated from the (lazy) training data, and
+            # only the timesteps of the stale windows are loaded
+            min_test_date = np.datetime64(str(self._max_train_date(test_year[0], 1)))
+            lazy_train_ds = data.isel(time=data.time.values <= min_test_date)
+            data = self._load_stale_windows(data, test_year, pred_months, manifest)
+        else:
+            data = self._load_dataset(data)
+
+        store_folder = self.output_folder / "store"
+        if store_folder.exists():
+            # the DataLoader reads from the store if it exists, so a stale
+            # one must be removed
+            shutil.rmtree(store_folder)
+        if output_format == "store":
+            data = data.sortby("time")
+            self._store_index = []
+            self._store_times = data.time.values
+
+        with self._save_pool(num_workers):
+            # save test data (x, y) and return the train_ds (subset of `data`)
+            train_ds = self._train_test_split(
+                ds=data,
+                years=cast(List, test_year),
+                target_variable=target_variable,
+                pred_months=pred_months,
+                expected_length=expected_length,
+            )
+
+            if not incremental:
+                normalization_values = self._calculate_normalization_values(train_ds)
+
+            # split train_ds into x, y for each year-month before `test_year` & save
+            self._stratify_training_data(
+                train_ds=train_ds,
+                target_variable=target_variable,
+                pred_months=pred_months,
+                expected_length=expected_length,
+            )
+
+        if incremental:
+            normalization_values, normalizing_statistics = self._update_normalization_values(
+                lazy_train_ds, manifest
+            )
+
+        savepath = self.output_folder / "normalizing_dict.pkl"
+        normalization_changed = True
+        if incremental and savepath.exists():
+            # the DataLoader's cached (normalized) arrays are invalidated whenever
+            # the normalizing dict is rewritten, so it is only rewritten if it changed
+            with savepath.open("rb") as f:
+                normalization_changed = pickle.load(f) != normalization_values
+        if normalization_changed:
+            with savepath.open("wb") as f:
+                pickle.dump(normalization_values, f)
+
+        if incremental:
+            self._finish_manifest(config, normalizing_statistics)
+
+        if output_format == "store":
+            self._save_store(data, store_folder)
+
+    def _save_store(self, data: xr.Dataset, store_folder: Path) -> None:
+        """Write the data cube, chunked along time so that each window only
+        reads its own timesteps, and the index of the windows
+        """
+        assert self._store_index is not None
+        store_folder.mkdir()
+
+        encoding = {
+            var: {
+                "chunksizes": tuple(
+                    1 if dim == "time" else data[var].sizes[dim] for dim in data[var].dims
+                )
+            }
+            for var in data.data_vars
+            if "time" in data[var].dims
+        }
+        print(f"Saving data to {store_folder.as_posix()}/data.nc")
+        data.to_netcdf(store_folder / "data.nc", encoding=encoding)
+
+        # the index is written last, since the DataLoader only uses stores which have one
+        pd.DataFrame(self._store_index).to_csv(store_folder / "index.csv", index=False)
+
+        self._store_index = None
+        self._store_times = None
 
-        # save test data (x, y) and return the train_ds (subset of `data`)
-        train_ds = self._train_test_split(
-            ds=data,
-            years=cast(List, test_year),
-            target_variable=target_variable,
-            pred_months=pred_months,
-            expected_length=expected_length,
+    def _store_entry(
+        self, ds_dict: Dict[str, xr.Dataset], year: int, month: int, dataset_type: str
+    ) -> Dict[str, Any]:
+        """The time slices of the store's data cube which make up ds_dict"""
+        assert self._store_times is not None
+
+        x_times = ds_dict["x"].time.values
+        x_start = int(np.searchsorted(self._store_times, x_times[0], side="left"))
+        x_end = int(np.searchsorted(self._store_times, x_times[-1], side="right"))
+        assert x_end - x_start == len(
+            x_times
+        ), f"The x data for {year}_{month} is not a contiguous slice of the data"
+
+        y_var = list(ds_dict["y"].data_vars)[0]
+        y_time = ds_dict["y"].time.values[0]
+        return {
+            "split": dataset_type,
+            "name": f"{year}_{month}",
+            "target_time": str(y_time),
+            "target_variable": y_var,
+            "x_start": x_start,
+            "x_end": x_end,
+            "y_index": int(np.searchsorted(self._store_times, y_time, side="left")),
+        }
+
+    def _start_manifest(self, config: Dict[str, Any], incremental: bool) -> Dict:
+        """Load the manifest written by the previous incremental run. If the run
+        is not incremental, the manifest is removed, since the outputs it describes
+        are about to be overwritten
+        """
+        manifest_path = self.output_folder / "manifest.json"
+        self._changed_folders = []
+
+        if not incremental:
+            self._stale_folders = None
+            if manifest_path.exists():
+                manifest_path.unlink()
+            return {}
+
+        self._stale_folders = set()
+        self._folder_inputs = {}
+        manifest: Dict = {}
+        if manifest_path.exists():
+            with manifest_path.open("r") as f:
+                manifest = json.load(f)
+            if (manifest.get("config") != config) or ("inputs" not in manifest):
+                print("The engineer config has changed! All folders will be rewritten")
+                manifest = {}
+        self._previous_folders = manifest.get("folders", {})
+        return manifest
+
+    def _finish_manifest(
+        self, config: Dict[str, Any], normalizing_statistics: Dict[str, Any]
+    ) -> None:
+        assert self._stale_folders is not None
+        print(f"Incremental run: rewrote {len(self._changed_folders)} folders")
+
+        folders = {}
+        for folder_key, inputs in self._folder_inputs.items():
+            if folder_key in self._stale_folders:
+                saved = folder_key in self._changed_folders
+            else:
+                saved = self._previous_folders[folder_key]["saved"]
+            folders[folder_key] = {"inputs": inputs, "saved": saved}
+
+        manifest = {
+            "config": config,
+            "inputs": self._input_fingerprints,
+            "folders": folders,
+            "normalizing_statistics": normalizing_statistics,
+        }
+        # written last, so that an interrupted run is never considered up to date
+        with (self.output_folder / "manifest.json").open("w") as f:
+            json.dump(manifest, f)
+        self._stale_folders = None
+
+    def _fingerprint_inputs(
+        self, previous_inputs: Dict[str, Dict[str, Any]]
+    ) -> Dict[str, Dict[str, Any]]:
+        """The size and mtime of each preprocessed file, and a hash of each of its
+        timesteps. The hashes are only calculated for files which have changed since
+        the previous run; the other files are not read
+        """
+        inputs: Dict[str, Dict[str, Any]] = {}
+        for file in self._get_preprocessed_files(static=False):
+            stat = file.stat()
+            fingerprint: Dict[str, Any] = {
+                "size": stat.st_size,
+                "mtime": stat.st_mtime_ns,
+            }
+            previous = previous_inputs.get(file.as_posix())
+            if (previous is not None) and (
+                [previous["size"], previous["mtime"]]
+                == [fingerprint["size"], fingerprint["mtime"]]
+            ):
+                fingerprint["times"] = previous["times"]
+                fingerprint["hashes"] = previous["hashes"]
+            else:
+                print(f"{file} has changed; hashing its timesteps")
+                with xr.open_dataset(file) as ds:
+                    ds.load()
+                if "time" in ds.dims:
+                    ds = ds.sortby("time")
+                    fingerprint["times"] = [str(time) for time in ds.time.values]
+                    fingerprint["hashes"] = [
+                        self._fingerprint(ds.isel(time=idx))
+                        for idx in range(ds.time.size)
+                    ]
+                else:
+                    # files without a time dimension are part of every window
+                    fingerprint["times"] = None
+                    fingerprint["hashes"] = [self._fingerprint(ds)]
+            inputs[file.as_posix()] = fingerprint
+        return inputs
+
+    @staticmethod
+    def _fingerprint(ds: xr.Dataset) -> str:
+        """A hash of the variables, coordinates and attributes of the dataset"""
+        md5 = hashlib.md5()
+        md5.update(json.dumps(ds.attrs, sort_keys=True, default=str).encode())
+        for name in sorted(ds.variables):
+            variable = ds.variables[name]
+            md5.update(
+                json.dumps(
+                    [name, variable.dims, str(variable.dtype), variable.attrs],
+                    sort_keys=True,
+                    default=str,
+                ).encode()
+            )
+            md5.update(np.ascontiguousarray(variable.values).tobytes())
+        return md5.hexdigest()
+
+    @staticmethod
+    def _timestep_hashes(
+        fingerprints: Dict[str, Dict[str, Any]]
+    ) -> Dict[str, Tuple[Optional[np.ndarray], List[str]]]:
+        """The (parsed) times of each file's timesteps, and their hashes"""
+        return {
+            path: (
+                None
+                if fingerprint["times"] is None
+                else np.array(fingerprint["times"], dtype="datetime64[ns]"),
+                fingerprint["hashes"],
+            )
+            for path, fingerprint in fingerprints.items()
+        }
+
+    @staticmethod
+    def _hashes_between(
+        timestep_hashes: Tuple[Optional[np.ndarray], List[str]],
+        min_date: np.datetime64,
+        max_date: np.datetime64,
+    ) -> List[str]:
+        """The hashes of a file's timesteps in (min_date, max_date]. Files
+        without a time dimension are part of every window
+        """
+        times, hashes = timestep_hashes
+        if times is None:
+            return hashes
+        start, end = np.searchsorted(
+            times, np.array([min_date, max_date], dtype="datetime64[ns]"), side="right"
         )
+        return hashes[start:end]
 
-        normalization_values = self._calculate_normalization_values(train_ds)
+    def _load_stale_windows(
+        self,
+        data: xr.Dataset,
+        years: List[int],
+        pred_months: int,
+        manifest: Dict,
+    ) -> xr.Dataset:
+        """Find the (stale) folders whose windows of the preprocessed files have
+        changed since the previous incremental run, and load only the timesteps
+        of `data` which those windows need.
+
+        A folder is up to date if the files covering its window have the same size and
+        mtime as before. If a file has changed, the hashes of its timesteps in the
+        window are compared instead
+        """
+        assert self._stale_folders is not None
+        previous_inputs = manifest.get("inputs", {})
+        self._input_fingerprints = self._fingerprint_inputs(previous_inputs)
+        previous_hashes = self._timestep_hashes(previous_inputs)
+        current_hashes = self._timestep_hashes(self._input_fingerprints)
+
+        times = data.time.values
+        min_test_date = np.datetime64(str(self._max_train_date(years[0], 1)))
+        train_times = times[times <= min_test_date]
+        folder_targets = [("test", target) for target in self._test_targets(years)]
+        if len(train_times) > 0:
+            folder_targets.extend(
+                ("train", target)
+                for target in self._train_targets(train_times.min(), train_times.max())
+            )
 
-        # split train_ds into x, y for each year-month before `test_year` & save
-        self._stratify_training_data(
-            train_ds=train_ds,
-            target_variable=target_variable,
-            pred_months=pred_months,
-            expected_length=expected_length,
+        min_dates, max_dates = self._window_bounds(
+            [target for _, target in folder_targets], pred_months
         )
+        stale_bounds = []
+        for (dataset_type, (year, month)), min_date, max_date in zip(
+            folder_targets, min_dates, max_dates
+        ):
+            folder_key = f"{dataset_type}/{year}_{month}"
+            window_hashes = {
+                path: self._hashes_between(hashes, min_date, max_date)
+                for path, hashes in current_hashes.items()
+            }
+            inputs = {
+                path: [
+                    self._input_fingerprints[path]["size"],
+                    self._input_fingerprints[path]["mtime"],
+                ]
+                for path, hashes in window_hashes.items()
+                if len(hashes) > 0
+            }
+            self._folder_inputs[folder_key] = inputs
+
+            previous = self._previous_folders.get(folder_key)
+            output_location = self.output_folder / folder_key
+            if (
+                (previous is None)
+                or (previous["saved"] and not (output_location / "x.nc").exists())
+                or (set(previous["inputs"]) != set(inputs))
+            ):
+                stale = True
+            else:
+                # only the files which changed are compared
+                stale = any(
+                    self._hashes_between(previous_hashes[path], min_date, max_date)
+                    != window_hashes[path]
+                    for path in inputs
+                    if previous["inputs"][path] != inputs[path]
+                )
+            if stale:
+                self._stale_folders.add(folder_key)
+                stale_bounds.append((min_date, max_date))
 
-        savepath = self.output_folder / "normalizing_dict.pkl"
-        with savepath.open("wb") as f:
-            pickle.dump(normalization_values, f)
+        print(
+            f"Incremental run: {len(self._stale_folders)} of "
+            f"{len(folder_targets)} folders are stale"
+        )
+        if (times[1:] < times[:-1]).any():
+            # the windows aren't contiguous slices of the data
+            return self._load_dataset(data)
+        if len(stale_bounds) == 0:
+            return self._load_dataset(data.isel(time=slice(0, 0)))
+
+        # the windows are (min_date, max_date]
+        start = np.searchsorted(times, min(bounds[0] for bounds in stale_bounds), "right")
+        end = np.searchsorted(times, max(bounds[1] for bounds in stale_bounds), "right")
+        return self._load_dataset(data.isel(time=slice(start, end)))
+
+    def _is_stale(self, dataset_type: str, year: int, month: int) -> bool:
+        """Whether the folder needs to be (re)written. If the run
+        is not incremental, every folder does
+        """
+        if self._stale_folders is None:
+            return True
+        return f"{dataset_type}/{year}_{month}" in self._stale_folders
 
     def _get_preprocessed_files(self, static: bool) -> List[Path]:
         processed_files = []
@@ -138,14 +559,25 @@ class _EngineerBase:
                 processed_files.extend(list(subfolder.glob("*.nc")))
         return processed_files
 
-    def _make_dataset(self, static: bool, overwrite_dims: bool = False) -> xr.Dataset:
+    def _make_dataset(
+        self, static: bool, overwrite_dims: bool = False, time_chunks: Optional[int] = None
+    ) -> xr.Dataset:
+        """Join all the preprocessed datasets, keeping only the timesteps
+        they have in common. The files are opened lazily, so the joined dataset
+        is only read when it is loaded.
 
+        If time_chunks is not None, the files are opened as dask arrays with time_chunks
+        timesteps per chunk, so that the joined dataset is read in parallel.
+        """
         datasets = []
         dims = ["lon", "lat"]
         coords = {}
         for idx, file in enumerate(self._get_preprocessed_files(static)):
             print(f"Processing {file}")
-            datasets.append(xr.open_dataset(file))
+            dataset = xr.open_dataset(file)
+            if (time_chunks is not None) and ("time" in dataset.dims):
+                dataset = dataset.chunk({"time": time_chunks})
+            datasets.append(dataset)
 
             if idx == 0:
                 for dim in dims:
@@ -162,13 +594,24 @@ class _EngineerBase:
                         assert len(datasets[idx][dim].values) == len(coords[dim])
                         datasets[idx][dim] = coords[dim]
 
-        # join all preprocessed datasets
-        main_dataset = datasets[0]
-        for dataset in datasets[1:]:
-            # ensure equal timesteps ('inner' join)
-            main_dataset = main_dataset.merge(dataset, join="inner")
+        # join all preprocessed datasets in one step, keeping equal
+        # timesteps ('inner' join)
+        return xr.merge(datasets, join="inner")
 
-        return main_dataset
+    @staticmethod
+    def _load_dataset(data: xr.Dataset) -> xr.Dataset:
+        """Load the (lazily) joined data into memory, one variable at a time,
+        so that the time taken to read each source is reported
+        """
+        start = time.time()
+        for var in data.data_vars:
+            var_start = time.time()
+            # loads the variable in place
+            data.variables[var].load()
+            print(f"Read {var} in {time.time() - var_start:.2f}s")
+        data = data.load()
+        print(f"Loaded the joined data in {time.time() - start:.2f}s")
+        return data
 
     def _stratify_training_data(
         self,
@@ -180,23 +623,23 @@ class _EngineerBase:
         """split `train_ds` into x, y and save the outputs to
         self.output_folder (data/features) """
 
-        min_date = self._get_datetime(train_ds.time.values.min())
-        max_date = self._get_datetime(train_ds.time.values.max())
+        if train_ds.time.size == 0:
+            # in incremental runs, train_ds is empty if no training folders are stale
+            return None
 
-        cur_pred_year, cur_pred_month = max_date.year, max_date.month
+        targets = [
+            target
+            for target in self._train_targets(
+                train_ds.time.values.min(), train_ds.time.values.max()
+            )
+            if self._is_stale("train", *target)
+        ]
 
         # for every month-year create & save the x, y datasets for training
-        cur_min_date = max_date
-        while cur_min_date >= min_date:
-            # each iteration count down one month (02 -> 01 -> 12 ...)
-            arrays, cur_min_date = self._stratify_xy(
-                ds=train_ds,
-                year=cur_pred_year,
-                target_variable=target_variable,
-                target_month=cur_pred_month,
-                pred_months=pred_months,
-                expected_length=expected_length,
-            )
+        windows = self._stratify_windows(
+            train_ds, targets, target_variable, pred_months, expected_length
+        )
+        for (cur_pred_year, cur_pred_month), (arrays, _) in zip(targets, windows):
             if arrays is not None:
                 self._save(
                     arrays,
@@ -204,7 +647,6 @@ class _EngineerBase:
                     month=cur_pred_month,
                     dataset_type="train",
                 )
-            cur_pred_year, cur_pred_month = cur_min_date.year, cur_min_date.month
 
     def _train_test_split(
         self,
@@ -218,41 +660,109 @@ class _EngineerBase:
 
         years.sort()
 
-        # for the first `year` Jan calculate the xy_test dictionary and min date
-        xy_test, min_test_date = self._stratify_xy(
-            ds=ds,
-            year=years[0],
-            target_variable=target_variable,
-            target_month=1,
-            pred_months=pred_months,
-            expected_length=expected_length,
+        # the first `year` Jan is used to calculate the min test date
+        min_test_date = self._max_train_date(years[0], 1)
+
+        targets = [
+            target
+            for target in self._test_targets(years)
+            if self._is_stale("test", *target)
+        ]
+        windows = self._stratify_windows(
+            ds, targets, target_variable, pred_months, expected_length
         )
+        for (year, month), (xy_test, _) in zip(targets, windows):
+            if xy_test is not None:
+                self._save(xy_test, year=year, month=month, dataset_type="test")
 
         # the train_ds MUST BE from before minimum test date
         train_dates = ds.time.values <= np.datetime64(str(min_test_date))
         train_ds = ds.isel(time=train_dates)
 
-        # save the xy_test dictionary
-        if xy_test is not None:
-            self._save(xy_test, year=years[0], month=1, dataset_type="test")
-
-        # each month in test_year produce an x,y pair for testing
-        for year in years:
-            for month in range(1, 13):
-                if year > years[0] or month > 1:
-                    # prevents the initial test set from being recalculated
-                    xy_test, _ = self._stratify_xy(
-                        ds=ds,
-                        year=year,
-                        target_variable=target_variable,
-                        target_month=month,
-                        pred_months=pred_months,
-                        expected_length=expected_length,
-                    )
-                    if xy_test is not None:
-                        self._save(xy_test, year=year, month=month, dataset_type="test")
         return train_ds
 
+    @staticmethod
+    def _max_train_date(year: int, month: int) -> date:
+        """The last date of the inputs for the (year, month) target"""
+        _, _, max_train_date = minus_months(year, month, diff_months=1)
+        return cast(date, max_train_date)
+
+    @staticmethod
+    def _test_targets(years: List[int]) -> List[Tuple[int, int]]:
+        """Each month in the (sorted) years produces an x, y pair for testing"""
+        return [(year, month) for year in years for month in range(1, 13)]
+
+    def _train_targets(
+        self, min_time: np.datetime64, max_time: np.datetime64
+    ) -> List[Tuple[int, int]]:
+        min_date = self._get_datetime(min_time)
+        max_date = self._get_datetime(max_time)
+
+        # each target counts down one month (02 -> 01 -> 12 ...), until the
+        # month before the target is earlier than the min_date
+        targets = [(max_date.year, max_date.month)]
+        while True:
+            cur_pred_year, cur_pred_month, max_train_date = minus_months(
+                *targets[-1], diff_months=1
+            )
+            if cast(date, max_train_date) < min_date:
+                break
+            targets.append((cur_pred_year, cur_pred_month))
+        return targets
+
+    @staticmethod
+    def _window_bounds(
+        targets: List[Tuple[int, int]], pred_months: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """The (min_date, max_date] bounds of each target's window, as calculated
+        in _stratify_xy
+        """
+        min_dates, max_dates = [], []
+        for year, month in targets:
+            max_dates.append(str(date(year, month, calendar.monthrange(year, month)[-1])))
+            mx_year, mx_month, _ = minus_months(year, month, diff_months=1)
+            _, _, min_date = minus_months(mx_year, mx_month, diff_months=pred_months)
+            min_dates.append(str(min_date))
+        return (
+            np.array(min_dates, dtype="datetime64[D]"),
+            np.array(max_dates, dtype="datetime64[D]"),
+        )
+
+    def _stratify_windows(
+        self,
+        ds: xr.Dataset,
+        targets: List[Tuple[int, int]],
+        target_variable: str,
+        pred_months: int,
+        expected_length: Optional[int],
+    ) -> Iterator[Tuple[Optional[Dict[str, xr.Dataset]], date]]:
+        """Yield the output of self._stratify_xy for each (year, month) in targets.
+
+        If the time index of `ds` is sorted, the bounds of every target's window
+        are found in a single vectorised search, and _stratify_xy is only passed the
+        contiguous slice of `ds` which can fall in that window (rather than
+        filtering all of `ds` for every target). The outputs are unchanged.
+        """
+        times = ds.time.values
+        is_sorted = bool((times[1:] >= times[:-1]).all())
+
+        if is_sorted:
+            min_dates, max_dates = self._window_bounds(targets, pred_months)
+            # the windows are (min_date, max_date]
+            starts = np.searchsorted(times, min_dates, side="right")
+            ends = np.searchsorted(times, max_dates, side="right")
+
+        for idx, (year, month) in enumerate(targets):
+            window = ds.isel(time=slice(starts[idx], ends[idx])) if is_sorted else ds
+            yield self._stratify_xy(
+                ds=window,
+                year=year,
+                target_variable=target_variable,
+                target_month=month,
+                pred_months=pred_months,
+                expected_length=expected_length,
+            )
+
     def _stratify_xy(
         self,
         ds: xr.Dataset,
@@ -272,15 +782,49 @@ class _EngineerBase:
         self, ds_dict: Dict[str, xr.Dataset], year: int, month: int, dataset_type: str
     ) -> None:
 
-        save_folder = self.output_folder / dataset_type
-        save_folder.mkdir(exist_ok=True)
+        if self._store_index is not None:
+            self._store_index.append(
+                self._store_entry(ds_dict, year, month, dataset_type)
+            )
+            return None
 
+        save_folder = self.output_folder / dataset_type
         output_location = save_folder / f"{year}_{month}"
+
+        if self._stale_folders is not None:
+            # only stale folders are stratified in incremental runs
+            self._changed_folders.append(f"{dataset_type}/{year}_{month}")
+
+        save_folder.mkdir(exist_ok=True)
         output_location.mkdir(exist_ok=True)
 
-        for x_or_y, output_ds in ds_dict.items():
-            print(f"Saving data to {output_location.as_posix()}/{x_or_y}.nc")
-            output_ds.to_netcdf(output_location / f"{x_or_y}.nc")
+        if self._save_executor is not None:
+            self._save_futures.append(
+                self._save_executor.submit(_write_datasets, ds_dict, output_location)
+            )
+        else:
+            _write_datasets(ds_dict, output_location)
+
+    @contextmanager
+    def _save_pool(self, num_workers: int) -> Iterator[None]:
+        """Within this context, _save writes the netcdf files using a pool of
+        num_workers processes. All the files are written when the context exits
+        """
+        if num_workers == 0:
+            yield None
+            return None
+
+        self._save_executor = ProcessPoolExecutor(max_workers=num_workers)
+        self._save_futures = []
+        try:
+            yield None
+            for future in self._save_futures:
+                # raises any exceptions from the workers
+                future.result()
+        finally:
+            self._save_executor.shutdown()
+            self._save_executor = None
+            self._save_futures = []
 
     def _calculate_normalization_values(
         self, x_data: xr.Dataset
@@ -297,6 +841,106 @@ class _EngineerBase:
 
         return normalization_values
 
+    @staticmethod
+    def _calculate_sufficient_statistics(
+        x_data: xr.Dataset,
+    ) -> Dict[str, Dict[str, float]]:
+        """The count, mean and sum of squared differences from the mean (m2)
+        of the non NaN values of each variable
+        """
+        statistics: Dict[str, Dict[str, float]] = {}
+        for var in x_data.data_vars:
+            values = x_data[var].values.astype(np.float64)
+            values = values[~np.isnan(values)]
+            mean = float(values.mean()) if values.size > 0 else 0.0
+            statistics[var] = {
+                "count": float(values.size),
+                "mean": mean,
+                "m2": float(((values - mean) ** 2).sum()),
+            }
+        return statistics
+
+    @staticmethod
+    def _merge_sufficient_statistics(
+        a: Dict[str, float], b: Dict[str, float]
+    ) -> Dict[str, float]:
+        """Combine the statistics of two sets of values (Chan et al.'s parallel
+        algorithm), without the cancellation of a sum of squares
+        """
+        count = a["count"] + b["count"]
+        if count == 0:
+            return dict(a)
+        delta = b["mean"] - a["mean"]
+        return {
+            "count": count,
+            "mean": a["mean"] + delta * b["count"] / count,
+            "m2": a["m2"] + b["m2"] + delta ** 2 * a["count"] * b["count"] / count,
+        }
+
+    def _update_normalization_values(
+        self, x_data: xr.Dataset, manifest: Dict
+    ) -> Tuple[DefaultDict[str, Dict[str, float]], Dict[str, Any]]:
+        """Calculate the normalization values from running statistics. If the previous
+        incremental run covered a subset of the timesteps in x_data, and none of the
+        preprocessed files covering those timesteps have changed, only the new
+        timesteps are read and added to the statistics
+        """
+        times = [str(time) for time in x_data.time.values]
+        previous = manifest.get("normalizing_statistics")
+
+        revised = False
+        if (previous is not None) and (len(previous["times"]) > 0):
+            previous_inputs = manifest.get("inputs", {})
+            previous_times = np.array(previous["times"], dtype=x_data.time.dtype)
+            min_time = previous_times.min() - np.timedelta64(1, "ns")
+            max_time = previous_times.max()
+            previous_hashes = self._timestep_hashes(previous_inputs)
+            current_hashes = self._timestep_hashes(self._input_fingerprints)
+            # compare the hashes of the previous run's training timesteps in each
+            # file which was removed, added or rewritten
+            for path in set(previous_inputs) | set(self._input_fingerprints):
+                if previous_inputs.get(path) == self._input_fingerprints.get(path):
+                    continue
+                previous_training, training = [
+                    self._hashes_between(hashes[path], min_time, max_time)
+                    if path in hashes
+                    else []
+                    for hashes in [previous_hashes, current_hashes]
+                ]
+                revised = revised or (previous_training != training)
+        if (
+            (previous is None)
+            or revised
+            or (not set(previous["times"]).issubset(times))
+            or (set(previous["statistics"]) != set(x_data.data_vars))
+        ):
+            statistics = self._calculate_sufficient_statistics(x_data)
+        else:
+            new_times = [time for time in times if time not in set(previous["times"])]
+            print(f"Updating the normalizing dict with {len(new_times)} new timesteps")
+            statistics = previous["statistics"]
+            if len(new_times) > 0:
+                new_statistics = self._calculate_sufficient_statistics(
+                    x_data.sel(time=np.array(new_times, dtype=x_data.time.dtype))
+                )
+                for var, var_statistics in new_statistics.items():
+                    statistics[var] = self._merge_sufficient_statistics(
+                        statistics[var], var_statistics
+                    )
+
+        normalization_values: DefaultDict[str, Dict[str, float]] = defaultdict(dict)
+        for var, var_statistics in statistics.items():
+            count = var_statistics["count"]
+            if count == 0:
+                mean = std = np.nan
+            else:
+                mean = var_statistics["mean"]
+                std = float(np.sqrt(var_statistics["m2"] / count))
+            normalization_values[var]["mean"] = mean
+            normalization_values[var]["std"] = std
+
+        return normalization_values, {"times": times, "statistics": statistics}
+
     @staticmethod
     def _make_fill_value_dataset(
         ds: Union[xr.Dataset, xr.DataArray], fill_value: Union[int, float] = -9999.0
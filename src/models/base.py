@@ -305,9 +305,17 @@ class ModelBase:
         return x_in
 
     def _one_hot(self, x: np.ndarray, num_vals: int):
+        """one hot encode the values 1 to num_vals (other values are all zeros).
+        The ones are set directly, rather than indexing into an identity matrix,
+        which is (num_locations, num_locations) for static embeddings
+        """
         if len(x.shape) > 1:
             x = x.squeeze(-1)
-        return np.eye(num_vals + 2)[x][:, 1:-1]
+        x = x.astype(np.int64)
+        one_hot = np.zeros((x.shape[0], num_vals))
+        valid = (x >= 1) & (x <= num_vals)
+        one_hot[np.flatnonzero(valid), x[valid] - 1] = 1
+        return one_hot
 
     def get_dataloader(
         self, mode: str, to_tensor: bool = False, shuffle_data: bool = False, **kwargs
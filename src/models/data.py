@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from copy import copy
 from dataclasses import dataclass
 from datetime import datetime
 import numpy as np
@@ -7,12 +9,35 @@ import pandas as pd
 from pandas import Timestamp
 from random import shuffle
 from pathlib import Path
+import hashlib
+import json
 import pickle
+import threading
+import time
 import torch
 import xarray as xr
 
 from typing import cast, Dict, Optional, Union, List, Tuple
 
+# the netcdf4 / HDF5 libraries are not thread safe, so reads from
+# thread prefetching workers are serialized
+_NETCDF_LOCK = threading.Lock()
+
+# the iterator which each process prefetching worker loads folders with. It is
+# sent once, when the worker starts, so that each task only sends a folder path
+_worker_iterator: Optional["_BaseIter"] = None
+
+
+def _init_prefetch_worker(iterator: "_BaseIter") -> None:
+    global _worker_iterator
+    _worker_iterator = iterator
+
+
+def _prefetch_folder(folder: Path, clear_nans: bool) -> "ModelArrays":
+    assert _worker_iterator is not None
+    # tensors are only created on the iterating thread
+    return _worker_iterator.ds_folder_to_np(folder, clear_nans, False)
+
 
 @dataclass
 class TrainData:
@@ -211,6 +236,76 @@ def train_val_mask(
     return train_mask.tolist(), val_mask.tolist()
 
 
+class _FeatureStore:
+    """The consolidated features written by the engineer with output_format="store".
+
+    The data cube is stored once (store/data.nc), with an index (store/index.csv) of
+    the time slices of the cube which make up each target month's x and y. Each
+    target month is referred to by the {split}/{year}_{month} path it would have
+    had as a folder, so the DataLoader can treat the two formats in the same way.
+    """
+
+    def __init__(self, store_folder: Path) -> None:
+        self.store_folder = store_folder
+        self.index = {
+            (entry["split"], entry["name"]): entry
+            for entry in pd.read_csv(store_folder / "index.csv").to_dict("records")
+        }
+        # opened lazily, so that the store can be sent to worker processes
+        self._cube: Optional[xr.Dataset] = None
+
+    def __getstate__(self) -> Dict:
+        state = self.__dict__.copy()
+        state["_cube"] = None
+        return state
+
+    @property
+    def cube(self) -> xr.Dataset:
+        if self._cube is None:
+            self._cube = xr.open_dataset(self.store_folder / "data.nc")
+        return self._cube
+
+    def window_paths(self, split: str) -> List[Path]:
+        return [
+            self.store_folder / split / name
+            for entry_split, name in self.index
+            if entry_split == split
+        ]
+
+    def contains(self, folder: Path) -> bool:
+        return (folder.parent.name, folder.name) in self.index
+
+    def open_xy(self, folder: Path) -> Tuple[xr.Dataset, xr.Dataset]:
+        entry = self.index[(folder.parent.name, folder.name)]
+        x = self.cube.isel(time=slice(entry["x_start"], entry["x_end"])).load()
+
+        if entry["y_index"] < entry["x_end"]:
+            # the nowcast experiment includes the target timestep in x, with the
+            # target variable filled so that it isn't leaked
+            target_variable = entry["target_variable"]
+            x_target = x[target_variable]
+            target_time = self.cube.time.values[entry["y_index"]]
+            x_target = x_target.where(
+                x.time != target_time, np.array(-9999.0, dtype=x_target.dtype)
+            )
+            x = x.drop(target_variable).merge(x_target.to_dataset(name=target_variable))
+        return x, self.open_y(folder)
+
+    def open_y(self, folder: Path) -> xr.Dataset:
+        entry = self.index[(folder.parent.name, folder.name)]
+        return (
+            self.cube[[entry["target_variable"]]]
+            .isel(time=[entry["y_index"]])
+            .load()
+        )
+
+    def source_mtimes(self) -> Dict[str, float]:
+        return {
+            filename: (self.store_folder / filename).stat().st_mtime
+            for filename in ["data.nc", "index.csv"]
+        }
+
+
 class DataLoader:
     """Dataloader; lazily load the training and test data
     Attributes:
@@ -257,6 +352,19 @@ class DataLoader:
         instead of the raw target variable.
     normalize_y: bool = True
         Whether to normalize y
+    cache: bool = False
+        Whether to cache the processed arrays of each folder as `.npy` files, which are
+        memory-mapped on subsequent reads instead of decoding the netcdf files again. The cache
+        is stored in data_path / features / {experiment} / cache, and is keyed on all the
+        DataLoader arguments which change the output arrays
+    num_workers: int = 0
+        The number of workers used to load folders in the background. If 0, folders are loaded
+        by the iterating thread as they are needed
+    prefetch_depth: int = 2
+        The maximum number of folders queued for background loading. Only used if
+        num_workers > 0
+    worker_type: str {'thread', 'process'} = 'thread'
+        Whether the background workers are threads or processes
     """
 
     def __init__(
@@ -279,12 +387,17 @@ class DataLoader:
         device: str = "cpu",
         spatial_mask: Optional[xr.DataArray] = None,
         normalize_y: bool = False,
+        cache: bool = False,
+        num_workers: int = 0,
+        prefetch_depth: int = 2,
+        worker_type: str = "thread",
     ) -> None:
 
         self.batch_file_size = batch_file_size
         self.mode = mode
         self.shuffle = shuffle_data
         self.experiment = experiment
+        self.store = self._load_store(data_path, experiment)
         self.data_files = self._load_datasets(
             data_path=data_path,
             mode=mode,
@@ -330,9 +443,11 @@ class DataLoader:
             if static == "embeddings":
                 # in case no static dataset was generated, we use the first
                 # historical dataset
-                self.static, self.max_loc_int = self._loc_to_int(
-                    xr.open_dataset(self.data_files[0] / "x.nc")
-                )
+                if self.store is not None:
+                    first_x, _ = self.store.open_xy(self.data_files[0])
+                else:
+                    first_x = xr.open_dataset(self.data_files[0] / "x.nc")
+                self.static, self.max_loc_int = self._loc_to_int(first_x)
 
         self.device = torch.device(device)
         self.spatial_mask = spatial_mask
@@ -343,7 +458,56 @@ class DataLoader:
             ), f"The spatial mask uses NaNs to get rid of values - this requires clear_nans to be true"
         self.clear_nans = clear_nans
 
+        self.cache_folder: Optional[Path] = None
+        # the modification times of the files (other than each folder's x and y)
+        # which the arrays are calculated from, so that rewriting them
+        # invalidates the cache
+        self.cache_dependencies: Dict[str, float] = {}
+        if cache:
+            dependencies: List[Path] = []
+            if normalize:
+                dependencies.append(
+                    data_path / f"features/{experiment}/normalizing_dict.pkl"
+                )
+            if static == "features":
+                dependencies.append(data_path / "features/static/data.nc")
+                if normalize:
+                    dependencies.append(
+                        data_path / "features/static/normalizing_dict.pkl"
+                    )
+            self.cache_dependencies = {
+                "/".join(path.parts[-2:]): path.stat().st_mtime
+                for path in dependencies
+            }
+            cache_key = self._cache_key(
+                normalize=normalize,
+                surrounding_pixels=surrounding_pixels,
+                ignore_vars=ignore_vars,
+                monthly_aggs=monthly_aggs,
+                static=static,
+                predict_delta=predict_delta,
+                spatial_mask=spatial_mask,
+                normalize_y=normalize_y,
+                clear_nans=clear_nans,
+            )
+            self.cache_folder = (
+                data_path / f"features/{experiment}/cache/{cache_key}/{mode}"
+            )
+            self.cache_folder.mkdir(parents=True, exist_ok=True)
+
+        assert worker_type in {
+            "thread",
+            "process",
+        }, f"worker_type must be one of {{thread, process}}, got {worker_type}"
+        self.num_workers = num_workers
+        self.prefetch_depth = max(1, prefetch_depth)
+        self.worker_type = worker_type
+        # records how often the iterator had to wait on a background worker,
+        # so that num_workers and prefetch_depth can be sized
+        self.prefetch_stats: Dict[str, float] = {}
+
     def __iter__(self):
+        self.prefetch_stats = {"loaded": 0, "waited": 0, "wait_time": 0.0}
         if self.mode == "train":
             return _TrainIter(self)
         else:
@@ -352,6 +516,41 @@ class DataLoader:
     def __len__(self) -> int:
         return len(self.data_files) // self.batch_file_size
 
+    @staticmethod
+    def _cache_key(
+        normalize: bool,
+        surrounding_pixels: Optional[int],
+        ignore_vars: Optional[List[str]],
+        monthly_aggs: bool,
+        static: Optional[str],
+        predict_delta: bool,
+        spatial_mask: Optional[xr.DataArray],
+        normalize_y: bool,
+        clear_nans: bool,
+    ) -> str:
+        """Hash the arguments which change the arrays returned by the
+        iterators, so that differently configured DataLoaders never share a cache
+        """
+        config = {
+            # normalize is forced to be True if normalize_y is True
+            "normalize": normalize or normalize_y,
+            "surrounding_pixels": surrounding_pixels,
+            "ignore_vars": sorted(ignore_vars) if ignore_vars is not None else None,
+            "monthly_aggs": monthly_aggs,
+            "static": static,
+            "predict_delta": predict_delta,
+            "normalize_y": normalize_y,
+            "clear_nans": clear_nans,
+            "spatial_mask": None,
+        }
+        if spatial_mask is not None:
+            mask_hash = hashlib.md5(spatial_mask.values.tobytes())
+            for dim in ["lat", "lon"]:
+                mask_hash.update(spatial_mask[dim].values.tobytes())
+            config["spatial_mask"] = mask_hash.hexdigest()
+
+        return hashlib.md5(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
     @staticmethod
     def _loc_to_int(base_ds: xr.Dataset) -> Tuple[xr.Dataset, int]:
         """
@@ -371,6 +570,16 @@ class DataLoader:
 
         return base_ds, int(unique_values.max())
 
+    @staticmethod
+    def _load_store(data_path: Path, experiment: str) -> Optional[_FeatureStore]:
+        """If the engineer wrote a feature store, it is used instead of the
+        {train, test}/{year}_{month} folders
+        """
+        store_folder = data_path / f"features/{experiment}/store"
+        if (store_folder / "index.csv").exists():
+            return _FeatureStore(store_folder)
+        return None
+
     @staticmethod
     def _load_datasets(
         data_path: Path,
@@ -381,17 +590,25 @@ class DataLoader:
         pred_months: Optional[List[int]] = None,
     ) -> List[Path]:
 
-        data_folder = data_path / f"features/{experiment}/{mode}"
+        store = DataLoader._load_store(data_path, experiment)
+        if store is not None:
+            subfolders = store.window_paths(mode)
+        else:
+            data_folder = data_path / f"features/{experiment}/{mode}"
+            subfolders = [
+                subtrain
+                for subtrain in data_folder.iterdir()
+                if (subtrain / "x.nc").exists() and (subtrain / "y.nc").exists()
+            ]
         output_paths: List[Path] = []
 
-        for subtrain in data_folder.iterdir():
-            if (subtrain / "x.nc").exists() and (subtrain / "y.nc").exists():
-                if pred_months is None:
+        for subtrain in subfolders:
+            if pred_months is None:
+                output_paths.append(subtrain)
+            else:
+                month = int(str(subtrain.parts[-1])[5:])
+                if month in pred_months:
                     output_paths.append(subtrain)
-                else:
-                    month = int(str(subtrain.parts[-1])[5:])
-                    if month in pred_months:
-                        output_paths.append(subtrain)
 
         if mask is not None:
             output_paths.sort()
@@ -422,6 +639,18 @@ class _BaseIter:
         self.predict_delta = loader.predict_delta
         self.spatial_mask = loader.spatial_mask
         self.normalize_y = loader.normalize_y
+        self.cache_folder = loader.cache_folder
+        self.cache_dependencies = loader.cache_dependencies
+        self.store = loader.store
+
+        self.prefetch_depth = loader.prefetch_depth
+        self.prefetch_stats = loader.prefetch_stats
+        self.num_workers = loader.num_workers
+        self.worker_type = loader.worker_type
+        # the workers are only started when the first folder is loaded
+        self._executor: Optional[Executor] = None
+        self._worker_iterator: Optional[_BaseIter] = None
+        self._futures: Dict[Path, Future] = {}
 
         self.static = loader.static
         self.static_normalizing_dict = loader.static_normalizing_dict
@@ -443,18 +672,125 @@ class _BaseIter:
     def __iter__(self):
         return self
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self._shutdown()
+
+    def __del__(self) -> None:
+        # iterators which aren't exhausted (e.g. next(iter(loader)))
+        # never reach _stop()
+        self._shutdown()
+
+    def __getstate__(self) -> Dict:
+        # the executor can't be sent to the worker processes, and
+        # they only need the configuration to load a folder
+        state = self.__dict__.copy()
+        state["_executor"] = None
+        state["_worker_iterator"] = None
+        state["_futures"] = {}
+        state["data_files"] = []
+        state["prefetch_stats"] = {}
+        return state
+
+    def _start_executor(self) -> Executor:
+        # the workers load folders with a copy of the configuration (see __getstate__),
+        # so that they don't keep this iterator (and so the executor) alive
+        self._worker_iterator = copy(self)
+        if self.worker_type == "thread":
+            return ThreadPoolExecutor(max_workers=self.num_workers)
+        return ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            initializer=_init_prefetch_worker,
+            initargs=(self._worker_iterator,),
+        )
+
+    def _load_folder(self, idx: int, clear_nans: bool, to_tensor: bool) -> ModelArrays:
+        """Return the arrays for self.data_files[idx]. If background workers are being
+        used, this also queues the next `prefetch_depth` folders for loading
+        """
+        if self.num_workers == 0:
+            return self.ds_folder_to_np(
+                self.data_files[idx], clear_nans=clear_nans, to_tensor=to_tensor
+            )
+
+        if self._executor is None:
+            self._executor = self._start_executor()
+        worker_iterator = cast(_BaseIter, self._worker_iterator)
+
+        for folder in self.data_files[idx : idx + self.prefetch_depth]:
+            if folder not in self._futures:
+                if self.worker_type == "thread":
+                    # tensors are only created on the iterating thread
+                    self._futures[folder] = self._executor.submit(
+                        worker_iterator.ds_folder_to_np, folder, clear_nans, False
+                    )
+                else:
+                    self._futures[folder] = self._executor.submit(
+                        _prefetch_folder, folder, clear_nans
+                    )
+
+        future = self._futures.pop(self.data_files[idx])
+        self.prefetch_stats["loaded"] += 1
+        if not future.done():
+            self.prefetch_stats["waited"] += 1
+            start = time.time()
+            arrays = future.result()
+            self.prefetch_stats["wait_time"] += time.time() - start
+        else:
+            arrays = future.result()
+
+        if to_tensor:
+            arrays.to_tensor(self.device)
+        return arrays
+
+    def _shutdown(self) -> None:
+        # getattr, in case __init__ didn't complete
+        executor = getattr(self, "_executor", None)
+        if executor is not None:
+            for future in self._futures.values():
+                future.cancel()
+            # reads which are already running on threads are finished, since
+            # the netcdf libraries aren't safe to use from another thread meanwhile
+            executor.shutdown(wait=self.worker_type == "thread")
+            self._executor = None
+            self._worker_iterator = None
+            self._futures = {}
+
+    def _stop(self) -> None:
+        if self._executor is not None:
+            self._shutdown()
+            print(
+                f"Waited on {self.prefetch_stats['waited']} of "
+                f"{self.prefetch_stats['loaded']} prefetched folders "
+                f"({self.prefetch_stats['wait_time']:.2f}s)"
+            )
+        raise StopIteration()
+
+    @staticmethod
+    def _previous_year_folder(folder: Path) -> Path:
+        year, month = folder.name.split("_")
+        return folder.parent / f"{int(year) - 1}_{month}"
+
     def _get_prev_y_var(
         self, folder: Path, y_var: str, num_examples: int
     ) -> np.ndarray:
 
         # first, we will try loading the previous year
-        year, month = folder.name.split("_")
-        previous_year = int(year) - 1
+        new_path = self._previous_year_folder(folder)
 
-        new_path = folder.parent / f"{previous_year}_{month}"
+        if self.store is not None:
+            new_path_exists = self.store.contains(new_path)
+        else:
+            new_path_exists = new_path.exists()
 
-        if new_path.exists():
-            y = xr.open_dataset(new_path / "y.nc")
+        if new_path_exists:
+            with _NETCDF_LOCK:
+                if self.store is not None:
+                    y = self.store.open_y(new_path)
+                else:
+                    y = xr.open_dataset(new_path / "y.nc").load()
             y_np = y[y_var].values
             y_np = y_np.reshape(y_np.shape[0], y_np.shape[1] * y_np.shape[2])
             y_np = np.moveaxis(y_np, -1, 0)
@@ -532,10 +868,11 @@ class _BaseIter:
 
     def _calculate_historical(
         self, x: xr.Dataset, y: xr.Dataset
-    ) -> Tuple[np.ndarray, np.ndarray]:
-        x = self._add_extra_dims(x, self.surrounding_pixels, self.monthly_aggs)
-
-        x_np, y_np = x.to_array().values, y.to_array().values
+    ) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+        x_np, x_vars, _ = self._stack_with_extra_dims(
+            x, self.surrounding_pixels, self.monthly_aggs
+        )
+        y_np = y.to_array().values
 
         # first, x
         x_np = x_np.reshape(x_np.shape[0], x_np.shape[1], x_np.shape[2] * x_np.shape[3])
@@ -546,7 +883,7 @@ class _BaseIter:
         y_np = np.moveaxis(y_np, -1, 0).reshape(-1, 1)
 
         if (self.normalizing_dict is not None) and (self.normalizing_array is None):
-            self.normalizing_array = self.calculate_normalizing_array(list(x.data_vars))
+            self.normalizing_array = self.calculate_normalizing_array(x_vars)
         if self.normalizing_array is not None:
             x_np = (x_np - self.normalizing_array["mean"]) / (
                 self.normalizing_array["std"]
@@ -568,7 +905,7 @@ class _BaseIter:
                 # be "double shifting"
                 y_np = y_np / self.normalizing_dict[y_var]["std"]  # type: ignore
 
-        return x_np, y_np
+        return x_np, y_np, x_vars
 
     @staticmethod
     def _calculate_target_months(y: xr.Dataset, num_instances: int) -> np.ndarray:
@@ -663,11 +1000,122 @@ class _BaseIter:
         # calculate the derivative
         return (y[y_var] - prev_ts).to_dataset(name=y_var)
 
+    def _source_mtimes(self, folder: Path) -> Dict[str, Optional[float]]:
+        if self.store is not None:
+            source_mtimes = self.store.source_mtimes()
+        else:
+            source_mtimes: Dict[str, Optional[float]] = {
+                filename: (folder / filename).stat().st_mtime
+                for filename in ["x.nc", "y.nc"]
+            }
+            # the previous year's y values are included in the arrays (as prev_y_var)
+            prev_y_path = self._previous_year_folder(folder) / "y.nc"
+            source_mtimes["prev_y.nc"] = (
+                prev_y_path.stat().st_mtime if prev_y_path.exists() else None
+            )
+        # the normalizing dicts and static data used to calculate the arrays
+        source_mtimes.update(self.cache_dependencies)
+        return source_mtimes
+
+    def _read_cache(self, folder: Path) -> Optional[ModelArrays]:
+        """Memory-map the cached arrays for this folder, if a cache was written
+        from the current version of its x.nc and y.nc files (and of the
+        normalizing dicts and static data)
+        """
+        assert self.cache_folder is not None
+        cached_folder = self.cache_folder / folder.name
+
+        if not (cached_folder / "metadata.pkl").exists():
+            return None
+        with (cached_folder / "metadata.pkl").open("rb") as f:
+            metadata = pickle.load(f)
+        if metadata["source_mtimes"] != self._source_mtimes(folder):
+            return None
+
+        # copy-on-write, so that the arrays can be filtered and turned into tensors
+        # without touching the cached files
+        arrays = {
+            name: np.asarray(np.load(cached_folder / f"{name}.npy", mmap_mode="c"))
+            for name in metadata["arrays"]
+        }
+        train_data = TrainData(
+            **{
+                key: arrays.get(key)
+                for key in [
+                    "historical",
+                    "current",
+                    "pred_months",
+                    "latlons",
+                    "yearly_aggs",
+                    "static",
+                    "prev_y_var",
+                ]
+            }
+        )
+        return ModelArrays(
+            x=train_data,
+            y=arrays["y"],
+            x_vars=metadata["x_vars"],
+            y_var=metadata["y_var"],
+            latlons=arrays["model_latlons"],
+            target_time=metadata["target_time"],
+            historical_times=metadata["historical_times"],
+            predict_delta=metadata["predict_delta"],
+            historical_target=arrays.get("historical_target"),
+        )
+
+    def _write_cache(self, folder: Path, model_arrays: ModelArrays) -> None:
+        assert self.cache_folder is not None
+        cached_folder = self.cache_folder / folder.name
+        cached_folder.mkdir(exist_ok=True)
+
+        arrays: Dict[str, np.ndarray] = {
+            key: val for key, val in model_arrays.x.__dict__.items() if val is not None
+        }
+        arrays["y"] = model_arrays.y
+        arrays["model_latlons"] = model_arrays.latlons
+        if model_arrays.historical_target is not None:
+            arrays["historical_target"] = model_arrays.historical_target
+
+        for name, array in arrays.items():
+            # the arrays are replaced (not overwritten), so that arrays memory-mapped
+            # from an earlier version of the cache are left unchanged
+            tmp_path = cached_folder / f"{name}.npy.tmp"
+            with tmp_path.open("wb") as f:
+                np.save(f, array)
+            tmp_path.replace(cached_folder / f"{name}.npy")
+
+        metadata = {
+            "arrays": list(arrays.keys()),
+            "x_vars": model_arrays.x_vars,
+            "y_var": model_arrays.y_var,
+            "target_time": model_arrays.target_time,
+            "historical_times": model_arrays.historical_times,
+            "predict_delta": model_arrays.predict_delta,
+            "source_mtimes": self._source_mtimes(folder),
+        }
+        # the metadata is written last, so that an interrupted write is never read
+        with (cached_folder / "metadata.pkl").open("wb") as f:
+            pickle.dump(metadata, f)
+
     def ds_folder_to_np(
         self, folder: Path, clear_nans: bool = True, to_tensor: bool = False
     ) -> ModelArrays:
 
-        x, y = xr.open_dataset(folder / "x.nc"), xr.open_dataset(folder / "y.nc")
+        # the cache is only written for the loader's clear_nans
+        if (self.cache_folder is not None) and (clear_nans == self.clear_nans):
+            cached_arrays = self._read_cache(folder)
+            if cached_arrays is not None:
+                if to_tensor:
+                    cached_arrays.to_tensor(self.device)
+                return cached_arrays
+
+        with _NETCDF_LOCK:
+            if self.store is not None:
+                x, y = self.store.open_xy(folder)
+            else:
+                x = xr.open_dataset(folder / "x.nc").load()
+                y = xr.open_dataset(folder / "y.nc").load()
 
         if self.predict_delta:
             # TODO: do this ONCE not at each read-in of the data
@@ -699,7 +1147,7 @@ class _BaseIter:
         )  # before to avoid aggs from surrounding pixels
 
         # calculate normalized values in these functions
-        x_np, y_np = self._calculate_historical(x, y)
+        x_np, y_np, x_vars = self._calculate_historical(x, y)
         x_months = self._calculate_target_months(y, x_np.shape[0])
         yearly_agg = np.vstack([yearly_agg] * x_np.shape[0])
         if self.static is not None:
@@ -715,7 +1163,7 @@ class _BaseIter:
             # if nowcast then we have a TrainData.current
             historical = x_np[:, :-1, :]  # all timesteps except the final
             current = self.get_current_array(  # only select NON-TARGET vars
-                x=x, y=y, x_np=x_np
+                x=x, y=y, x_np=x_np, x_vars=x_vars
             )
 
             train_data = TrainData(
@@ -786,51 +1234,143 @@ class _BaseIter:
         model_arrays = ModelArrays(
             x=train_data,
             y=y_np,
-            x_vars=list(x.data_vars),
+            x_vars=x_vars,
             y_var=y_var,
             latlons=latlons,
             target_time=target_time,
             historical_times=x_datetimes,
         )
 
-        if to_tensor:
-            model_arrays.to_tensor(self.device)
-
         if self.predict_delta:
             # NOTE: data is not normalised in this function
             model_arrays.predict_delta = True
             historical_target_np = self._calculate_historical_target(x, y_var)
             historical_target_np = historical_target_np[notnan_indices].flatten()
             model_arrays.historical_target = historical_target_np
+
+        if (self.cache_folder is not None) and (clear_nans == self.clear_nans):
+            self._write_cache(folder, model_arrays)
+
+        if to_tensor:
+            model_arrays.to_tensor(self.device)
         return model_arrays
 
     @staticmethod
     def _add_extra_dims(
         x: xr.Dataset, surrounding_pixels: Optional[int], monthly_agg: bool
     ) -> xr.Dataset:
+        num_original_vars = len(x.data_vars)
+        values, var_names, dims = _BaseIter._stack_with_extra_dims(
+            x, surrounding_pixels, monthly_agg
+        )
+        x.update(
+            {
+                var_names[idx]: (dims, values[idx])
+                for idx in range(num_original_vars, len(var_names))
+            }
+        )
+        return x
+
+    @staticmethod
+    def _stack_with_extra_dims(
+        x: xr.Dataset, surrounding_pixels: Optional[int], monthly_agg: bool
+    ) -> Tuple[np.ndarray, List[str], Tuple[str, ...]]:
+        """Stack x into a single (variable, *dims) array, with the spatial mean
+        and surrounding pixel variables appended.
+
+        The surrounding pixel variables are named lat_{lat_shift}_lon_{lon_shift}_{var},
+        and are equivalent to x[var].shift(lat=lat_shift, lon=lon_shift). They are
+        sliced from a NaN padded copy of the original variables (which is padded once),
+        rather than shifted one at a time.
+
+        Returns:
+        ----------
+        values: np.ndarray
+            The stacked array, with the variables on the first axis
+        var_names: List[str]
+            The names of the variables in values
+        dims: Tuple[str, ...]
+            The dimensions of the remaining axes of values
+        """
         original_vars = list(x.data_vars)
+        x_da = x.to_array()
+        original_values = x_da.values
+        dims = x_da.dims[1:]
 
+        var_names = list(original_vars)
         if monthly_agg:
-            # first, the means
-            monthly_mean_values = x.mean(dim=["lat", "lon"])
-            mean_dataset = xr.ones_like(x) * monthly_mean_values
+            var_names.extend(f"spatial_mean_{var}" for var in original_vars)
+        shifts: List[Tuple[int, int]] = []
+        if surrounding_pixels is not None:
+            pixel_range = range(-surrounding_pixels, surrounding_pixels + 1)
+            shifts = [
+                (lat_shift, lon_shift)
+                for lat_shift in pixel_range
+                for lon_shift in pixel_range
+                if not (lat_shift == lon_shift == 0)
+            ]
+            var_names.extend(
+                f"lat_{lat_shift}_lon_{lon_shift}_{var}"
+                for var in original_vars
+                for lat_shift, lon_shift in shifts
+            )
+
+        dtype = original_values.dtype
+        if len(var_names) > len(original_vars):
+            # the new variables may contain NaNs
+            dtype = np.promote_types(dtype, np.float16)
+        values = np.empty((len(var_names),) + original_values.shape[1:], dtype=dtype)
+        values[: len(original_vars)] = original_values
+        cur_idx = len(original_vars)
 
-            for var in mean_dataset.data_vars:
-                x[f"spatial_mean_{var}"] = mean_dataset[var]
+        if monthly_agg:
+            monthly_means = x_da.mean(dim=["lat", "lon"]).values
+            # restore the (length 1) spatial axes, so the means broadcast
+            for axis in sorted([x_da.get_axis_num("lat"), x_da.get_axis_num("lon")]):
+                monthly_means = np.expand_dims(monthly_means, axis)
+            values[cur_idx : cur_idx + len(original_vars)] = monthly_means
+            cur_idx += len(original_vars)
 
         if surrounding_pixels is not None:
-            lat_shifts = lon_shifts = range(-surrounding_pixels, surrounding_pixels + 1)
-            for var in original_vars:
-                for lat_shift in lat_shifts:
-                    for lon_shift in lon_shifts:
-                        if lat_shift == lon_shift == 0:
-                            continue
-                        shifted_varname = f"lat_{lat_shift}_lon_{lon_shift}_{var}"
-                        x[shifted_varname] = x[var].shift(lat=lat_shift, lon=lon_shift)
-        return x
+            lat_axis, lon_axis = x_da.get_axis_num("lat"), x_da.get_axis_num("lon")
+            pad_width = [(0, 0)] * original_values.ndim
+            pad_width[lat_axis] = pad_width[lon_axis] = (
+                surrounding_pixels,
+                surrounding_pixels,
+            )
+            padded = np.pad(
+                original_values.astype(dtype, copy=False),
+                pad_width,
+                mode="constant",
+                constant_values=np.nan,
+            )
+            num_lat, num_lon = (
+                original_values.shape[lat_axis],
+                original_values.shape[lon_axis],
+            )
+            shifted_values = values[cur_idx:].reshape(
+                (len(original_vars), len(shifts)) + original_values.shape[1:]
+            )
+            for shift_idx, (lat_shift, lon_shift) in enumerate(shifts):
+                # the padded array starting at (i, j) is the original
+                # array shifted by (surrounding_pixels - i, surrounding_pixels - j)
+                lat_start = surrounding_pixels - lat_shift
+                lon_start = surrounding_pixels - lon_shift
+                window: List[slice] = [slice(None)] * padded.ndim
+                window[lat_axis] = slice(lat_start, lat_start + num_lat)
+                window[lon_axis] = slice(lon_start, lon_start + num_lon)
+                shifted_values[:, shift_idx] = padded[tuple(window)]
+        return values, var_names, dims
 
     @staticmethod
-    def get_current_array(x: xr.Dataset, y: xr.Dataset, x_np: np.ndarray) -> np.ndarray:
+    def get_current_array(
+        x: xr.Dataset,
+        y: xr.Dataset,
+        x_np: np.ndarray,
+        x_vars: Optional[List[str]] = None,
+    ) -> np.ndarray:
+        if x_vars is None:
+            x_vars = list(x.data_vars)
         # get the target variable
         target_var = [y for y in y.data_vars][0]
 
@@ -842,7 +1382,7 @@ class _BaseIter:
 
         # get the X features and X feature indices
         relevant_indices = [
-            idx for idx, feat in enumerate(x.data_vars) if not feat.endswith(target_var)
+            idx for idx, feat in enumerate(x_vars) if not feat.endswith(target_var)
         ]
 
         # (latlon, time, data_var)
@@ -868,8 +1408,8 @@ class _TrainIter(_BaseIter):
             cur_max_idx = min(self.idx + self.batch_file_size, self.max_idx)
             while self.idx < cur_max_idx:
                 subfolder = self.data_files[self.idx]
-                arrays = self.ds_folder_to_np(
-                    subfolder, clear_nans=self.clear_nans, to_tensor=False
+                arrays = self._load_folder(
+                    self.idx, clear_nans=self.clear_nans, to_tensor=False
                 )
                 if arrays.x.historical.shape[0] == 0:
                     print(f"{subfolder} returns no values. Skipping")
@@ -904,10 +1444,10 @@ class _TrainIter(_BaseIter):
                     global_modelarrays.y,
                 )
             else:
-                raise StopIteration()
+                self._stop()
 
         else:  # final_x_curr >= self.max_idx
-            raise StopIteration()
+            self._stop()
 
 
 class _TestIter(_BaseIter):
@@ -919,8 +1459,8 @@ class _TestIter(_BaseIter):
             cur_max_idx = min(self.idx + self.batch_file_size, self.max_idx)
             while self.idx < cur_max_idx:
                 subfolder = self.data_files[self.idx]
-                arrays = self.ds_folder_to_np(
-                    subfolder, clear_nans=self.clear_nans, to_tensor=self.to_tensor
+                arrays = self._load_folder(
+                    self.idx, clear_nans=self.clear_nans, to_tensor=self.to_tensor
                 )
                 if arrays.x.historical.shape[0] == 0:
                     print(f"{subfolder} returns no values. Skipping")
@@ -933,7 +1473,7 @@ class _TestIter(_BaseIter):
                 self.idx += 1
 
             if len(out_dict) == 0:
-                raise StopIteration()
+                self._stop()
             return out_dict
         else:
-            raise StopIteration()
+            self._stop()
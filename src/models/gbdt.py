@@ -14,9 +14,11 @@ xgb = None
 class GBDT(ModelBase):
     """Trains a GBDT, using the XGBoost implementation.
 
-    The XGBoost regressor requires all the training data to
+    By default, the XGBoost regressor requires all the training data to
     be in memory, so this model needs to be trained on a very
-    big machine, or on a subset of the data.
+    big machine, or on a subset of the data. Alternatively, `train(streaming=True)`
+    streams the DataLoader batches into XGBoost, so that only one batch is
+    in memory at a time.
     """
 
     model_name = "gbdt"
@@ -58,14 +60,41 @@ class GBDT(ModelBase):
         )
 
         self.early_stopping = False
+        # the xgb.Booster trained by streaming training, which is used (instead
+        # of self.model) for predictions and explanations if it is not None
+        self.booster: Optional[Any] = None
 
         global xgb
         if xgb is None:
             import xgboost as xgb
 
     def train(
-        self, early_stopping: Optional[int] = None, val_split: float = 0.1, **xgbkwargs
+        self,
+        early_stopping: Optional[int] = None,
+        val_split: float = 0.1,
+        streaming: bool = False,
+        cache_prefix: Optional[str] = None,
+        **xgbkwargs,
     ) -> None:
+        """
+        Arguments:
+        ----------
+        early_stopping: Optional[int] = None
+            The number of rounds without improvement on the validation set
+            before training stops. If None, no validation set is used
+        val_split: float = 0.1
+            The fraction of the training folders used for validation
+        streaming: bool = False
+            Whether to stream the DataLoader batches into XGBoost instead of
+            concatenating all the training data in memory. The batches are
+            quantized into an xgb.QuantileDMatrix as they are read
+        cache_prefix: Optional[str] = None
+            Only used if streaming is True. If not None, the quantized batches
+            are written to disk with this prefix (XGBoost's external memory
+            mode), rather than held in memory
+        **xgbkwargs:
+            Passed to the xgb.XGBRegressor
+        """
         print(f"Training {self.model_name} for experiment {self.experiment}")
 
         if early_stopping is not None:
@@ -80,19 +109,32 @@ class GBDT(ModelBase):
             )
             train_mask, val_mask = train_val_mask(len_mask, val_split)
 
+            # the streaming iterators must return the same batches on each pass
             train_dataloader = self.get_dataloader(
-                mode="train", mask=train_mask, shuffle_data=True
+                mode="train", mask=train_mask, shuffle_data=not streaming
             )
             val_dataloader = self.get_dataloader(
                 mode="train", mask=val_mask, shuffle_data=False
             )
 
         else:
-            train_dataloader = self.get_dataloader(mode="train", shuffle_data=True)
+            train_dataloader = self.get_dataloader(
+                mode="train", shuffle_data=not streaming
+            )
 
         if "objective" not in xgbkwargs:
             xgbkwargs["objective"] = "reg:squarederror"
         self.model: xgb.XGBRegressor = xgb.XGBRegressor(**xgbkwargs)  # type: ignore
+        self.booster = None
+
+        if streaming:
+            self._train_streaming(
+                train_dataloader,
+                val_dataloader if early_stopping is not None else None,
+                early_stopping,
+                cache_prefix,
+            )
+            return None
 
         # first, we need to collect all the data into arrays
         input_train_x, input_train_y = [], []
@@ -125,6 +167,87 @@ class GBDT(ModelBase):
 
         self.model.fit(**fit_inputs)
 
+    def _streaming_dmatrix(
+        self,
+        dataloader: DataLoader,
+        ref: Optional[Any] = None,
+        cache_prefix: Optional[str] = None,
+    ) -> Any:
+        """Build an XGBoost DMatrix from an iterator over the dataloader, so that
+        only one batch of the dataloader is in memory at a time
+        """
+        assert hasattr(xgb, "QuantileDMatrix"), (
+            "Streaming training requires xgboost>=1.7, "
+            f"got {xgb.__version__}"  # type: ignore
+        )
+        concatenate_data = self._concatenate_data
+
+        class DataLoaderIter(xgb.DataIter):  # type: ignore
+            def __init__(self) -> None:
+                self.loader_iter = iter(dataloader)
+                super().__init__(cache_prefix=cache_prefix)
+
+            def next(self, input_data) -> bool:
+                try:
+                    x, y = next(self.loader_iter)
+                except StopIteration:
+                    return False
+                input_data(data=concatenate_data(x), label=y)
+                return True
+
+            def reset(self) -> None:
+                self.loader_iter = iter(dataloader)
+
+        if cache_prefix is not None:
+            # external memory
+            return xgb.DMatrix(DataLoaderIter())  # type: ignore
+        return xgb.QuantileDMatrix(DataLoaderIter(), ref=ref)  # type: ignore
+
+    def _train_streaming(
+        self,
+        train_dataloader: DataLoader,
+        val_dataloader: Optional[DataLoader],
+        early_stopping: Optional[int],
+        cache_prefix: Optional[str],
+    ) -> None:
+        train_cache = None if cache_prefix is None else f"{cache_prefix}_train"
+        dtrain = self._streaming_dmatrix(train_dataloader, cache_prefix=train_cache)
+
+        params = self.model.get_xgb_params()
+        train_inputs: Dict[str, Any] = {
+            "dtrain": dtrain,
+            "num_boost_round": self.model.n_estimators or 100,
+            "verbose_eval": False,
+        }
+        if "tree_method" not in params or params["tree_method"] is None:
+            # the quantized matrices are only supported by hist
+            params["tree_method"] = "hist"
+
+        if val_dataloader is not None:
+            val_cache = None if cache_prefix is None else f"{cache_prefix}_val"
+            dval = self._streaming_dmatrix(
+                val_dataloader, ref=dtrain, cache_prefix=val_cache
+            )
+            params["eval_metric"] = "rmse"
+            train_inputs.update(
+                {
+                    "evals": [(dval, "validation")],
+                    "early_stopping_rounds": early_stopping,
+                }
+            )
+
+        train_inputs["params"] = {k: v for k, v in params.items() if v is not None}
+        self.booster = xgb.train(**train_inputs)  # type: ignore
+
+    def _booster_predict(self, x: np.ndarray, **predict_kwargs) -> np.ndarray:
+        """Predict using the booster trained by streaming training (only using
+        the trees up to the best iteration, if early stopping was used)
+        """
+        assert self.booster is not None
+        if self.early_stopping:
+            predict_kwargs["iteration_range"] = (0, self.booster.best_iteration + 1)
+        return self.booster.predict(xgb.DMatrix(x), **predict_kwargs)  # type: ignore
+
     def explain(
         self, x: Optional[TrainData] = None, save_shap_values: bool = True
     ) -> np.ndarray:
@@ -140,14 +263,23 @@ class GBDT(ModelBase):
 
         reshaped_x = self._concatenate_data(x)
 
-        pred_x = xgb.DMatrix(reshaped_x)  # type: ignore
+        if self.booster is not None:
+            explanations = self._booster_predict(
+                reshaped_x, pred_contribs=True, validate_features=False
+            )
+        else:
+            pred_x = xgb.DMatrix(reshaped_x)  # type: ignore
 
-        input_dict = {"data": pred_x, "pred_contribs": True, "validate_features": False}
+            input_dict = {
+                "data": pred_x,
+                "pred_contribs": True,
+                "validate_features": False,
+            }
 
-        if self.early_stopping:
-            input_dict["ntree_limt"] = self.model.best_ntree_limit
+            if self.early_stopping:
+                input_dict["ntree_limt"] = self.model.best_ntree_limit
 
-        explanations = self.model.get_booster().predict(**input_dict)
+            explanations = self.model.get_booster().predict(**input_dict)
 
         if save_shap_values:
             analysis_folder = self.model_dir / "analysis"
@@ -164,7 +296,11 @@ class GBDT(ModelBase):
         assert self.model is not None, "Model must be trained!"
 
         model_data = {
-            "model": {"model": self.model, "early_stopping": self.early_stopping},
+            "model": {
+                "model": self.model,
+                "early_stopping": self.early_stopping,
+                "booster": self.booster,
+            },
             "experiment": self.experiment,
             "pred_months": self.pred_months,
             "include_pred_month": self.include_pred_month,
@@ -183,10 +319,13 @@ class GBDT(ModelBase):
         with (self.model_dir / "model.pkl").open("wb") as f:
             pickle.dump(model_data, f)
 
-    def load(self, model: Any, early_stopping: bool) -> None:
+    def load(
+        self, model: Any, early_stopping: bool, booster: Optional[Any] = None
+    ) -> None:
         assert isinstance(model, xgb.XGBRegressor)  # type: ignore
         self.model = model
         self.early_stopping = early_stopping
+        self.booster = booster
 
     def predict(self) -> Tuple[Dict[str, Dict[str, np.ndarray]], Dict[str, np.ndarray]]:
         test_arrays_loader = self.get_dataloader(mode="test", shuffle_data=False)
@@ -199,7 +338,10 @@ class GBDT(ModelBase):
         for dict in test_arrays_loader:
             for key, val in dict.items():
                 x = self._concatenate_data(val.x)
-                preds = self.model.predict(x)
+                if self.booster is not None:
+                    preds = self._booster_predict(x)
+                else:
+                    preds = self.model.predict(x)
                 preds_dict[key] = preds
                 test_arrays_dict[key] = {
                     "y": val.y,
@@ -13,7 +13,7 @@ import shap
 from typing import cast, Dict, List, Optional, Tuple, Union
 
 from ..base import ModelBase
-from ..utils import chunk_array
+from ..utils import chunk_array, permuted_batches
 from ..data import DataLoader, train_val_mask, TrainData, idx_to_input
 
 
@@ -84,7 +84,18 @@ class NNBase(ModelBase):
         batch_size: int = 256,
         learning_rate: float = 1e-3,
         val_split: float = 0.1,
+        in_memory: bool = False,
     ) -> None:
+        """
+        Train the model
+
+        Arguments
+        ----------
+        in_memory: If True, the training (and validation) data is loaded once as
+            contiguous tensors, and each epoch's batches are drawn from a permutation
+            of all the training instances. Otherwise, the files are reloaded every
+            epoch and the batches are shuffled within each file batch
+        """
         print(f"Training {self.model_name} for experiment {self.experiment}")
 
         if early_stopping is not None:
@@ -100,22 +111,35 @@ class NNBase(ModelBase):
             train_mask, val_mask = train_val_mask(len_mask, val_split)
 
             train_dataloader = self.get_dataloader(
-                mode="train", mask=train_mask, to_tensor=True, shuffle_data=True
+                mode="train",
+                mask=train_mask,
+                to_tensor=not in_memory,
+                shuffle_data=True,
             )
             val_dataloader = self.get_dataloader(
-                mode="train", mask=val_mask, to_tensor=True, shuffle_data=False
+                mode="train",
+                mask=val_mask,
+                to_tensor=not in_memory,
+                shuffle_data=False,
             )
+            if in_memory:
+                val_data = self._load_in_memory(val_dataloader)
 
             batches_without_improvement = 0
             best_val_score = np.inf
         else:
             train_dataloader = self.get_dataloader(
-                mode="train", to_tensor=True, shuffle_data=True
+                mode="train", to_tensor=not in_memory, shuffle_data=True
             )
+        if in_memory:
+            train_data = self._load_in_memory(train_dataloader)
 
         # initialize the model
         if self.model is None:
-            x_ref, _ = next(iter(train_dataloader))
+            if in_memory:
+                x_ref = train_data[0]
+            else:
+                x_ref, _ = next(iter(train_dataloader))
             model = self._initialize_model(x_ref)
             self.model = model
 
@@ -127,27 +151,42 @@ class NNBase(ModelBase):
             train_rmse = []
             train_l1 = []
             self.model.train()
-            for x, y in train_dataloader:
-                for x_batch, y_batch in chunk_array(x, y, batch_size, shuffle=True):
-                    optimizer.zero_grad()
-                    pred = self.model(
-                        *self._input_to_tuple(cast(Tuple[torch.Tensor, ...], x_batch))
-                    )
-                    loss = F.smooth_l1_loss(pred, y_batch)
-                    loss.backward()
-                    optimizer.step()
+            if in_memory:
+                train_batches = permuted_batches(
+                    *train_data, batch_size, shuffle=True, device=self.device
+                )
+            else:
+                train_batches = (
+                    batch
+                    for x, y in train_dataloader
+                    for batch in chunk_array(x, y, batch_size, shuffle=True)
+                )
+            for x_batch, y_batch in train_batches:
+                optimizer.zero_grad()
+                pred = self.model(
+                    *self._input_to_tuple(cast(Tuple[torch.Tensor, ...], x_batch))
+                )
+                loss = F.smooth_l1_loss(pred, y_batch)
+                loss.backward()
+                optimizer.step()
 
-                    with torch.no_grad():
-                        rmse = F.mse_loss(pred, y_batch)
-                        train_rmse.append(math.sqrt(rmse.cpu().item()))
+                with torch.no_grad():
+                    rmse = F.mse_loss(pred, y_batch)
+                    train_rmse.append(math.sqrt(rmse.cpu().item()))
 
-                    train_l1.append(loss.item())
+                train_l1.append(loss.item())
 
             if early_stopping is not None:
                 self.model.eval()
                 val_rmse = []
+                if in_memory:
+                    val_batches = permuted_batches(
+                        *val_data, batch_size, shuffle=False, device=self.device
+                    )
+                else:
+                    val_batches = val_dataloader
                 with torch.no_grad():
-                    for x, y in val_dataloader:
+                    for x, y in val_batches:
                         val_pred_y = self.model(*self._input_to_tuple(x))
                         val_loss = F.mse_loss(val_pred_y, y)
 
@@ -172,6 +211,38 @@ class NNBase(ModelBase):
                         self.model.load_state_dict(best_model_dict)
                         return None
 
+    def _load_in_memory(
+        self, dataloader: DataLoader
+    ) -> Tuple[Tuple[Optional[torch.Tensor], ...], torch.Tensor]:
+        """Load all the (numpy) arrays of a dataloader once, as contiguous tensors.
+        These are pinned if training on a GPU, so that batches can be copied to
+        the device asynchronously.
+        """
+        x_arrays: List[List[np.ndarray]] = []
+        y_arrays: List[np.ndarray] = []
+        for x, y in dataloader:
+            if len(x_arrays) == 0:
+                x_arrays = [[] for _ in x]
+            for arrays, x_section in zip(x_arrays, x):
+                if x_section is not None:
+                    arrays.append(x_section)
+            y_arrays.append(y)
+
+        def to_tensor(arrays: List[np.ndarray]) -> Optional[torch.Tensor]:
+            if len(arrays) == 0:
+                return None
+            array = np.ascontiguousarray(np.concatenate(arrays, axis=0))
+            tensor = torch.from_numpy(array).float()
+            if self.device != "cpu":
+                tensor = tensor.pin_memory()
+            return tensor
+
+        x_tensors = tuple(to_tensor(arrays) for arrays in x_arrays)
+        y_tensor = to_tensor(y_arrays)
+        assert y_tensor is not None, "No training data was loaded!"
+        print(f"Loaded {y_tensor.shape[0]} instances into memory")
+        return x_tensors, y_tensor
+
     def predict(self) -> Tuple[Dict[str, Dict[str, np.ndarray]], Dict[str, np.ndarray]]:
 
         test_arrays_loader = self.get_dataloader(
@@ -283,9 +354,19 @@ class NNBase(ModelBase):
         ]
 
     def _one_hot(self, indices: torch.Tensor, num_vals: int) -> torch.Tensor:
+        """one hot encode the values 1 to num_vals (other values are all zeros),
+        without building a (num_vals, num_vals) identity matrix for every batch
+        """
         if len(indices.shape) > 1:
             indices = indices.squeeze(-1)
-        return torch.eye(num_vals + 2, device=self.device)[indices.long()][:, 1:-1]
+        indices = indices.long()
+        valid = (indices >= 1) & (indices <= num_vals)
+        one_hot = torch.zeros(indices.shape[0], num_vals + 1, device=indices.device)
+        # invalid values are scattered into the last column, which is dropped
+        one_hot.scatter_(
+            1, indices.clone().masked_fill_(~valid, num_vals + 1).unsqueeze(-1) - 1, 1.0
+        )
+        return one_hot[:, :-1].to(self.device)
 
     def _input_to_tuple(
         self, x: Union[Tuple[torch.Tensor, ...], TrainData]
@@ -402,42 +483,53 @@ class NNBase(ModelBase):
         num_inputs: int = 10,
     ) -> Dict[str, np.ndarray]:
 
-        if self.explainer is None:
-            background_samples = self._get_background(sample_size=background_size)
-            self.explainer: shap.DeepExplainer = shap.DeepExplainer(  # type: ignore
-                self.model, background_samples
+        # shap needs the step by step module activations of the recurrences
+        self._set_fused(False)
+        try:
+            if self.explainer is None:
+                background_samples = self._get_background(sample_size=background_size)
+                self.explainer: shap.DeepExplainer = shap.DeepExplainer(  # type: ignore
+                    self.model, background_samples
+                )
+
+            explain_arrays = self.explainer.shap_values(
+                self._shap_inputs(x, start_idx, num_inputs)
             )
+        finally:
+            self._set_fused(True)
+
+        return {idx_to_input[idx]: array for idx, array in enumerate(explain_arrays)}
 
-        # make val.x a list of tensors, as is required by the shap explainer
+    def _shap_inputs(
+        self, x: TrainData, start_idx: int = 0, num_inputs: int = 10
+    ) -> List[torch.Tensor]:
+        """make x[start_idx: start_idx + num_inputs] a list of tensors,
+        as is required by the shap explainer
+        """
         output_tensors = []
+        num_inputs = min(num_inputs, x.historical.shape[0] - start_idx)
 
         for _, val in sorted(idx_to_input.items()):
             tensor = x.__getattribute__(val)
             if tensor is not None:
+                tensor = tensor[start_idx : start_idx + num_inputs]
                 if val == "pred_months":
+                    output_tensors.append(self._one_hot(tensor, 12))
+                elif val == "static" and self.static == "embeddings":
                     output_tensors.append(
-                        self._one_hot(tensor[start_idx : start_idx + num_inputs], 12)
+                        self._one_hot(tensor, cast(int, self.num_locations))
                     )
-                elif val == "static":
-                    if self.static == "embeddings":
-                        assert x.static is not None
-                        output_tensors.append(
-                            self._one_hot(
-                                x.static[start_idx : start_idx + num_inputs],
-                                cast(int, self.num_locations),
-                            )
-                        )
-                    else:
-                        assert x.static is not None
-                        output_tensors.append(
-                            x.static[start_idx : start_idx + num_inputs]
-                        )
+                else:
+                    output_tensors.append(tensor)
             else:
-                output_tensors.append(torch.zeros(num_inputs, 1))
-
-        explain_arrays = self.explainer.shap_values(output_tensors)
-
-        return {idx_to_input[idx]: array for idx, array in enumerate(explain_arrays)}
+                output_tensors.append(torch.zeros(num_inputs, 1, device=self.device))
+        return output_tensors
+
+    def _set_fused(self, fused: bool) -> None:
+        """switch the fused (TorchScript) recurrences of the model on or off"""
+        for module in self.model.modules():
+            if hasattr(module, "fused"):
+                module.fused = fused
 
     def _get_morris_explanations(self, x: TrainData) -> Dict[str, np.ndarray]:
         """
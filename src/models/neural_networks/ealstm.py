@@ -10,6 +10,60 @@ from typing import Dict, List, Optional, Tuple, Union
 from .base import NNBase
 
 
+@torch.jit.script
+def ealstm_recurrence(
+    x_projection: torch.Tensor,
+    i: torch.Tensor,
+    bias: torch.Tensor,
+    weight_hh: torch.Tensor,
+    return_sequence: bool = True,
+) -> Tuple[torch.Tensor, torch.Tensor]:
+    """The EA-LSTM recurrence, compiled with TorchScript so that the loop
+    over timesteps runs without the Python overhead.
+
+    Arguments
+    ----------
+    x_projection: the projection of the dynamic inputs of all timesteps
+        (x_d @ weight_ih), of shape [seq, batch, 3 * hidden_size]
+    i: the (static) input gate, of shape [batch, hidden_size]
+    bias: the bias of the gates, of shape [3 * hidden_size]
+    weight_hh: the hidden state weights, of shape [hidden_size, 3 * hidden_size]
+    return_sequence: if False, only the final hidden and cell states are returned
+
+    Returns
+    ----------
+    h_n, c_n: the hidden and cell states, of shape [seq, batch, hidden_size]
+        (or [1, batch, hidden_size] if not return_sequence)
+    """
+    batch_size = x_projection.size(1)
+    hidden_size = weight_hh.size(0)
+
+    h = torch.zeros(
+        batch_size, hidden_size, dtype=x_projection.dtype, device=x_projection.device
+    )
+    c = torch.zeros_like(h)
+    bias_batch = bias.unsqueeze(0).expand(batch_size, bias.size(0))
+
+    h_n: List[torch.Tensor] = []
+    c_n: List[torch.Tensor] = []
+    # unbind (rather than index) the timesteps, so that the backward pass
+    # doesn't allocate a full size gradient for each timestep
+    for x_t in x_projection.unbind(0):
+        gates = torch.addmm(bias_batch, h, weight_hh) + x_t
+        f, o, g = gates.chunk(3, 1)
+
+        c = torch.sigmoid(f) * c + i * torch.tanh(g)
+        h = torch.sigmoid(o) * torch.tanh(c)
+
+        if return_sequence:
+            h_n.append(h)
+            c_n.append(c)
+
+    if return_sequence:
+        return torch.stack(h_n, 0), torch.stack(c_n, 0)
+    return h.unsqueeze(0), c.unsqueeze(0)
+
+
 class EARecurrentNetwork(NNBase):
 
     model_name = "ealstm"
@@ -305,7 +359,8 @@ class EALSTM(nn.Module):
         if self.use_static_embedding:
             static_tensor = self.static_embedding(static_tensor)
 
-        hidden_state, cell_state = self.rnn(x, static_tensor)
+        # only the final hidden state is used
+        hidden_state, cell_state = self.rnn(x, static_tensor, return_sequence=False)
 
         x = self.rnn_dropout(hidden_state[:, -1, :])
 
@@ -474,6 +529,11 @@ class OrgEALSTMCell(nn.Module):
         shape has to be [seq, batch, features], by default True.
     initial_forget_bias : int, optional
         Value of the initial forget gate bias, by default 0
+
+    If `fused` (the default), the inputs of all timesteps are projected in one
+    matmul and the recurrence runs in TorchScript (`ealstm_recurrence`).
+    Otherwise, the recurrence is run step by step with the module activations,
+    so that it can be explained with shap.
     """
 
     def __init__(
@@ -491,6 +551,7 @@ class OrgEALSTMCell(nn.Module):
         self.hidden_size = hidden_size
         self.batch_first = batch_first
         self.initial_forget_bias = initial_forget_bias
+        self.fused = True
 
         # create tensors of learnable parameters
         self.weight_ih = nn.Parameter(  # type: ignore
@@ -533,7 +594,7 @@ class OrgEALSTMCell(nn.Module):
         if self.initial_forget_bias != 0:
             self.bias.data[: self.hidden_size] = self.initial_forget_bias
 
-    def forward(self, x_d, x_s):
+    def forward(self, x_d, x_s, return_sequence: bool = True):
         """[summary]
         Parameters
         ----------
@@ -542,6 +603,9 @@ class OrgEALSTMCell(nn.Module):
             the format specified with batch_first.
         x_s : torch.Tensor
             Tensor, containing a batch of static features.
+        return_sequence : bool, optional
+            If False, only the states of the final time step are returned
+            (with a sequence length of 1), by default True
         Returns
         -------
         h_n : torch.Tensor
@@ -552,6 +616,28 @@ class OrgEALSTMCell(nn.Module):
         if self.batch_first:
             x_d = x_d.transpose(0, 1)
 
+        if self.fused:
+            i = torch.sigmoid(torch.addmm(self.bias_s, x_s, self.weight_sh))
+            h_n, c_n = ealstm_recurrence(
+                torch.matmul(x_d, self.weight_ih),
+                i,
+                self.bias,
+                self.weight_hh,
+                return_sequence,
+            )
+        else:
+            h_n, c_n = self._unfused_forward(x_d, x_s)
+            if not return_sequence:
+                h_n, c_n = h_n[-1:], c_n[-1:]
+
+        if self.batch_first:
+            h_n = h_n.transpose(0, 1)
+            c_n = c_n.transpose(0, 1)
+
+        return h_n, c_n
+
+    def _unfused_forward(self, x_d, x_s):
+        """the step by step recurrence over x_d, of shape [seq, batch, features]"""
         seq_len, batch_size, _ = x_d.size()
 
         h_0 = x_d.data.new(batch_size, self.hidden_size).zero_()
@@ -590,8 +676,4 @@ class OrgEALSTMCell(nn.Module):
         h_n = torch.stack(h_n, 0)
         c_n = torch.stack(c_n, 0)
 
-        if self.batch_first:
-            h_n = h_n.transpose(0, 1)
-            c_n = c_n.transpose(0, 1)
-
         return h_n, c_n
@@ -262,9 +262,6 @@ class RNN(nn.Module):
 
         sequence_length = x.shape[1]
 
-        hidden_state = torch.zeros(1, x.shape[0], self.hidden_size)
-        cell_state = torch.zeros(1, x.shape[0], self.hidden_size)
-
         # construct the vector to be appended to the dynamic steps
         input_tensors: List[torch.Tensor] = []
         if self.include_pred_month:
@@ -287,6 +284,27 @@ class RNN(nn.Module):
 
             x = torch.cat((x, with_time_dims), dim=-1)
 
+        if self.rnn.fused:
+            x = self.rnn.forward_fused(x, dropout=self.dropout)
+        else:
+            x = self._unfused_forward(x)
+
+        if self.experiment == "nowcast":
+            assert current is not None
+            x = torch.cat((x, current), dim=-1)
+
+        for layer_number, dense_layer in enumerate(self.dense_layers):
+            x = dense_layer(x)
+        return x
+
+    def _unfused_forward(self, x):
+        """run the UnrolledRNN module step by step (so that it can be explained
+        with shap), returning the final hidden state"""
+        sequence_length = x.shape[1]
+
+        hidden_state = torch.zeros(1, x.shape[0], self.hidden_size)
+        cell_state = torch.zeros(1, x.shape[0], self.hidden_size)
+
         if x.is_cuda:
             hidden_state = hidden_state.cuda()
             cell_state = cell_state.cuda()
@@ -301,20 +319,17 @@ class RNN(nn.Module):
             )
             hidden_state = self.dropout(hidden_state)
 
-        x = hidden_state.squeeze(0)
-
-        if self.experiment == "nowcast":
-            assert current is not None
-            x = torch.cat((x, current), dim=-1)
-
-        for layer_number, dense_layer in enumerate(self.dense_layers):
-            x = dense_layer(x)
-        return x
+        return hidden_state.squeeze(0)
 
 
 class UnrolledRNN(nn.Module):
     """An unrolled RNN. The motivation for this is mainly so that we can explain this model using
     the shap deep explainer, but also because we unroll the RNN anyway to apply dropout.
+
+    If `fused` (the default), `RNN` runs the whole sequence through `forward_fused`,
+    which combines the four gates into one matmul (in the `nn.LSTM` layout) and
+    projects the inputs of all timesteps at once. The gate modules' parameters
+    are used for both, so the two are equivalent.
     """
 
     def __init__(self, input_size, hidden_size, batch_first=True):
@@ -323,6 +338,7 @@ class UnrolledRNN(nn.Module):
         self.input_size = input_size
         self.hidden_size = hidden_size
         self.batch_first = batch_first
+        self.fused = True
 
         self.forget_gate = nn.Sequential(
             *[
@@ -390,3 +406,95 @@ class UnrolledRNN(nn.Module):
             updated_cell = torch.transpose(updated_cell, 0, 1)
 
         return updated_hidden, (updated_hidden, updated_cell)
+
+    def _gates(self) -> List[nn.Linear]:
+        # in the order of the nn.LSTM gates (input, forget, cell, output)
+        return [
+            self.update_gate[0],
+            self.forget_gate[0],
+            self.update_candidates[0],
+            self.output_gate[0],
+        ]
+
+    def lstm_weights(self) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        """the combined weights of the gates in the nn.LSTM layout
+
+        Returns
+        ----------
+        weight_ih: [4 * hidden_size, input_size]
+        weight_hh: [4 * hidden_size, hidden_size]
+        bias: [4 * hidden_size]
+        """
+        weight = torch.cat([gate.weight for gate in self._gates()], dim=0)
+        bias = torch.cat([gate.bias for gate in self._gates()], dim=0)
+        return weight[:, : self.input_size], weight[:, self.input_size :], bias
+
+    def to_lstm(self) -> nn.LSTM:
+        """an equivalent nn.LSTM (with a zero `bias_hh_l0`)"""
+        lstm = nn.LSTM(
+            input_size=self.input_size,
+            hidden_size=self.hidden_size,
+            batch_first=self.batch_first,
+        )
+        weight_ih, weight_hh, bias = self.lstm_weights()
+        with torch.no_grad():
+            lstm.weight_ih_l0.copy_(weight_ih)
+            lstm.weight_hh_l0.copy_(weight_hh)
+            lstm.bias_ih_l0.copy_(bias)
+            lstm.bias_hh_l0.zero_()
+        return lstm.to(weight_ih.device)
+
+    @classmethod
+    def from_lstm(cls, lstm: nn.LSTM) -> "UnrolledRNN":
+        """an equivalent UnrolledRNN, from a single layer, unidirectional nn.LSTM"""
+        assert (lstm.num_layers == 1) and (
+            not lstm.bidirectional
+        ), "Only single layer, unidirectional LSTMs can be unrolled"
+        rnn = cls(lstm.input_size, lstm.hidden_size, batch_first=lstm.batch_first)
+        weight = torch.cat((lstm.weight_ih_l0, lstm.weight_hh_l0), dim=-1)
+        bias = lstm.bias_ih_l0 + lstm.bias_hh_l0
+        with torch.no_grad():
+            for gate, gate_weight, gate_bias in zip(
+                rnn._gates(), weight.chunk(4, 0), bias.chunk(4, 0)
+            ):
+                gate.weight.copy_(gate_weight)
+                gate.bias.copy_(gate_bias)
+        return rnn.to(weight.device)
+
+    def forward_fused(self, x, dropout: Optional[nn.Dropout] = None):
+        """Run the whole sequence (of shape [batch, seq, features]) through the
+        RNN, applying `dropout` to the hidden state after each timestep (as `RNN`
+        does when unrolled). Returns the final hidden state.
+
+        Without (active) dropout, this is the fused kernel of `nn.LSTM`. Otherwise,
+        the four gates are calculated with one matmul per timestep, and the
+        inputs of all timesteps are projected at once.
+        """
+        weight_ih, weight_hh, bias = self.lstm_weights()
+        hidden = x.new_zeros(x.shape[0], self.hidden_size)
+        cell = x.new_zeros(x.shape[0], self.hidden_size)
+
+        if (dropout is None) or (not dropout.training) or (dropout.p == 0):
+            _, final_hidden, _ = torch.lstm(  # type: ignore
+                x,
+                (hidden.unsqueeze(0), cell.unsqueeze(0)),
+                [weight_ih, weight_hh, bias, torch.zeros_like(bias)],
+                True,  # has_biases
+                1,  # num_layers
+                0.0,  # dropout
+                self.training,
+                False,  # bidirectional
+                True,  # batch_first
+            )
+            return final_hidden[0]
+
+        x_projection = torch.matmul(x, weight_ih.t()) + bias
+        for x_t in x_projection.unbind(1):
+            gates = torch.addmm(x_t, hidden, weight_hh.t())
+            update, forget, candidates, output = gates.chunk(4, 1)
+
+            cell = torch.sigmoid(forget) * cell + torch.sigmoid(update) * torch.tanh(
+                candidates
+            )
+            hidden = dropout(torch.sigmoid(output) * torch.tanh(cell))
+        return hidden
@@ -55,6 +55,8 @@ class LinearRegression(ModelBase):
         )
 
         self.explainer: Optional[shap.LinearExplainer] = None
+        # the mean of the training inputs, if it was calculated during training
+        self.train_mean: Optional[np.ndarray] = None
 
     def train(
         self,
@@ -63,9 +65,32 @@ class LinearRegression(ModelBase):
         batch_size: int = 256,
         val_split: float = 0.1,
         initial_learning_rate: float = 1e-15,
+        solver: str = "sgd",
+        l2_regularization: float = 0.0,
     ) -> None:
+        """
+        Arguments:
+        ----------
+        solver: str {'sgd', 'normal_equation'} = 'sgd'
+            If 'sgd', the model is fitted with stochastic gradient descent, using
+            the num_epochs, early_stopping, batch_size, val_split and
+            initial_learning_rate arguments. If 'normal_equation', X^T X and X^T y
+            are accumulated in a single pass over the training data, and the
+            least squares solution is found exactly
+        l2_regularization: float = 0.0
+            The ridge penalty applied to the coefficients (but not the intercept)
+            when solver == 'normal_equation'
+        """
         print(f"Training {self.model_name} for experiment {self.experiment}")
 
+        assert solver in {
+            "sgd",
+            "normal_equation",
+        }, f"solver must be one of {{sgd, normal_equation}}, got {solver}"
+        if solver == "normal_equation":
+            self._train_normal_equation(l2_regularization)
+            return None
+
         if early_stopping is not None:
             len_mask = len(
                 DataLoader._load_datasets(
@@ -135,6 +160,43 @@ class LinearRegression(ModelBase):
                         self.model.intercept_ = best_intercept
                         return None
 
+    def _train_normal_equation(self, l2_regularization: float) -> None:
+        """Fit the model by solving the (ridge) normal equations, which are
+        accumulated from a single pass over the training data
+        """
+        train_dataloader = self.get_dataloader(mode="train", shuffle_data=False)
+
+        # X is augmented with a column of ones for the intercept, so
+        # xtx[-1, :-1] is the sum of the inputs and xtx[-1, -1] the number of rows
+        xtx: Optional[np.ndarray] = None
+        xty: Optional[np.ndarray] = None
+        yty = 0.0
+        for x, y in train_dataloader:
+            x_in = self._concatenate_data(x).astype(np.float64)
+            x_in = np.concatenate([x_in, np.ones((x_in.shape[0], 1))], axis=-1)
+            y_in = y.ravel().astype(np.float64)
+
+            if xtx is None:
+                xtx = np.zeros((x_in.shape[1], x_in.shape[1]))
+                xty = np.zeros(x_in.shape[1])
+            xtx += x_in.T @ x_in
+            xty += x_in.T @ y_in
+            yty += y_in @ y_in
+
+        assert (xtx is not None) and (xty is not None), "No training data found!"
+        num_rows = xtx[-1, -1]
+
+        penalty = np.full(xtx.shape[0], l2_regularization)
+        penalty[-1] = 0  # don't regularize the intercept
+        # lstsq, since one hot features (e.g. pred months) can make xtx singular
+        weights = np.linalg.lstsq(xtx + np.diag(penalty), xty, rcond=None)[0]
+
+        train_mse = (yty - 2 * weights @ xty + weights @ xtx @ weights) / num_rows
+        print(f"Normal equation, train RMSE: {np.sqrt(max(train_mse, 0)):.2f}")
+
+        self.load(coef=weights[:-1], intercept=weights[-1:])
+        self.train_mean = xtx[-1, :-1] / num_rows
+
     def explain(
         self, x: Optional[TrainData] = None, save_shap_values: bool = True
     ) -> np.ndarray:
@@ -142,7 +204,10 @@ class LinearRegression(ModelBase):
         assert self.model is not None, "Model must be trained!"
 
         if self.explainer is None:
-            mean = self._calculate_big_mean()
+            if self.train_mean is not None:
+                mean = self.train_mean
+            else:
+                mean = self._calculate_big_mean()
             self.explainer: shap.LinearExplainer = shap.LinearExplainer(  # type: ignore
                 self.model, (mean, None), feature_dependence="independent"
             )
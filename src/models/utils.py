@@ -90,6 +90,58 @@ def _chunk_tensor(
     return [(chunk[:-1], chunk[-1]) for chunk in return_arrays]  # type: ignore
 
 
+def permuted_batches(
+    x: Tuple[Optional[torch.Tensor], ...],
+    y: torch.Tensor,
+    batch_size: int,
+    shuffle: bool = True,
+    device: Optional[str] = None,
+) -> Iterable[Tuple[Tuple[Optional[torch.Tensor], ...], torch.Tensor]]:
+    """
+    Draw batches of batch size `batch_size` from in-memory tensors by gathering
+    a permutation of their indices, so that the whole dataset is shuffled
+    (rather than the chunks of a file batch, as in `chunk_array`)
+
+    Arguments
+    ----------
+    x: (torch.Tensor)
+        The x tensors to batch
+    y: torch.Tensor
+        The y tensor to batch
+    batch_size: int
+        The size of the batches to return
+    shuffle: bool = True
+        Whether to draw the batches from a random permutation
+    device: Optional[str] = None
+        If not None, the device the batches are moved to
+
+    Returns
+    ----------
+    An iterator returning tuples of batches (x, y)
+    """
+    num_instances = y.shape[0]
+    if shuffle:
+        indices = torch.randperm(num_instances)
+    else:
+        indices = torch.arange(num_instances)
+
+    non_blocking = y.is_pinned()
+    for batch_indices in indices.split(batch_size):
+        x_batch = tuple(
+            None if x_section is None else x_section[batch_indices] for x_section in x
+        )
+        y_batch = y[batch_indices]
+        if device is not None:
+            x_batch = tuple(
+                None
+                if x_section is None
+                else x_section.to(device, non_blocking=non_blocking)
+                for x_section in x_batch
+            )
+            y_batch = y_batch.to(device, non_blocking=non_blocking)
+        yield x_batch, y_batch
+
+
 def _datetime_to_folder_time_str(date: np.datetime64) -> str:
     date = pd.to_datetime(date)
     return f"{str(date.year[0])}_{str(date.month[0])}"
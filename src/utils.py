@@ -84,7 +84,11 @@ def get_ds_mask(ds: xr.Dataset) -> xr.Dataset:
 
 
 def create_shape_aligned_climatology(
-    ds: xr.Dataset, clim: xr.Dataset, variable: str, time_period: str
+    ds: xr.Dataset,
+    clim: xr.Dataset,
+    variable: str,
+    time_period: str,
+    time_chunks: Optional[int] = None,
 ):
     """match the time dimension of `clim` to the shape of `ds` so that can
     perform simple calculations / arithmetic on the values of clim
@@ -104,6 +108,13 @@ def create_shape_aligned_climatology(
         the period string used to calculate the climatology
          time_period = {'dayofyear', 'season', 'month'}
 
+    time_chunks: Optional[int] = None
+        if not None (or if `ds[variable]` is already a dask array), the
+        climatology is returned as a lazy (dask) array with time_chunks
+        timesteps per chunk. Each chunk is gathered from `clim` only when it
+        is computed, so the time-expanded array is never materialised and
+        arithmetic against `ds` streams chunk by chunk
+
     Notes:
         1. assumes that `lat` and `lon` are the
         coord names in ds
@@ -114,20 +125,44 @@ def create_shape_aligned_climatology(
 
     ds[time_period] = ds[f"time.{time_period}"]
 
-    values = clim[variable].values
+    values = clim[variable].transpose(time_period, "lat", "lon").values
     keys = clim[time_period].values
-    # map the `time_period` to the `values` of the climatology (threshold or mean)
-    lookup_dict = dict(zip(keys, values))
-
     # extract an array of the `time_period` values from the `ds`
     timevals = ds[time_period].values
 
-    # use the lat lon arrays (climatology values) in `lookup_dict` corresponding
-    #  to time_period values defined in `timevals` and stack into new array
-    new_clim_vals = np.stack([lookup_dict[timevals[i]] for i in range(len(timevals))])
-
+    # map the `time_period` of each timestep to the index of the climatology
+    #  (threshold or mean) values for that period
+    sorter = np.argsort(keys)
+    period_index = sorter[
+        np.searchsorted(keys, timevals, sorter=sorter).clip(max=len(keys) - 1)
+    ]
     assert (
-        new_clim_vals.shape == ds[variable].shape
+        keys[period_index] == timevals
+    ).all(), f"Missing climatology values for {time_period}s: \
+        {np.unique(timevals[keys[period_index] != timevals])}"
+
+    data = ds[variable].data
+    if time_chunks is None and hasattr(data, "chunks") and data.chunks is not None:
+        time_chunks = data.chunks[ds[variable].dims.index("time")]
+
+    if time_chunks is None:
+        # a single gather of the climatology values for each timestep
+        new_clim_vals = values[period_index]
+    else:
+        import dask.array
+
+        index = dask.array.from_array(period_index, chunks=time_chunks)
+        new_clim_vals = index.map_blocks(
+            lambda block_index: values[block_index],
+            dtype=values.dtype,
+            new_axis=[1, 2],
+            chunks=(index.chunks[0], (values.shape[1],), (values.shape[2],)),
+        )
+
+    assert new_clim_vals.shape == (
+        ds.time.shape[0],
+        ds.lat.shape[0],
+        ds.lon.shape[0],
     ), f"\
         Shapes for new_clim_vals and ds must match! \
          new_clim_vals.shape: {new_clim_vals.shape} \
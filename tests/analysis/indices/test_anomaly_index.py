@@ -1,7 +1,9 @@
+import numpy as np
 import pytest
 
 from src.analysis.indices import AnomalyIndex
-from tests.utils import _create_dummy_precip_data
+from src.analysis.indices.anomaly_index import rainfall_anomaly_index
+from tests.utils import _create_dummy_precip_data, _make_dataset
 
 
 class TestAnomalyIndex:
@@ -27,3 +29,48 @@ class TestAnomalyIndex:
         coords = [c for c in ai.index.coords]
         vars_ = [v for v in ai.index.variables if v not in coords]
         assert "RAI" in vars_, f"Expecting `RAI` variable in `self.index`"
+
+    def test_rainfall_anomaly_index(self):
+        values = np.random.gamma(2, 10, (60, 6))
+        values[:14, 0] = np.nan
+        values[:, 1] = np.nan
+        groups = np.tile(np.arange(1, 13), 5)
+        # an incomplete final year
+        values, groups = values[:-3], groups[:-3]
+
+        rai = rainfall_anomaly_index(values, groups, num_extremes=2)
+        assert rai.shape == values.shape
+        assert np.isnan(rai[np.isnan(values)]).all()
+
+        for group in np.unique(groups):
+            for pixel in [0, 2, 5]:
+                series = values[groups == group, pixel]
+                valid = np.sort(series[~np.isnan(series)])
+                mean = valid.mean()
+                anomaly = series - mean
+                expected = np.where(
+                    anomaly >= 0,
+                    3.0 * anomaly / (valid[-2:].mean() - mean),
+                    -3.0 * anomaly / (valid[:2].mean() - mean),
+                )
+                assert np.allclose(
+                    rai[groups == group, pixel], expected, equal_nan=True
+                )
+
+    def test_RAI(self):
+        ds, _, _ = _make_dataset(
+            (10, 10), variable_name="precip", start_date="2000-01-01"
+        )
+        da = ds.precip.astype(float)
+        rai = AnomalyIndex.RAI(da, num_extremes=1)
+
+        assert rai.dims == da.dims
+        # the highest (lowest) value of each month has a RAI of 3 (-3)
+        grouped = rai.groupby("time.month")
+        assert np.allclose(grouped.max(dim=["time", "lat", "lon"]), 3)
+        assert np.allclose(grouped.min(dim=["time", "lat", "lon"]), -3)
+
+        # spatially chunked data gives the same values
+        chunked = AnomalyIndex.RAI(da.chunk({"lat": 5, "lon": 5}), num_extremes=1)
+        assert chunked.chunks is not None
+        assert np.allclose(chunked.values, rai.values, equal_nan=True)
@@ -1,7 +1,7 @@
 import numpy as np
 import pytest
 
-from tests.utils import _create_dummy_precip_data
+from tests.utils import _create_dummy_precip_data, _make_dataset
 from src.analysis.indices import DecileIndex
 
 
@@ -43,3 +43,45 @@ class TestDecileIndex:
             f"Expect max "
             f"rank_norm to be 100. Got: {di.index.rank_norm.max().values}"
         )
+
+    def test_rank_norm_matches_rank(self):
+        ds, _, _ = _make_dataset(
+            (10, 10),
+            variable_name="precip",
+            start_date="2000-01-01",
+            end_date="2010-01-01",
+        )
+        # integer values so that there are ties
+        ds = (ds // 10).astype(float)
+        ds.precip.values[:5, 0, 0] = np.nan
+        ds.precip.values[:, 1, 1] = np.nan
+
+        di = DecileIndex(ds=ds)
+        di.fit_climatology(ds.precip)
+        got = di.score(ds.precip, in_climatology=True)
+        expected = ds.precip.groupby("time.month").apply(DecileIndex.rank_norm)
+        assert np.allclose(
+            got.values, expected.transpose(*got.dims).values, equal_nan=True
+        )
+
+    def test_score_new_observations(self):
+        ds, _, _ = _make_dataset(
+            (10, 10),
+            variable_name="precip",
+            start_date="2000-01-01",
+            end_date="2010-01-01",
+        )
+        ds = (ds // 10).astype(float)
+        history, new = ds.isel(time=slice(0, -3)), ds.isel(time=slice(-3, None))
+
+        di = DecileIndex(ds=history)
+        di.fit_climatology(history.precip)
+        got = di.score(new.precip)
+
+        # the same rank as re-ranking the full history
+        expected = (
+            ds.precip.groupby("time.month")
+            .apply(DecileIndex.rank_norm)
+            .isel(time=slice(-3, None))
+        )
+        assert np.allclose(got.values, expected.transpose(*got.dims).values)
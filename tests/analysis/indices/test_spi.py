@@ -1,5 +1,6 @@
 import pytest
 import numpy as np
+import xarray as xr
 
 from tests.utils import _create_dummy_precip_data
 from src.analysis.indices import SPI
@@ -71,3 +72,37 @@ class TestSPI:
             "Expect the `std()` SPI6 value to be close to 0 because"
             "converted to a standard normal distribution"
         )
+
+    def test_fit_parallel(self, tmp_path):
+        data_path = _create_dummy_precip_data(
+            tmp_path, start_date="2000-01-01", end_date="2010-01-01"
+        )
+        spi = SPI(data_path / "data_kenya.nc")
+        # the sea: pixels with no data are skipped
+        spi.ds["precip"][:, 0, :] = np.nan
+
+        spi.fit(variable="precip", chunk_size=7)
+        serial = spi.index.SPI3.copy()
+        spi.fit(variable="precip", chunk_size=7, num_workers=2)
+
+        assert serial.isel(lat=0).isnull().all(), "Expected the sea to be nan"
+        assert not serial.isel(lat=1, time=slice(2, None)).isnull().any()
+        np.testing.assert_allclose(serial.values, spi.index.SPI3.values)
+
+    def test_fit_with_fitting_params(self, tmp_path):
+        data_path = _create_dummy_precip_data(
+            tmp_path, start_date="2000-01-01", end_date="2010-01-01"
+        )
+        spi = SPI(data_path / "data_kenya.nc")
+        spi.fit(variable="precip")
+        expected = spi.index.SPI3.copy()
+        assert spi.fitting_params.alphas.dims == ("period", "lat", "lon")
+
+        params_path = spi.save_fitting_params(tmp_path)
+        assert params_path.exists()
+        fitting_params = xr.open_dataset(params_path)
+        spi.fit(variable="precip", fitting_params=fitting_params)
+        np.testing.assert_allclose(expected.values, spi.index.SPI3.values)
+
+        with pytest.raises(AssertionError):
+            spi.fit(variable="precip", scale=6, fitting_params=fitting_params)
@@ -9,6 +9,13 @@ from src.analysis.indices.utils import (
     apply_over_period,
     create_shape_aligned_climatology,
     rolling_mean,
+    fit_all_indices,
+)
+from src.analysis.indices import (
+    ZScoreIndex,
+    DroughtSeverityIndex,
+    ChinaZIndex,
+    DecileIndex,
 )
 from tests.utils import _create_dummy_precip_data
 
@@ -130,3 +137,73 @@ class TestIndicesUtils:
             f"the shape of `ds_window` ({ds_window['precip'].shape}) to =="
             f"`clim` ({clim['precip'].shape})"
         )
+
+    @pytest.mark.parametrize("time_period", ["month", "season"])
+    def test_create_shape_aligned_climatology_lazy(self, tmp_path, time_period):
+        data_path = _create_dummy_precip_data(tmp_path)
+        ds = xr.open_dataset(data_path / "data_kenya.nc").astype(float)
+        climatology = ds.groupby(f"time.{time_period}").mean(dim="time")
+
+        clim = create_shape_aligned_climatology(
+            ds, climatology, variable="precip", time_period=time_period
+        )
+        # the climatology of each timestep's period
+        expected = climatology.precip.sel(
+            {time_period: ds[f"time.{time_period}"]}
+        ).transpose("time", "lat", "lon")
+        assert (clim.precip.values == expected.values).all()
+
+        lazy_clim = create_shape_aligned_climatology(
+            ds, climatology, variable="precip", time_period=time_period, time_chunks=5
+        )
+        assert lazy_clim.precip.chunks is not None
+        assert lazy_clim.precip.chunks[0][0] == 5
+        assert (lazy_clim.precip.values == clim.precip.values).all()
+
+        # a dask-backed ds gives a lazy climatology with the same time chunks
+        chunked_clim = create_shape_aligned_climatology(
+            ds.chunk({"time": 7}),
+            climatology,
+            variable="precip",
+            time_period=time_period,
+        )
+        assert chunked_clim.precip.chunks[0][0] == 7
+        anomaly = ds.precip - chunked_clim.precip
+        assert np.allclose(anomaly.values, ds.precip.values - clim.precip.values)
+
+    def test_fit_all_indices_batch(self, tmp_path):
+        data_path = _create_dummy_precip_data(
+            tmp_path, start_date="2000-01-01", end_date="2010-01-01"
+        )
+        out_path = tmp_path / "all_indices.nc"
+        batch = fit_all_indices(
+            data_path / "data_kenya.nc", batch=True, out_path=out_path
+        )
+        assert out_path.exists()
+        for variable in ["ZSI", "PNI", "DSI", "CZI", "MCZI", "rank_norm", "RAI"]:
+            assert variable in batch.data_vars, f"Expected {variable} in the indices"
+
+        # the indices match those calculated by each index
+        ds_window = rolling_cumsum(xr.open_dataset(data_path / "data_kenya.nc"))
+        grouped = ds_window.precip.groupby("time.month")
+        expected = {
+            "ZSI": grouped.apply(ZScoreIndex.ZSI),
+            "DSI": grouped.apply(DroughtSeverityIndex.DSI),
+            "MCZI": grouped.apply(ChinaZIndex.MCZI),
+            "rank_norm": grouped.apply(DecileIndex.rank_norm),
+        }
+        for variable, da in expected.items():
+            assert np.allclose(
+                da.sel(time=batch.time).transpose("time", "lat", "lon").values,
+                batch[variable].transpose("time", "lat", "lon").values,
+                equal_nan=True,
+            ), f"Expected the batch {variable} to match the index"
+
+        # dask chunking gives the same values
+        chunked = fit_all_indices(
+            data_path / "data_kenya.nc", batch=True, chunks={"lat": 10, "lon": 10}
+        )
+        for variable in ["ZSI", "PNI", "rank_norm"]:
+            assert np.allclose(
+                chunked[variable].values, batch[variable].values, equal_nan=True
+            )
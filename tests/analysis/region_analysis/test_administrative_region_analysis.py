@@ -1,3 +1,4 @@
+import shutil
 import numpy as np
 import pandas as pd
 
@@ -172,3 +173,45 @@ class TestAdministrativeRegionAnalysis(TestRegionAnalysis):
             f"Got: {len(analyser.df)}. We should have a row for each combination"
             "of models, datetimes, regions, admin_levels"
         )
+
+    def test_analyze_batch(self, tmp_path):
+        for i in range(2):
+            self._create_dummy_admin_boundaries_data(tmp_path, prefix=str(i))
+        self._create_dummy_true_preds_data(tmp_path)
+        # a second model, missing the predictions for one month
+        models_dir = tmp_path / "models" / "one_month_forecast"
+        shutil.copytree(models_dir / "ealstm", models_dir / "linear_regression")
+        (models_dir / "linear_regression" / "preds_2018_2.nc").unlink()
+
+        keys = ["model", "admin_level_name", "datetime", "region_name"]
+        analysers = []
+        for batch in [False, True]:
+            analyser = AdministrativeRegionAnalysis(tmp_path, batch=batch)
+            analyser.analyze()
+            analysers.append(analyser)
+        loop, batch = analysers
+
+        assert len(batch.df) == len(loop.df) == 2 * 3 * (3 + 2)
+        merged = loop.df.merge(batch.df, on=keys, suffixes=("_loop", "_batch"))
+        assert len(merged) == len(loop.df)
+        for col in ["predicted_mean_value", "true_mean_value"]:
+            assert np.allclose(
+                merged[f"{col}_loop"], merged[f"{col}_batch"], equal_nan=True
+            )
+
+        for loop_metrics, batch_metrics, group_keys in [
+            (loop.global_mean_metrics, batch.global_mean_metrics, keys[:2]),
+            (
+                loop.regional_mean_metrics,
+                batch.regional_mean_metrics,
+                keys[:2] + keys[3:],
+            ),
+        ]:
+            merged = loop_metrics.merge(
+                batch_metrics, on=group_keys, suffixes=("_loop", "_batch")
+            )
+            assert len(merged) == len(batch_metrics)
+            for metric in ["rmse", "mae", "r2"]:
+                assert np.allclose(
+                    merged[f"{metric}_loop"], merged[f"{metric}_batch"], equal_nan=True
+                )
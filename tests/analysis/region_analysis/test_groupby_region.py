@@ -0,0 +1,42 @@
+import numpy as np
+import xarray as xr
+
+from src.analysis.region_analysis.groupby_region import GroupbyRegion
+from tests.utils import _make_dataset
+
+
+class TestGroupbyRegion:
+    def test_calculate_mean_per_region(self):
+        ds, _, _ = _make_dataset((30, 30), variable_name="VHI")
+        da = ds.VHI.astype(float)
+        da.values[:, :5, :5] = np.nan
+
+        region_values = np.random.randint(0, 4, (30, 30)).astype(float)
+        # pixels outside of any region, and a region id without a lookup entry
+        region_values[-3:, :] = np.nan
+        region_values[:2, -2:] = 9
+        region_da = xr.DataArray(
+            region_values, dims=["lat", "lon"], coords={"lat": da.lat, "lon": da.lon}
+        )
+        region_lookup = {3: "region_3", 0: "region_0", 1: "region_1", 2: "region_2"}
+        # region 2 is all nan at the first timestep
+        da.values[0][region_values == 2] = np.nan
+
+        df = GroupbyRegion.calculate_mean_per_region(
+            da, region_da, region_lookup, "region_l1", all_statistics=True
+        )
+        assert list(df.columns[:3]) == ["datetime", "region_name", "mean_value"]
+        assert len(df) == len(region_lookup) * da.time.shape[0]
+
+        for _, row in df.iterrows():
+            region_id = int(row.region_name.split("_")[-1])
+            values = da.sel(time=row.datetime).where(region_da == region_id).values
+            values = values[~np.isnan(values)]
+            assert row.count_value == len(values)
+            if len(values) == 0:
+                assert np.isnan(row.mean_value)
+                continue
+            assert np.isclose(row.mean_value, values.mean())
+            assert np.isclose(row.std_value, values.std())
+            assert np.isclose(row.min_value, values.min())
+            assert np.isclose(row.max_value, values.max())
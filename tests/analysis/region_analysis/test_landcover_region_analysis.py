@@ -149,3 +149,19 @@ class TestLandcoverRegionAnalysis(TestRegionAnalysis):
         n_datetimes = 3
         n_lc_regions = len(valid_landcover_names)
         assert len(df) == (n_datetimes * n_lc_regions * len(["landcover"]))
+
+    def test_analyze_batch(self, tmp_path):
+        self._create_dummy_landcover_data(tmp_path)
+        self._create_dummy_true_preds_data(tmp_path)
+
+        keys = ["model", "admin_level_name", "datetime", "region_name"]
+        dfs = []
+        for batch in [False, True]:
+            analyser = LandcoverRegionAnalysis(tmp_path, batch=batch)
+            analyser.analyze()
+            dfs.append(analyser.df)
+
+        merged = dfs[0].merge(dfs[1], on=keys, suffixes=("_loop", "_batch"))
+        assert len(merged) == len(dfs[0]) == len(dfs[1]) == 3 * 4
+        for col in ["predicted_mean_value", "true_mean_value"]:
+            assert np.allclose(merged[f"{col}_loop"], merged[f"{col}_batch"])
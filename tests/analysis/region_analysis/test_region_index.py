@@ -0,0 +1,65 @@
+import numpy as np
+
+from src.analysis.region_analysis.region_index import RegionIndex, zonal_statistics
+
+
+class TestRegionIndex:
+    @staticmethod
+    def _make_labels():
+        labels = np.random.randint(0, 5, (20, 30)).astype(float)
+        labels[:3, :] = np.nan
+        return labels
+
+    def test_build(self):
+        labels = self._make_labels()
+        region_ids = [4, 0, 2, 3]
+        index = RegionIndex.build(labels, region_ids)
+
+        assert index.shape == (20, 30)
+        assert list(index.region_ids) == region_ids
+        for region_id in region_ids:
+            expected = np.flatnonzero(labels.flatten() == region_id)
+            assert (np.sort(index.region_pixels(region_id)) == expected).all()
+        # label 1 is not one of the region_ids
+        assert index.pixels.shape[0] == np.isin(labels, region_ids).sum()
+
+    def test_load_or_build(self, tmp_path):
+        source_path = tmp_path / "regions.nc"
+        source_path.write_text("regions")
+        labels = self._make_labels()
+        cache_dir = tmp_path / "region_index"
+
+        built = []
+
+        def get_labels():
+            built.append(True)
+            return labels
+
+        index = RegionIndex.load_or_build(source_path, [0, 1], get_labels, cache_dir)
+        cached = RegionIndex.load_or_build(source_path, [0, 1], get_labels, cache_dir)
+        assert len(built) == 1, "Expected the cached index to be reused"
+        assert isinstance(cached.pixels, np.memmap)
+        assert (cached.pixels == index.pixels).all()
+        assert (cached.indptr == index.indptr).all()
+        assert cached.shape == index.shape
+
+        # a different set of regions is a different index
+        RegionIndex.load_or_build(source_path, [0, 1, 2], get_labels, cache_dir)
+        assert len(built) == 2
+
+    def test_zonal_statistics(self):
+        labels = self._make_labels()
+        values = np.random.rand(3, 20 * 30)
+        values[0, :100] = np.nan
+        index = RegionIndex.build(labels, [0, 1, 2, 3, 4])
+
+        statistics = zonal_statistics(values, index)
+        for row in range(3):
+            for i, region_id in enumerate(index.region_ids):
+                region_values = values[row][labels.flatten() == region_id]
+                region_values = region_values[~np.isnan(region_values)]
+                assert statistics["count"][row, i] == len(region_values)
+                assert np.isclose(statistics["mean"][row, i], region_values.mean())
+                assert np.isclose(statistics["std"][row, i], region_values.std())
+                assert np.isclose(statistics["min"][row, i], region_values.min())
+                assert np.isclose(statistics["max"][row, i], region_values.max())
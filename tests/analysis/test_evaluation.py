@@ -1,5 +1,6 @@
 import xarray as xr
 import numpy as np
+import pandas as pd
 
 from src.analysis.evaluation import (
     # spatial_rmse,
@@ -9,13 +10,14 @@ from src.analysis.evaluation import (
     # annual_scores_to_dataframe,
     # read_pred_data,
     # read_true_data,
-    # monthly_score,
+    monthly_score,
+    batch_annual_scores,
     # plot_predictions,
     read_train_data,
     read_test_data,
 )
 
-from ..utils import _create_features_dir
+from ..utils import _create_features_dir, _make_dataset
 
 
 class TestEvaluation:
@@ -35,3 +37,57 @@ class TestEvaluation:
         X, y = read_test_data(tmp_path)
         assert isinstance(X, xr.Dataset)
         assert isinstance(y, xr.Dataset)
+
+    def test_batch_annual_scores(self, tmp_path):
+        features_dir = tmp_path / "features/one_month_forecast/test"
+        for date in pd.date_range("2000-01-01", "2001-12-31", freq="M"):
+            (features_dir / f"{date.year}_{date.month}").mkdir(parents=True)
+            vci, _, _ = _make_dataset(
+                (30, 30), variable_name="vci", start_date=date, end_date=date
+            )
+            vci.to_netcdf(features_dir / f"{date.year}_{date.month}/y.nc")
+
+        models = ["linear_regression", "ealstm"]
+        for seed, model in enumerate(models):
+            model_dir = tmp_path / "models/one_month_forecast" / model
+            model_dir.mkdir(parents=True)
+            rng = np.random.default_rng(seed)
+            for y_path in features_dir.glob("*/y.nc"):
+                true = xr.open_dataset(y_path).vci
+                preds = true + rng.normal(size=true.shape)
+                preds.values[:, :2, :] = np.nan
+                preds.to_dataset(name="preds").to_netcdf(
+                    model_dir / f"preds_{y_path.parent.name}.nc"
+                )
+
+        scores = batch_annual_scores(
+            models,
+            data_path=tmp_path,
+            pred_years=[2000, 2001],
+            target_var="vci",
+            verbose=False,
+        )
+        assert len(scores) == 2 * 2 * 12
+        assert list(scores.columns) == ["month", "year", *models, "metric", "time"]
+
+        for pred_year in [2000, 2001]:
+            for month in range(1, 13):
+                expected = monthly_score(
+                    month,
+                    models,
+                    ["rmse", "r2"],
+                    data_path=tmp_path,
+                    pred_year=pred_year,
+                    target_var="vci",
+                    verbose=False,
+                )
+                for model in models:
+                    for metric in ["rmse", "r2"]:
+                        row = scores[
+                            (scores.year == pred_year)
+                            & (scores.month == month)
+                            & (scores.metric == metric)
+                        ]
+                        assert np.isclose(
+                            row[model].values[0], expected[model][metric]
+                        ), f"{model} {metric} for {pred_year}_{month} does not match"
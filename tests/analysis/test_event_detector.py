@@ -1,7 +1,9 @@
+import warnings
 import numpy as np
 import pandas as pd
 import xarray as xr
 from src.analysis import EventDetector
+from src.analysis.event_detector import grouped_percentiles, run_length_statistics
 
 from ..utils import _create_dummy_precip_data
 
@@ -39,7 +41,7 @@ class TestEventDetector:
         _create_dummy_precip_data(tmp_path)
 
         data_dir = tmp_path / "data" / "interim"
-        precip_dir = data_dir / "chirps_preprocessed" / "chirps_kenya.nc"
+        precip_dir = data_dir / "chirps_preprocessed" / "data_kenya.nc"
 
         e = EventDetector(precip_dir)
 
@@ -175,3 +177,84 @@ class TestEventDetector:
         # longest run should be 4 (below 0.3)
         runs = e.calculate_runs()
         assert runs.max().values == 4, f"Expected the longest run to be 4 (below 0.3)"
+
+    def test_run_statistics(self, tmp_path):
+        in_path = self.create_test_consec_data(tmp_path)
+
+        e = EventDetector(in_path)
+        e.detect(variable="precip", time_period="dayofyear", hilo="low", method="std")
+        # mask one pixel (e.g. the sea)
+        e.ds.precip.values[:, 0, 0] = np.nan
+
+        stats = e.calculate_run_statistics(chunk_size=7)
+        pixel = stats.isel(lat=1, lon=1)
+        assert pixel.longest_run.values == 4
+        assert pixel.run_count.values == 2
+        assert pd.to_datetime(pixel.longest_run_start.values) == pd.to_datetime(
+            "2000-04-30"
+        )
+        assert pd.to_datetime(pixel.longest_run_end.values) == pd.to_datetime(
+            "2000-07-31"
+        )
+
+        expected_current = np.zeros(400)
+        expected_current[3:7] = [1, 2, 3, 4]
+        expected_current[10:13] = [1, 2, 3]
+        assert (pixel.current_run.values == expected_current).all()
+
+        assert np.isnan(stats.longest_run.isel(lat=0, lon=0).values)
+        assert np.isnan(stats.current_run.isel(lat=0, lon=0).values).all()
+
+        # the runs are the run_length
+        runs = e.calculate_runs()
+        assert runs.equals(stats.run_length)
+        assert e.calculate_longest_run().equals(stats.longest_run)
+
+    def test_run_length_statistics(self):
+        exceed = np.array([[1, 1, 0, 1, 0, 1, 1, 1], [0, 0, 0, 0, 0, 0, 0, 0]]).T
+
+        stats = run_length_statistics(exceed)
+        assert (stats["current_run"][:, 0] == [1, 2, 0, 1, 0, 1, 2, 3]).all()
+        assert (stats["run_length"][:, 0] == [2, 0, 0, 1, 0, 3, 0, 0]).all()
+        assert (stats["current_run"][:, 1] == 0).all()
+        assert (stats["run_length"][:, 1] == 0).all()
+        assert (stats["longest_run"] == [3, 0]).all()
+        assert (stats["run_count"] == [3, 0]).all()
+        assert (stats["longest_run_start"] == [5, -1]).all()
+        assert (stats["longest_run_end"] == [7, -1]).all()
+
+    def test_grouped_percentiles(self):
+        values = np.random.rand(48, 10)
+        values[:5, 0] = np.nan
+        values[:, 1] = np.nan
+        groups = np.tile(np.arange(1, 13), 4)
+
+        unique_groups, out = grouped_percentiles(values, groups, [10, 50, 90])
+        assert (unique_groups == np.arange(1, 13)).all()
+        assert out.shape == (12, 3, 10)
+        for i, group in enumerate(unique_groups):
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", category=RuntimeWarning)
+                expected = np.nanpercentile(
+                    values[groups == group], [10, 50, 90], axis=0
+                )
+            assert np.allclose(out[i], expected, equal_nan=True)
+
+    def test_percentile_cache(self, tmp_path):
+        in_path = self.create_test_consec_data(tmp_path)
+        cache_dir = tmp_path / "cache"
+
+        e = EventDetector(in_path, cache_dir=cache_dir)
+        e.detect(variable="precip", time_period="month", hilo="high", method="q90")
+        q90 = e.thresh
+        e.detect(variable="precip", time_period="month", hilo="low", method="q10")
+        assert len(list(cache_dir.glob("*.nc"))) == 1
+
+        # the thresholds match the groupby percentiles
+        expected = e.ds.groupby("time.month").reduce(np.nanpercentile, dim="time", q=90)
+        assert np.allclose(q90.precip.values, expected.precip.values)
+
+        # a new detector reuses the cached percentiles
+        e2 = EventDetector(in_path, cache_dir=cache_dir)
+        percentiles = e2.get_percentile_thresholds("month")
+        assert percentiles.equals(e.percentiles["month"])
@@ -0,0 +1,161 @@
+import pickle
+import random
+from importlib import import_module
+import numpy as np
+import pytest
+import shap
+import torch
+
+from src.analysis.plot_explanations import all_explanations_for_file
+from src.models import EARecurrentNetwork
+
+from tests.utils import _make_dataset
+
+
+class TestAllExplanationsForFile:
+    @staticmethod
+    def _make_model(tmp_path):
+        x, _, _ = _make_dataset(size=(5, 5))
+        y = x.isel(time=[-1])
+
+        for mode in ["train", "test"]:
+            features = tmp_path / f"features/one_month_forecast/{mode}/1980_1"
+            features.mkdir(parents=True)
+            x.to_netcdf(features / "x.nc")
+            y.to_netcdf(features / "y.nc")
+
+        norm_dict = {"VHI": {"mean": 0.0, "std": 1.0}}
+        with (tmp_path / "features/one_month_forecast/normalizing_dict.pkl").open(
+            "wb"
+        ) as f:
+            pickle.dump(norm_dict, f)
+
+        model = EARecurrentNetwork(
+            hidden_size=16, dense_features=[10], data_folder=tmp_path, static=None
+        )
+        model.train(num_epochs=1)
+        return model
+
+    @pytest.mark.parametrize("num_workers", [0, 2])
+    def test_all_explanations(self, tmp_path, monkeypatch, num_workers):
+        model = self._make_model(tmp_path)
+        test_folder = tmp_path / "features/one_month_forecast/test/1980_1"
+
+        background_sizes = []
+        explain = model.explain
+
+        def mock_explain(**kwargs):
+            background_sizes.append(kwargs["background_size"])
+            return explain(**kwargs)
+
+        if num_workers == 0:
+            monkeypatch.setattr(model, "explain", mock_explain)
+
+        all_explanations_for_file(
+            test_folder,
+            model,
+            background_size=7,
+            batch_size=10,
+            method="morris",
+            num_workers=num_workers,
+        )
+        if num_workers == 0:
+            assert background_sizes == [7, 7, 7]
+            monkeypatch.undo()
+
+        test_dl = model.get_dataloader(mode="test", to_tensor=True, shuffle_data=False)
+        _, val = list(next(iter(test_dl)).items())[0]
+        expected = model.explain(val.x, save_explanations=False, method="morris")
+
+        output_folder = model.model_dir / "analysis/1980_1"
+        assert (output_folder / "input_ModelArray.pkl").exists()
+        assert not (output_folder / ".morris_checkpoint").exists()
+        # 25 instances, so the final batch is 5 instances long
+        explained = np.load(output_folder / "morris_value_historical.npy")
+        assert explained.shape[0] == 25
+        assert np.allclose(explained, expected.historical, atol=1e-5)
+
+    def test_all_explanations_shap(self, tmp_path, monkeypatch):
+        model = self._make_model(tmp_path)
+        test_folder = tmp_path / "features/one_month_forecast/test/1980_1"
+        output_folder = model.model_dir / "analysis/1980_1"
+
+        # the gates of the recurrences aren't exactly additive under DeepLIFT's
+        # rules, so shap's additivity check fails for small, untrained models
+        shap_values = shap.DeepExplainer.shap_values
+
+        def mock_shap_values(self, X, **kwargs):
+            return shap_values(self, X, check_additivity=False)
+
+        monkeypatch.setattr(shap.DeepExplainer, "shap_values", mock_shap_values)
+
+        explained = {}
+        for num_workers in [0, 2]:
+            # the same background samples are drawn by both runs
+            random.seed(42)
+            np.random.seed(42)
+            all_explanations_for_file(
+                test_folder,
+                model,
+                background_size=5,
+                batch_size=10,
+                method="shap",
+                num_workers=num_workers,
+            )
+            explained[num_workers] = np.load(
+                output_folder / "shap_value_historical.npy"
+            )
+
+        assert explained[0].shape[0] == 25
+        assert not np.allclose(explained[0], 0)
+        # the workers' explainers (with the shared background) give the same values
+        assert np.allclose(explained[0], explained[2], atol=1e-5)
+
+    def test_resume(self, tmp_path, monkeypatch):
+        model = self._make_model(tmp_path)
+        test_folder = tmp_path / "features/one_month_forecast/test/1980_1"
+
+        # src.analysis.plot_explanations is also the name of a function
+        plot_explanations = import_module("src.analysis.plot_explanations")
+        explanation_arrays = plot_explanations._explanation_arrays
+        batch_sizes = []
+
+        def mock_explanation_arrays(model, x, method, background_size):
+            batch_sizes.append(x.historical.shape[0])
+            if len(batch_sizes) == 3:
+                raise KeyboardInterrupt
+            return explanation_arrays(model, x, method, background_size)
+
+        monkeypatch.setattr(
+            plot_explanations, "_explanation_arrays", mock_explanation_arrays
+        )
+        with pytest.raises(KeyboardInterrupt):
+            all_explanations_for_file(
+                test_folder, model, batch_size=10, method="morris"
+            )
+        assert (model.model_dir / "analysis/1980_1/.morris_checkpoint").exists()
+
+        all_explanations_for_file(test_folder, model, batch_size=10, method="morris")
+        # the first two batches are not recalculated, so only
+        # the final batch (of 5 instances) is explained again
+        assert batch_sizes == [10, 10, 5, 5]
+
+        test_dl = model.get_dataloader(mode="test", to_tensor=True, shuffle_data=False)
+        _, val = list(next(iter(test_dl)).items())[0]
+        expected = model.explain(val.x, save_explanations=False, method="morris")
+        explained = np.load(
+            model.model_dir / "analysis/1980_1/morris_value_historical.npy"
+        )
+        assert np.allclose(explained, expected.historical, atol=1e-5)
+
+        # a checkpoint of a different model isn't resumed
+        batch_sizes.clear()
+        with pytest.raises(KeyboardInterrupt):
+            all_explanations_for_file(
+                test_folder, model, batch_size=10, method="morris"
+            )
+        with torch.no_grad():
+            for parameter in model.model.parameters():
+                parameter.add_(1)
+        all_explanations_for_file(test_folder, model, batch_size=10, method="morris")
+        assert batch_sizes == [10, 10, 5, 10, 10, 5]
@@ -28,11 +28,6 @@ try:
 except ImportError:
     collect_ignore.append("exporters/test_chirps.py")
 
-try:
-    import xclim
-except ImportError:
-    collect_ignore.append("analysis/test_event_detector.py")
-
 try:
     import bottleneck
 except ImportError:
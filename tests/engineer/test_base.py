@@ -1,4 +1,8 @@
+import pytest
+import xarray as xr
+
 from src.engineer.base import _EngineerBase as Engineer
+from src.engineer import _NowcastEngineer, _OneMonthForecastEngineer
 
 from ..utils import _make_dataset
 
@@ -70,3 +74,98 @@ class TestEngineer:
         assert set(output_vars) == set(
             expected_vars
         ), f"Did not retrieve all the expected variables!"
+
+    @pytest.mark.parametrize(
+        "engineer_class", [_OneMonthForecastEngineer, _NowcastEngineer]
+    )
+    def test_stratify_windows(self, tmp_path, engineer_class):
+        _setup(tmp_path)
+        engineer = engineer_class(tmp_path)
+
+        ds = xr.merge(
+            [
+                _make_dataset((5, 5), "a", start_date="1995-01-01")[0],
+                _make_dataset((5, 5), "b", start_date="1995-01-01")[0],
+            ]
+        )
+        targets = [
+            (year, month) for year in range(1995, 2002) for month in range(1, 13)
+        ]
+
+        windows = list(engineer._stratify_windows(ds, targets, "a", 12, 12))
+        assert len(windows) == len(targets)
+
+        for (year, month), (xy_dict, max_train_date) in zip(targets, windows):
+            expected_dict, expected_date = engineer._stratify_xy(
+                ds=ds,
+                year=year,
+                target_variable="a",
+                target_month=month,
+                pred_months=12,
+                expected_length=12,
+            )
+            assert max_train_date == expected_date
+            if expected_dict is None:
+                assert xy_dict is None
+            else:
+                for x_or_y, expected_ds in expected_dict.items():
+                    assert xy_dict[x_or_y].identical(expected_ds)
+
+    def test_engineer_num_workers(self, tmp_path):
+        _setup(tmp_path)
+
+        serial = _OneMonthForecastEngineer(tmp_path)
+        serial.engineer(
+            test_year=2001, target_variable="a", pred_months=11, expected_length=11
+        )
+
+        serial_files = {
+            path.relative_to(serial.output_folder): path.read_bytes()
+            for path in serial.output_folder.glob("*/*/*.nc")
+        }
+        for path in serial.output_folder.glob("*/*/*.nc"):
+            path.unlink()
+
+        parallel = _OneMonthForecastEngineer(tmp_path)
+        parallel.engineer(
+            test_year=2001,
+            target_variable="a",
+            pred_months=11,
+            expected_length=11,
+            num_workers=2,
+        )
+        parallel_files = {
+            path.relative_to(parallel.output_folder): path.read_bytes()
+            for path in parallel.output_folder.glob("*/*/*.nc")
+        }
+        assert len(serial_files) > 0
+        assert serial_files == parallel_files
+
+    def test_join_chunked(self, tmp_path, monkeypatch, capsys):
+
+        interim_folder = tmp_path / "interim"
+        for var, start_date in [("a", "1999-01-01"), ("b", "2000-01-01")]:
+            (interim_folder / f"{var}_preprocessed").mkdir(parents=True)
+            data, _, _ = _make_dataset((10, 10), var, start_date=start_date)
+            data.to_netcdf(interim_folder / f"{var}_preprocessed/hello.nc")
+
+        def mock_init(self, data_folder):
+            self.name = "dummy"
+            self.interim_folder = data_folder / "interim"
+
+        monkeypatch.setattr(Engineer, "__init__", mock_init)
+
+        engineer = Engineer(tmp_path)
+        eager_ds = engineer._make_dataset(static=False).load()
+        lazy_ds = engineer._make_dataset(static=False, time_chunks=5)
+
+        assert lazy_ds.a.chunks is not None, "Expected the joined dataset to be lazy"
+        assert lazy_ds.time.size == eager_ds.time.size == 24, "Expected an inner join"
+
+        capsys.readouterr()
+        assert engineer._load_dataset(lazy_ds).identical(eager_ds)
+
+        # the time taken to read each source is reported
+        captured = capsys.readouterr()
+        assert "Read a in" in captured.out
+        assert "Read b in" in captured.out
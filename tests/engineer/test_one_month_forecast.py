@@ -5,6 +5,7 @@ import xarray as xr
 import datetime as dt
 
 from src.engineer import _OneMonthForecastEngineer as OneMonthForecastEngineer
+from src.models.data import DataLoader
 
 from ..utils import _make_dataset
 from .test_base import _setup
@@ -141,3 +142,171 @@ class TestOneMonthForecastEngineer:
         ), f"\
         the max_train_date should be one month before the `target_month`,\
         `year`"
+
+    def test_engineer_incremental(self, tmp_path, monkeypatch):
+
+        _setup(tmp_path)
+        features = tmp_path / "features/one_month_forecast"
+
+        engineer = OneMonthForecastEngineer(tmp_path)
+        engineer_kwargs = {
+            "target_variable": "a",
+            "pred_months": 11,
+            "expected_length": 11,
+            "incremental": True,
+        }
+        engineer.engineer(test_year=2001, **engineer_kwargs)
+        assert (features / "manifest.json").exists(), "Manifest not saved!"
+
+        mtimes = {
+            folder: (features / folder / "x.nc").stat().st_mtime_ns
+            for folder in ["train/2000_12", "test/2001_3", "test/2001_7"]
+        }
+
+        # nothing has changed, so nothing should be stratified or rewritten
+        with monkeypatch.context() as m:
+            m.setattr(
+                engineer,
+                "_stratify_xy",
+                lambda *args, **kwargs: pytest.fail("No windows should be stratified"),
+            )
+            engineer.engineer(test_year=2001, **engineer_kwargs)
+        assert engineer._changed_folders == []
+        for folder, mtime in mtimes.items():
+            assert (features / folder / "x.nc").stat().st_mtime_ns == mtime
+
+        # update a single month of data
+        a_file = tmp_path / "interim/a_preprocessed/hello.nc"
+        a = xr.open_dataset(a_file).load()
+        a["a"].loc[{"time": "2001-06"}] = 5
+        # the previous run may still have the original file open
+        a.to_netcdf(tmp_path / "a_updated.nc")
+        (tmp_path / "a_updated.nc").replace(a_file)
+
+        loaded_sizes = []
+        load_dataset = engineer._load_dataset
+
+        def mock_load_dataset(data):
+            loaded_sizes.append(data.time.size)
+            return load_dataset(data)
+
+        with monkeypatch.context() as m:
+            m.setattr(engineer, "_load_dataset", mock_load_dataset)
+            engineer.engineer(test_year=2001, **engineer_kwargs)
+        assert set(engineer._changed_folders) == {
+            f"test/2001_{month}" for month in range(6, 13)
+        }, "Expected only the folders which use June 2001 to be rewritten"
+        # only the windows of those folders (July 2000 - December 2001) are loaded
+        assert loaded_sizes == [18]
+        assert (features / "train/2000_12/x.nc").stat().st_mtime_ns == mtimes[
+            "train/2000_12"
+        ]
+        assert (features / "test/2001_3/x.nc").stat().st_mtime_ns == mtimes[
+            "test/2001_3"
+        ]
+        assert (features / "test/2001_7/x.nc").stat().st_mtime_ns != mtimes[
+            "test/2001_7"
+        ]
+
+        # moving the test year forwards adds 2001 to the training data
+        engineer.engineer(test_year=2002, **engineer_kwargs)
+        assert (features / "train/2001_12/x.nc").exists()
+
+        with (features / "normalizing_dict.pkl").open("rb") as f:
+            norm_dict = pickle.load(f)
+        expected = a["a"].sel(time=slice(None, "2001-12-31"))
+        assert np.isclose(norm_dict["a"]["mean"], float(expected.mean()))
+        assert np.isclose(norm_dict["a"]["std"], float(expected.std()))
+        assert norm_dict["b"]["mean"] == 1
+        assert norm_dict["b"]["std"] == 0
+
+    def test_engineer_incremental_normalization(self, tmp_path):
+        _setup(tmp_path)
+        features = tmp_path / "features/one_month_forecast"
+
+        # a large offset (like temperatures in K, but more so), for which the
+        # variance is lost to cancellation if calculated from a sum of squares
+        a_file = tmp_path / "interim/a_preprocessed/hello.nc"
+        a = xr.open_dataset(a_file).load()
+        a["a"].values = 1e8 + np.random.rand(*a["a"].shape)
+        a.to_netcdf(tmp_path / "a_updated.nc")
+        (tmp_path / "a_updated.nc").replace(a_file)
+
+        engineer = OneMonthForecastEngineer(tmp_path)
+        engineer_kwargs = {
+            "target_variable": "a",
+            "pred_months": 11,
+            "expected_length": 11,
+        }
+        # the second run adds 2001 to the running statistics of the first
+        engineer.engineer(test_year=2001, incremental=True, **engineer_kwargs)
+        engineer.engineer(test_year=2002, incremental=True, **engineer_kwargs)
+        with (features / "normalizing_dict.pkl").open("rb") as f:
+            incremental_norm_dict = pickle.load(f)
+
+        engineer.engineer(test_year=2002, incremental=False, **engineer_kwargs)
+        with (features / "normalizing_dict.pkl").open("rb") as f:
+            norm_dict = pickle.load(f)
+
+        for var in ["a", "b"]:
+            for key in ["mean", "std"]:
+                assert np.isclose(
+                    incremental_norm_dict[var][key], norm_dict[var][key], rtol=1e-6
+                ), f"Incremental {var} {key} differs from a full recompute"
+
+    def test_engineer_incremental_cache(self, tmp_path, monkeypatch):
+        _setup(tmp_path)
+        features = tmp_path / "features/one_month_forecast"
+
+        # non-constant data, so that the normalization values change with the
+        # training period
+        a_file = tmp_path / "interim/a_preprocessed/hello.nc"
+        a = xr.open_dataset(a_file).load()
+        a["a"].values = np.random.rand(*a["a"].shape)
+        a.to_netcdf(tmp_path / "a_updated.nc")
+        (tmp_path / "a_updated.nc").replace(a_file)
+
+        engineer = OneMonthForecastEngineer(tmp_path)
+        engineer_kwargs = {
+            "target_variable": "a",
+            "pred_months": 11,
+            "expected_length": 11,
+            "incremental": True,
+        }
+        engineer.engineer(test_year=2001, **engineer_kwargs)
+
+        def load_folder(cache):
+            # b is constant, so normalizing it would make every instance nan
+            loader = DataLoader(
+                data_path=tmp_path,
+                static=None,
+                shuffle_data=False,
+                ignore_vars=["b"],
+                cache=cache,
+            )
+            loader.data_files = [features / "train/2000_12"]
+            return next(iter(loader))
+
+        load_folder(cache=True)
+        norm_mtime = (features / "normalizing_dict.pkl").stat().st_mtime_ns
+
+        # nothing has changed, so the normalizing dict (and the cache) are still valid
+        engineer.engineer(test_year=2001, **engineer_kwargs)
+        assert (features / "normalizing_dict.pkl").stat().st_mtime_ns == norm_mtime
+        with monkeypatch.context() as m:
+
+            def mock_open_dataset(*args, **kwargs):
+                raise AssertionError("Data should have been read from the cache!")
+
+            m.setattr(xr, "open_dataset", mock_open_dataset)
+            load_folder(cache=True)
+
+        # moving the test year forwards changes the normalization values, so the
+        # cache of train/2000_12 is stale even though the folder wasn't rewritten
+        engineer.engineer(test_year=2002, **engineer_kwargs)
+        assert "train/2000_12" not in engineer._changed_folders
+        assert (features / "normalizing_dict.pkl").stat().st_mtime_ns != norm_mtime
+        cached_x, cached_y = load_folder(cache=True)
+        uncached_x, uncached_y = load_folder(cache=False)
+        assert np.array_equal(cached_x[0], uncached_x[0])
+        assert np.array_equal(cached_y, uncached_y)
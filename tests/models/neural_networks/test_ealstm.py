@@ -128,6 +128,46 @@ class TestEARecurrentNetwork:
 
         assert type(model.model) == EALSTM, f"Model attribute not an EALSTM!"
 
+    def test_train_in_memory(self, tmp_path, capsys):
+        x, _, _ = _make_dataset(size=(5, 5), const=True)
+        y = x.isel(time=[-1])
+
+        norm_dict = {"VHI": {"mean": 0, "std": 1}}
+        (tmp_path / "features/one_month_forecast").mkdir(parents=True)
+        with (tmp_path / "features/one_month_forecast/normalizing_dict.pkl").open(
+            "wb"
+        ) as f:
+            pickle.dump(norm_dict, f)
+
+        for folder in ["1980_1", "1980_2"]:
+            test_features = tmp_path / f"features/one_month_forecast/train/{folder}"
+            test_features.mkdir(parents=True)
+            x.to_netcdf(test_features / "x.nc")
+            y.to_netcdf(test_features / "y.nc")
+
+        model = EARecurrentNetwork(
+            hidden_size=16,
+            dense_features=[10],
+            data_folder=tmp_path,
+            include_latlons=True,
+            static=None,
+        )
+        train_data = model._load_in_memory(
+            model.get_dataloader(mode="train", to_tensor=False)
+        )
+        x_tensors, y_tensor = train_data
+        # all the instances of both files
+        assert y_tensor.shape[0] == 2 * 25
+        assert x_tensors[0].is_contiguous() and x_tensors[0].dtype == torch.float32
+        assert x_tensors[5] is None, "Expected no static data"
+
+        model.train(num_epochs=2, batch_size=8, in_memory=True)
+
+        captured = capsys.readouterr()
+        assert "Loaded 50 instances into memory" in captured.out
+        assert "Epoch 2, train smooth L1: " in captured.out
+        assert type(model.model) == EALSTM
+
     @pytest.mark.parametrize(
         "use_pred_months,predict_delta",
         [(True, True), (False, True), (True, False), (False, False)],
@@ -206,6 +246,17 @@ class TestEARecurrentNetwork:
             # assert type(output_s) is TrainData
             # assert (model.model_dir / "analysis/shap_value_historical.npy").exists()
 
+            # the fused recurrence is restored even if the explainer fails
+            class MockExplainer:
+                def shap_values(self, inputs):
+                    assert not model.model.rnn.fused
+                    raise ValueError("shap failed")
+
+            model.explainer = MockExplainer()
+            with pytest.raises(ValueError):
+                model.explain(val.x, save_explanations=False, method="shap")
+            assert model.model.rnn.fused
+
 
 class TestEALSTMCell:
     @staticmethod
@@ -263,3 +314,36 @@ class TestEALSTMCell:
         assert np.isclose(
             org_cn.numpy(), our_cn.numpy(), 0.01
         ).all(), "Difference in cell state"
+
+    @staticmethod
+    def test_fused_ealstm():
+        batch_size, hidden_size, timesteps, dyn_input, static_input = 3, 5, 4, 6, 4
+
+        ealstm = OrgEALSTMCell(
+            input_size_dyn=dyn_input,
+            input_size_stat=static_input,
+            hidden_size=hidden_size,
+            initial_forget_bias=1,
+        )
+        assert ealstm.fused, "Expected the fused recurrence by default"
+
+        static = torch.rand(batch_size, static_input)
+        dynamic = torch.rand(batch_size, timesteps, dyn_input)
+
+        fused_hn, fused_cn = ealstm(dynamic, static)
+        fused_final_hn, _ = ealstm(dynamic, static, return_sequence=False)
+        fused_final_hn.sum().backward()
+        fused_grad = ealstm.weight_hh.grad.clone()
+        ealstm.zero_grad()
+
+        ealstm.fused = False
+        hn, cn = ealstm(dynamic, static)
+        final_hn, _ = ealstm(dynamic, static, return_sequence=False)
+        final_hn.sum().backward()
+
+        assert fused_hn.shape == hn.shape == (batch_size, timesteps, hidden_size)
+        assert fused_final_hn.shape == (batch_size, 1, hidden_size)
+        assert torch.allclose(fused_hn, hn, atol=1e-6), "Difference in hidden state"
+        assert torch.allclose(fused_cn, cn, atol=1e-6), "Difference in cell state"
+        assert torch.allclose(fused_final_hn, hn[:, -1:], atol=1e-6)
+        assert torch.allclose(fused_grad, ealstm.weight_hh.grad, atol=1e-6)
@@ -278,3 +278,12 @@ class TestLinearNetwork:
         assert (
             len(background[1].shape) == 2
         ), f"Expected 2 dimensions, got {len(background[1].shape)}"
+
+    def test_one_hot(self, tmp_path):
+        model = LinearNetwork(
+            data_folder=tmp_path, layer_sizes=[100], normalize_y=False
+        )
+        indices = torch.tensor([[0], [1], [5], [12], [13], [7]]).float()
+
+        expected = torch.eye(14)[indices.squeeze(-1).long()][:, 1:-1]
+        assert torch.equal(model._one_hot(indices, 12), expected)
@@ -231,3 +231,72 @@ class TestUnrolledRNN:
         assert np.isclose(
             t_cell.numpy(), o_cell.numpy(), 0.01
         ).all(), "Difference in cell state"
+
+    @staticmethod
+    def test_lstm_conversion():
+        batch_size, hidden_size, features_per_month = 8, 16, 6
+        x = torch.rand(batch_size, 5, features_per_month)
+
+        our_rnn = UnrolledRNN(
+            input_size=features_per_month, hidden_size=hidden_size, batch_first=True
+        )
+        torch_rnn = our_rnn.to_lstm()
+        with torch.no_grad():
+            t_out, (t_hidden, _) = torch_rnn(x)
+            o_hidden = our_rnn.forward_fused(x)
+        assert torch.allclose(t_hidden[0], o_hidden, atol=1e-6)
+
+        # converting back is lossless
+        unrolled = UnrolledRNN.from_lstm(torch_rnn)
+        for our_pam, pam in zip(our_rnn.parameters(), unrolled.parameters()):
+            assert torch.equal(our_pam, pam)
+
+
+class TestRNN:
+    @staticmethod
+    def test_fused_forward():
+        batch_size, features_per_month, static_size = 8, 6, 3
+        model = RNN(
+            features_per_month=features_per_month,
+            dense_features=[4],
+            hidden_size=16,
+            rnn_dropout=0.25,
+            include_pred_month=True,
+            include_latlons=False,
+            experiment="one_month_forecast",
+            include_prev_y=True,
+            static_size=static_size,
+        )
+        model.eval()
+        assert model.rnn.fused, "Expected the fused RNN by default"
+
+        inputs = (
+            torch.rand(batch_size, 5, features_per_month),
+            torch.rand(batch_size, 12),
+            None,
+            None,
+            None,
+            torch.rand(batch_size, static_size),
+            torch.rand(batch_size, 1),
+        )
+        fused_out = model(*inputs)
+        fused_out.sum().backward()
+        fused_grads = [pam.grad.clone() for pam in model.parameters()]
+        model.zero_grad()
+
+        model.rnn.fused = False
+        out = model(*inputs)
+        out.sum().backward()
+
+        assert torch.allclose(fused_out, out, atol=1e-6)
+        for fused_grad, pam in zip(fused_grads, model.parameters()):
+            assert torch.allclose(fused_grad, pam.grad, atol=1e-6)
+
+        # with the same dropout masks when training
+        model.train()
+        torch.manual_seed(42)
+        out = model(*inputs)
+        model.rnn.fused = True
+        torch.manual_seed(42)
+        fused_out = model(*inputs)
+        assert torch.allclose(fused_out, out, atol=1e-6)
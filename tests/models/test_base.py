@@ -54,3 +54,11 @@ class TestBase:
         assert (
             expected_stdout in captured.out
         ), f"Expected stdout to be {expected_stdout}, got {captured.out}"
+
+    def test_one_hot(self, tmp_path):
+        model = ModelBase(tmp_path)
+        x = np.array([[0], [1], [5], [12], [13], [7]])
+
+        # 0 and num_vals + 1 are encoded as all zeros
+        expected = np.eye(14)[x.squeeze(-1)][:, 1:-1]
+        assert (model._one_hot(x, 12) == expected).all()
@@ -1,9 +1,12 @@
+import gc
 import torch
 import numpy as np
 import pytest
 import xarray as xr
 import pandas as pd
+import pickle
 
+from src.engineer import Engineer
 from src.models.data import DataLoader, _BaseIter, TrainData
 
 from ..utils import _make_dataset
@@ -150,6 +153,13 @@ class TestBaseIter:
                 self.spatial_mask = None
                 self.static_normalizing_dict = None
                 self.normalize_y = normalize
+                self.cache_folder = None
+                self.cache_dependencies = {}
+                self.store = None
+                self.num_workers = 0
+                self.worker_type = "thread"
+                self.prefetch_depth = 2
+                self.prefetch_stats = {}
 
         base_iterator = _BaseIter(MockLoader())
 
@@ -281,6 +291,247 @@ class TestBaseIter:
                 base_iterator.predict_delta
             ), "should have set model_ derivative to True"
 
+    @pytest.mark.parametrize("predict_delta", [True, False])
+    def test_cache(self, tmp_path, monkeypatch, predict_delta):
+        x, _, _ = _make_dataset(size=(5, 5))
+        x_add, _, _ = _make_dataset(size=(5, 5), variable_name="precip")
+        x = xr.merge([x, x_add])
+        y = x[["VHI"]].isel(time=[-1])
+        x = x.isel(time=slice(0, -1))
+
+        features = tmp_path / "features/one_month_forecast/train/1999_12"
+        features.mkdir(parents=True)
+        x.to_netcdf(features / "x.nc")
+        y.to_netcdf(features / "y.nc")
+
+        norm_dict = {var: {"mean": 0, "std": 1} for var in ["VHI", "precip"]}
+        with (tmp_path / "features/one_month_forecast/normalizing_dict.pkl").open(
+            "wb"
+        ) as f:
+            pickle.dump(norm_dict, f)
+
+        loader_kwargs = {
+            "data_path": tmp_path,
+            "static": None,
+            "surrounding_pixels": 1,
+            "predict_delta": predict_delta,
+        }
+        uncached_x, uncached_y = next(iter(DataLoader(**loader_kwargs)))
+        cached_x, cached_y = next(iter(DataLoader(cache=True, **loader_kwargs)))
+
+        cache_folders = list(
+            (tmp_path / "features/one_month_forecast/cache").glob("*/train/1999_12")
+        )
+        assert len(cache_folders) == 1, "Expected one cached folder"
+        assert (cache_folders[0] / "metadata.pkl").exists()
+
+        # the cache should now be read without opening the netcdf files
+        def mock_open_dataset(*args, **kwargs):
+            raise AssertionError("Data should have been read from the cache!")
+
+        monkeypatch.setattr(xr, "open_dataset", mock_open_dataset)
+        reread_x, reread_y = next(iter(DataLoader(cache=True, **loader_kwargs)))
+
+        for uncached, cached, reread in zip(uncached_x, cached_x, reread_x):
+            if uncached is None:
+                assert cached is None and reread is None
+            else:
+                assert np.array_equal(uncached, cached)
+                assert np.array_equal(uncached, reread)
+        assert np.array_equal(uncached_y, reread_y)
+
+        # a different configuration should use a different cache
+        monkeypatch.undo()
+        next(
+            iter(
+                DataLoader(cache=True, **{**loader_kwargs, "surrounding_pixels": None})
+            )
+        )
+        assert (
+            len(list((tmp_path / "features/one_month_forecast/cache").iterdir())) == 2
+        ), "Expected a second cache for a different configuration"
+
+        # rewriting the normalizing dict invalidates the cached (normalized) arrays
+        norm_dict = {var: {"mean": 1, "std": 2} for var in ["VHI", "precip"]}
+        with (tmp_path / "features/one_month_forecast/normalizing_dict.pkl").open(
+            "wb"
+        ) as f:
+            pickle.dump(norm_dict, f)
+        renormalized_x, _ = next(iter(DataLoader(**loader_kwargs)))
+        recached_x, _ = next(iter(DataLoader(cache=True, **loader_kwargs)))
+        assert not np.array_equal(uncached_x[0], renormalized_x[0])
+        assert np.array_equal(renormalized_x[0], recached_x[0])
+
+        if not predict_delta:
+            # arrays with NaNs aren't cached, so they shouldn't be read from the cache
+            # (predict_delta expects the NaNs to be cleared)
+            iterator = iter(DataLoader(cache=True, **loader_kwargs))
+            monkeypatch.setattr(
+                iterator,
+                "_read_cache",
+                lambda folder: pytest.fail("The cache is only for clear_nans=True"),
+            )
+            iterator.ds_folder_to_np(features, clear_nans=False)
+
+        # adding the previous year's folder invalidates the cached prev_y_var
+        cached_prev_y = (
+            iter(DataLoader(cache=True, **loader_kwargs))
+            .ds_folder_to_np(features)
+            .x.prev_y_var
+        )
+        previous_year = tmp_path / "features/one_month_forecast/train/1998_12"
+        previous_year.mkdir()
+        (y + 1).to_netcdf(previous_year / "y.nc")
+        uncached_prev_y = (
+            iter(DataLoader(**loader_kwargs)).ds_folder_to_np(features).x.prev_y_var
+        )
+        recached_prev_y = (
+            iter(DataLoader(cache=True, **loader_kwargs))
+            .ds_folder_to_np(features)
+            .x.prev_y_var
+        )
+        assert not np.array_equal(cached_prev_y, uncached_prev_y)
+        assert np.array_equal(uncached_prev_y, recached_prev_y)
+
+    @pytest.mark.parametrize(
+        "experiment,mode",
+        [
+            ("one_month_forecast", "train"),
+            ("one_month_forecast", "test"),
+            ("nowcast", "train"),
+            ("nowcast", "test"),
+        ],
+    )
+    def test_feature_store(self, tmp_path, experiment, mode):
+        interim_data = {
+            var: _make_dataset((5, 5), var, start_date="1998-01-01")[0].astype(float)
+            for var in ["a", "b"]
+        }
+        for output_format in ["folders", "store"]:
+            for var, data in interim_data.items():
+                data_folder = tmp_path / f"{output_format}/interim/{var}_preprocessed"
+                data_folder.mkdir(parents=True)
+                data.to_netcdf(data_folder / "data.nc")
+
+            Engineer(
+                tmp_path / output_format, process_static=False, experiment=experiment
+            ).engineer(
+                test_year=2001,
+                target_variable="a",
+                pred_months=6,
+                expected_length=6,
+                output_format=output_format,
+            )
+
+        store_features = tmp_path / f"store/features/{experiment}"
+        assert (store_features / "store/data.nc").exists()
+        assert not (store_features / "train").exists()
+
+        loader_kwargs = {
+            "mode": mode,
+            "experiment": experiment,
+            "shuffle_data": False,
+            "static": None,
+            "pred_months": [2, 7],
+            "batch_file_size": 1,
+        }
+        folder_loader = DataLoader(data_path=tmp_path / "folders", **loader_kwargs)
+        store_loader = DataLoader(data_path=tmp_path / "store", **loader_kwargs)
+
+        assert sorted(f.name for f in folder_loader.data_files) == sorted(
+            f.name for f in store_loader.data_files
+        )
+        folder_loader.data_files.sort(key=lambda path: path.name)
+        store_loader.data_files.sort(key=lambda path: path.name)
+
+        for folder_arrays, store_arrays in zip(folder_loader, store_loader):
+            if mode == "train":
+                for folder_x, store_x in zip(folder_arrays[0], store_arrays[0]):
+                    if folder_x is None:
+                        assert store_x is None
+                    else:
+                        assert np.array_equal(folder_x, store_x)
+                assert np.array_equal(folder_arrays[1], store_arrays[1])
+            else:
+                assert folder_arrays.keys() == store_arrays.keys()
+                for key, folder_val in folder_arrays.items():
+                    store_val = store_arrays[key]
+                    assert folder_val.x_vars == store_val.x_vars
+                    assert np.array_equal(
+                        folder_val.x.historical, store_val.x.historical
+                    )
+                    assert np.array_equal(
+                        folder_val.x.prev_y_var, store_val.x.prev_y_var
+                    )
+                    assert np.array_equal(folder_val.y, store_val.y)
+
+    @pytest.mark.parametrize(
+        "mode,worker_type",
+        [("train", "thread"), ("test", "thread"), ("train", "process")],
+    )
+    def test_prefetch(self, tmp_path, mode, worker_type):
+        x, _, _ = _make_dataset(size=(5, 5))
+        y = x[["VHI"]].isel(time=[-1])
+        x = x.isel(time=slice(0, -1))
+
+        for month in range(1, 5):
+            features = tmp_path / f"features/one_month_forecast/{mode}/1999_{month}"
+            features.mkdir(parents=True)
+            x.to_netcdf(features / "x.nc")
+            (y + month).to_netcdf(features / "y.nc")
+
+        norm_dict = {"VHI": {"mean": 0, "std": 1}}
+        with (tmp_path / "features/one_month_forecast/normalizing_dict.pkl").open(
+            "wb"
+        ) as f:
+            pickle.dump(norm_dict, f)
+
+        loader_kwargs = {
+            "data_path": tmp_path,
+            "mode": mode,
+            "static": None,
+            "shuffle_data": False,
+            "batch_file_size": 1,
+        }
+        expected = list(DataLoader(**loader_kwargs))
+
+        loader = DataLoader(
+            num_workers=2, prefetch_depth=3, worker_type=worker_type, **loader_kwargs
+        )
+        prefetched = list(loader)
+
+        assert len(prefetched) == len(expected) == 4
+        for exp, pre in zip(expected, prefetched):
+            if mode == "train":
+                assert np.array_equal(exp[0][0], pre[0][0])
+                assert np.array_equal(exp[1], pre[1])
+            else:
+                assert exp.keys() == pre.keys()
+                for key in exp:
+                    assert np.array_equal(exp[key].x.historical, pre[key].x.historical)
+                    assert np.array_equal(exp[key].y, pre[key].y)
+
+        assert loader.prefetch_stats["loaded"] == 4
+        assert 0 <= loader.prefetch_stats["waited"] <= 4
+
+        # the workers are started lazily, and shut down even if
+        # the iterator isn't exhausted
+        iterator = iter(loader)
+        assert iterator._executor is None
+        next(iterator)
+        executor = iterator._executor
+        assert executor is not None
+        del iterator
+        gc.collect()
+        if worker_type == "thread":
+            assert executor._shutdown
+        else:
+            assert executor._shutdown_thread
+
+        with iter(loader) as iterator:
+            next(iterator)
+        assert iterator._executor is None
+
     @pytest.mark.parametrize(
         "surrounding_pixels,monthly_agg",
         [(1, True), (1, False), (None, True), (None, False)],
@@ -330,3 +581,33 @@ class TestBaseIter:
                 )
 
                 assert actual_mean == output_mean, f"Mean values don't match!"
+
+    @pytest.mark.parametrize("surrounding_pixels", [1, 2])
+    def test_stack_with_extra_dims(self, surrounding_pixels):
+        x, _, _ = _make_dataset(size=(6, 7))
+        x_add, _, _ = _make_dataset(size=(6, 7), variable_name="precip")
+        x = xr.merge([x, x_add])
+
+        # the per-variable xarray shifts the stacked array replaces
+        expected = x.copy()
+        for var in x.data_vars:
+            expected[f"spatial_mean_{var}"] = xr.ones_like(x[var]) * x[var].mean(
+                dim=["lat", "lon"]
+            )
+        pixel_range = range(-surrounding_pixels, surrounding_pixels + 1)
+        for var in x.data_vars:
+            for lat in pixel_range:
+                for lon in pixel_range:
+                    if lat == lon == 0:
+                        continue
+                    expected[f"lat_{lat}_lon_{lon}_{var}"] = x[var].shift(
+                        lat=lat, lon=lon
+                    )
+
+        values, var_names, dims = _BaseIter._stack_with_extra_dims(
+            x, surrounding_pixels, True
+        )
+
+        assert var_names == list(expected.data_vars), "Variable order changed!"
+        assert dims == expected.to_array().dims[1:]
+        np.testing.assert_allclose(values, expected.to_array().values)
@@ -86,3 +86,60 @@ class TestGBDT:
         pred_ds = xr.open_dataset(save_path / "preds_1980_1.nc")
         assert np.isin(["lat", "lon", "time"], [c for c in pred_ds.coords]).all()
         assert y.time == pred_ds.time
+
+    @pytest.mark.parametrize(
+        "early_stopping,external_memory", [(None, False), (2, False), (2, True)]
+    )
+    def test_train_streaming(self, tmp_path, early_stopping, external_memory):
+
+        xgb = pytest.importorskip("xgboost")
+
+        experiment = "one_month_forecast"
+        x, _, _ = _make_dataset(size=(5, 5))
+        x_add, _, _ = _make_dataset(size=(5, 5), variable_name="precip")
+        x = xr.merge([x, x_add])
+        y = x[["VHI"]].isel(time=[-1])
+        x = x.isel(time=slice(0, -1))
+
+        norm_dict = {"VHI": {"mean": 0, "std": 1}, "precip": {"mean": 0, "std": 1}}
+        for mode, months in [("train", range(1, 11)), ("test", [11])]:
+            for month in months:
+                features = tmp_path / f"features/{experiment}/{mode}/1980_{month}"
+                features.mkdir(parents=True)
+                x.to_netcdf(features / "x.nc")
+                y.to_netcdf(features / "y.nc")
+
+        with (tmp_path / f"features/{experiment}/normalizing_dict.pkl").open("wb") as f:
+            pickle.dump(norm_dict, f)
+
+        model = GBDT(tmp_path, experiment=experiment, static=None, normalize_y=False)
+        cache_prefix = str(tmp_path / "xgb_cache") if external_memory else None
+        model.train(
+            early_stopping=early_stopping,
+            streaming=True,
+            cache_prefix=cache_prefix,
+            n_estimators=5,
+        )
+
+        assert type(model.model) == xgb.XGBRegressor
+        assert type(model.booster) == xgb.Booster
+        assert model.booster.num_boosted_rounds() <= 5
+
+        test_arrays_dict, preds_dict = model.predict()
+        assert test_arrays_dict["1980_11"]["y"].size == preds_dict["1980_11"].shape[0]
+
+        explanations = model.explain(save_shap_values=False)
+        assert explanations.shape[0] == preds_dict["1980_11"].shape[0]
+        # the contributions (and the bias) sum to the predictions
+        assert np.allclose(explanations.sum(axis=-1), preds_dict["1980_11"], atol=1e-4)
+
+        # the booster is saved and loaded with the model
+        model.save_model()
+        with (model.model_dir / "model.pkl").open("rb") as f:
+            model_data = pickle.load(f)
+        loaded_model = GBDT(
+            tmp_path, experiment=experiment, static=None, normalize_y=False
+        )
+        loaded_model.load(**model_data["model"])
+        _, loaded_preds_dict = loaded_model.predict()
+        assert np.array_equal(loaded_preds_dict["1980_11"], preds_dict["1980_11"])
@@ -247,3 +247,48 @@ class TestLinearRegression:
 
         # np.isclose because of rounding
         assert np.isclose(calculated_mean, expected_mean).all()
+
+    @pytest.mark.parametrize("l2_regularization", [0.0, 10.0])
+    def test_train_normal_equation(self, tmp_path, l2_regularization):
+        experiment = "one_month_forecast"
+        x, _, _ = _make_dataset(size=(10, 10))
+        x_add, _, _ = _make_dataset(size=(10, 10), variable_name="precip")
+        x = xr.merge([x, x_add]).isel(time=slice(-6, None))
+
+        for month in range(1, 4):
+            features = tmp_path / f"features/{experiment}/train/2001_{month}"
+            features.mkdir(parents=True)
+            x.isel(time=slice(0, -1)).to_netcdf(features / "x.nc")
+            (x[["VHI"]].isel(time=[-1]) * month).to_netcdf(features / "y.nc")
+
+        norm_dict = {"VHI": {"mean": 0, "std": 1}, "precip": {"mean": 0, "std": 1}}
+        with (tmp_path / f"features/{experiment}/normalizing_dict.pkl").open("wb") as f:
+            pickle.dump(norm_dict, f)
+
+        model = LinearRegression(
+            tmp_path,
+            experiment=experiment,
+            include_pred_month=False,
+            include_monthly_aggs=False,
+            include_yearly_aggs=False,
+            include_prev_y=False,
+            static=None,
+            normalize_y=False,
+        )
+        model.train(solver="normal_equation", l2_regularization=l2_regularization)
+
+        assert type(model.model) == linear_model.SGDRegressor
+
+        # compare to sklearn's solution, fitted on all the data in memory
+        input_x, input_y = [], []
+        for x_batch, y_batch in model.get_dataloader(mode="train", shuffle_data=False):
+            input_x.append(model._concatenate_data(x_batch))
+            input_y.append(y_batch)
+        input_x_np, input_y_np = np.concatenate(input_x), np.concatenate(input_y)
+        expected = linear_model.Ridge(alpha=l2_regularization).fit(
+            input_x_np, input_y_np.ravel()
+        )
+
+        assert np.allclose(model.model.coef_, expected.coef_, atol=1e-6)
+        assert np.allclose(model.model.intercept_, expected.intercept_, atol=1e-6)
+        assert np.allclose(model.train_mean, input_x_np.mean(axis=0))
@@ -1,7 +1,7 @@
 import numpy as np
 import torch
 
-from src.models.utils import chunk_array
+from src.models.utils import chunk_array, permuted_batches
 
 
 class TestChunker:
@@ -72,3 +72,29 @@ class TestChunker:
         ):
             assert (x[0] == x[2]).all()
             assert (x[0] == y).all()
+
+
+class TestPermutedBatches:
+    def test_permuted_batches(self):
+        test_x_1 = torch.arange(0, 10)
+        test_x_3 = torch.arange(0, 10) * 2
+        test_y = torch.arange(0, 10)
+
+        batches = list(
+            permuted_batches((test_x_1, None, test_x_3), test_y, 4, shuffle=True)
+        )
+        assert [y.shape[0] for _, y in batches] == [4, 4, 2]
+
+        for x, y in batches:
+            assert x[1] is None
+            assert (x[0] == y).all()
+            assert (x[2] == y * 2).all()
+        # every instance is in one batch
+        assert (torch.cat([y for _, y in batches]).sort()[0] == test_y).all()
+
+    def test_unshuffled_batches(self):
+        test_x = torch.arange(0, 10)
+
+        batches = list(permuted_batches((test_x,), test_x, 3, shuffle=False))
+        assert (batches[0][1] == torch.arange(0, 3)).all()
+        assert (torch.cat([y for _, y in batches]) == test_x).all()